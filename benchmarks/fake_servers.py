@@ -0,0 +1,194 @@
+# 벤치마크용 로컬 대역 서버: 가짜 인스타그램(프로필 페이지 + 무한 스크롤 피드 API)과 가짜 CDN
+# 실제 인스타그램과 같은 구조(게시물 링크, 피드 JSON, scontent 이미지 경로)를 흉내 내므로
+# 스크래퍼의 network/dom/html 추출 방식이 그대로 동작합니다.
+import json
+import random
+import asyncio
+from typing import Dict, List, Optional
+from aiohttp import web
+
+
+class FakeSiteConfig:
+    """
+    대역 서버 설정.
+
+    - posts: 계정당 게시물 수, page_size: 첫 페이지와 피드 API 한 번에 내려주는 게시물 수
+    - page_latency: 프로필 페이지/피드 API 응답 지연(초)
+    - image_size: 이미지 한 장의 크기(바이트), cdn_latency: 이미지 응답 지연(초)
+    - throttle_rate: CDN이 429(Retry-After: 0)로 응답할 확률
+    """
+
+    def __init__(
+        self,
+        posts: int = 120,
+        page_size: int = 12,
+        page_latency: float = 0.05,
+        image_size: int = 150_000,
+        cdn_latency: float = 0.02,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.posts = posts
+        self.page_size = page_size
+        self.page_latency = page_latency
+        self.image_size = image_size
+        self.cdn_latency = cdn_latency
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def post_code(username: str, index: int) -> str:
+    return f'{username}{index:05d}'
+
+
+def image_url(cdn_url: str, username: str, index: int) -> str:
+    return f'{cdn_url}/scontent/{post_code(username, index)}.jpg'
+
+
+def expected_image_urls(config: FakeSiteConfig, cdn_url: str, username: str) -> List[str]:
+    """대역 서버가 해당 계정에 대해 내려주는 이미지 URL 전체(최신 게시물 먼저)."""
+    return [image_url(cdn_url, username, index) for index in range(config.posts)]
+
+
+_PROFILE_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>@{username}</title>
+<style>
+  a {{ display: block; height: 300px; }}
+  img {{ width: 300px; height: 300px; }}
+</style>
+</head>
+<body>
+<main id="grid">{anchors}</main>
+<script>
+(() => {{
+  const username = {username_json};
+  const total = {total};
+  let cursor = {cursor};
+  let loading = false;
+  const grid = document.getElementById('grid');
+  window.addEventListener('scroll', async () => {{
+    if (loading || cursor >= total) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 600) return;
+    loading = true;
+    try {{
+      const response = await fetch(`/api/v1/feed/user/${{username}}/?max_id=${{cursor}}`);
+      const data = await response.json();
+      for (const item of data.items) {{
+        const a = document.createElement('a');
+        a.href = `/${{username}}/p/${{item.code}}/`;
+        const img = document.createElement('img');
+        img.src = item.image_versions2.candidates[0].url;
+        a.appendChild(img);
+        grid.appendChild(a);
+      }}
+      cursor = data.next_max_id;
+    }} finally {{
+      loading = false;
+    }}
+  }});
+}})();
+</script>
+</body>
+</html>
+"""
+
+
+def create_instagram_app(config: FakeSiteConfig, cdn_url: str) -> web.Application:
+    """프로필 페이지(/<username>/)와 무한 스크롤용 피드 API(/api/v1/feed/user/<username>/)를 제공하는 앱."""
+
+    def anchor(username: str, index: int) -> str:
+        return f'<a href="/{username}/p/{post_code(username, index)}/"><img src="{image_url(cdn_url, username, index)}"></a>'
+
+    async def profile(request: web.Request) -> web.Response:
+        await asyncio.sleep(config.page_latency)
+        username = request.match_info['username']
+        first_page = min(config.page_size, config.posts)
+        html = _PROFILE_HTML.format(
+            username=username,
+            username_json=json.dumps(username),
+            anchors=''.join(anchor(username, index) for index in range(first_page)),
+            total=config.posts,
+            cursor=first_page,
+        )
+        return web.Response(text=html, content_type='text/html')
+
+    async def feed(request: web.Request) -> web.Response:
+        await asyncio.sleep(config.page_latency)
+        username = request.match_info['username']
+        start = int(request.query.get('max_id', '0'))
+        end = min(start + config.page_size, config.posts)
+        items = [{
+            'pk': str(index),
+            'code': post_code(username, index),
+            'user': {'username': username},
+            'image_versions2': {'candidates': [{'url': image_url(cdn_url, username, index), 'width': 1080, 'height': 1080}]},
+        } for index in range(start, end)]
+        return web.json_response({'items': items, 'next_max_id': end, 'more_available': end < config.posts})
+
+    app = web.Application()
+    app.router.add_get('/api/v1/feed/user/{username}/', feed)
+    app.router.add_get('/{username}/', profile)
+    return app
+
+
+def create_cdn_app(config: FakeSiteConfig, stats: Dict[str, int]) -> web.Application:
+    """scontent 경로의 이미지를 고정 크기로 내려주고, throttle_rate 확률로 429를 돌려주는 CDN 앱."""
+    rng = random.Random(config.seed)
+    # JPEG 시그니처로 시작하는 고정 바이트(압축되지 않는 데이터를 흉내 내기 위해 난수로 채움)
+    body = b'\xff\xd8\xff\xe0' + random.Random(config.seed).randbytes(max(config.image_size - 4, 0))
+
+    async def image(request: web.Request) -> web.Response:
+        stats['requests'] += 1
+        await asyncio.sleep(config.cdn_latency)
+        if config.throttle_rate and rng.random() < config.throttle_rate:
+            stats['throttled'] += 1
+            return web.Response(status=429, headers={'Retry-After': '0'})
+        stats['bytes'] += len(body)
+        return web.Response(body=body, content_type='image/jpeg')
+
+    app = web.Application()
+    app.router.add_get('/scontent/{name}', image)
+    return app
+
+
+class FakeServers:
+    """
+    가짜 인스타그램과 가짜 CDN을 로컬 임의 포트에서 실행하는 비동기 컨텍스트 매니저.
+
+    사용 예:
+    async with FakeServers(FakeSiteConfig(posts=120)) as servers:
+        servers.instagram_url, servers.cdn_url, servers.cdn_stats
+    """
+
+    def __init__(self, config: FakeSiteConfig, host: str = '127.0.0.1'):
+        self.config = config
+        self.host = host
+        self.instagram_url: Optional[str] = None
+        self.cdn_url: Optional[str] = None
+        self.cdn_stats = {'requests': 0, 'throttled': 0, 'bytes': 0}
+        self._runners: List[web.AppRunner] = []
+
+    async def _serve(self, app: web.Application) -> str:
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, 0)
+        await site.start()
+        self._runners.append(runner)
+        port = runner.addresses[0][1]
+        return f'http://{self.host}:{port}'
+
+    async def __aenter__(self) -> 'FakeServers':
+        self.cdn_url = await self._serve(create_cdn_app(self.config, self.cdn_stats))
+        self.instagram_url = await self._serve(create_instagram_app(self.config, self.cdn_url))
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        for runner in reversed(self._runners):
+            await runner.cleanup()
+        self._runners = []
@@ -0,0 +1,395 @@
+# 오프라인 종단간 벤치마크. 저장소 루트에서 실행합니다.
+#
+#   python -m benchmarks.run --posts 12,120,600 --concurrency 1,4 --output results.json
+#   python -m benchmarks.run --posts 120 --compare results.json
+#
+# 시나리오(게시물 수 × 동시 요청 수)마다 가짜 인스타그램/CDN(benchmarks.fake_servers)을 띄우고 다음을 측정합니다.
+# - stages: 앱 코드를 같은 프로세스에서 단계별로 실행한 시간
+#   (스크래핑 시간, 다운로드 처리량, ZIP 생성 시간)
+# - end_to_end: uvicorn으로 실행한 실제 앱에 /download를 동시에 요청했을 때의 TTFB, 전체 시간, 응답 크기,
+#   그리고 서버 프로세스 트리(브라우저 포함)의 최대 RSS
+# 결과는 JSON으로 저장되며 --compare로 이전 결과와 비교할 수 있습니다.
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+import aiohttp
+from src.browser_manager import BrowserPool, ResourceBlockPolicy, FIRST_PARTY_DOMAINS
+from src.downloader import ImageDownloader
+from src.media_urls import media_key
+from src.scraper import scrape_profile
+from src.utils import stream_zip
+from .fake_servers import FakeServers, FakeSiteConfig, expected_image_urls
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 결과 비교(--compare) 시 보여줄 지표와, 값이 작을수록 좋은지 여부
+COMPARED_METRICS = {
+    'stages.scrape_seconds': True,
+    'stages.download_mb_per_second': False,
+    'stages.zip_seconds': True,
+    'end_to_end.ttfb_p50': True,
+    'end_to_end.total_p50': True,
+    'end_to_end.peak_rss_mb': True,
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(round(q * (len(values) - 1))), len(values) - 1)]
+
+
+def _process_tree_rss(pid: int) -> Optional[int]:
+    """프로세스와 모든 하위 프로세스의 RSS 합(바이트). /proc이 없는 환경에서는 None."""
+    total = 0
+    stack = [pid]
+    try:
+        while stack:
+            current = stack.pop()
+            try:
+                with open(f'/proc/{current}/status') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1]) * 1024
+                for task in os.listdir(f'/proc/{current}/task'):
+                    with open(f'/proc/{current}/task/{task}/children') as f:
+                        stack.extend(int(child) for child in f.read().split())
+            except FileNotFoundError:
+                # 측정 중 종료된 프로세스
+                continue
+    except OSError:
+        return None
+    return total if os.path.exists(f'/proc/{pid}') else None
+
+
+class RssSampler:
+    """주기적으로 프로세스 트리의 RSS를 측정해 최댓값을 기록합니다."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _sample(self) -> None:
+        rss = _process_tree_rss(self.pid)
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+
+    async def _run(self) -> None:
+        while True:
+            self._sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        self._sample()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def _write_empty_storage_state(directory: str) -> str:
+    path = os.path.join(directory, 'cookies.json')
+    with open(path, 'w') as f:
+        json.dump({'cookies': [], 'origins': []}, f)
+    return path
+
+
+async def bench_stages(servers: FakeServers, config: FakeSiteConfig, cookie_file: str, args) -> dict:
+    """스크래핑 → 다운로드 → ZIP 생성을 순서대로 실행하며 단계별 시간을 잽니다."""
+    stages: Dict[str, object] = {}
+    username = 'bench_stage'
+
+    # 1. 스크래핑 (브라우저를 실행할 수 없으면 대역 서버가 내려주는 URL 목록으로 대신함)
+    expected = expected_image_urls(config, servers.cdn_url, username)
+    image_urls = expected
+    if not args.skip_scrape:
+        pool = BrowserPool(size=1, cookie_file_path=cookie_file)
+        try:
+            await pool.start(warm=True)
+            policy = ResourceBlockPolicy(first_party_domains=FIRST_PARTY_DOMAINS + ('127.0.0.1',))
+            started = time.perf_counter()
+            result = await scrape_profile(
+                username, pool=pool, base_url=servers.instagram_url,
+                extraction=args.extraction, resource_policy=policy,
+            )
+            stages['scrape_seconds'] = time.perf_counter() - started
+            stages['scrape_images'] = len(result.image_urls)
+            # 일부만 스크래핑했으면 시간이 빨라 보이므로 대역 서버가 내려준 사진과 같은지 함께 기록
+            stages.update(scrape_completeness(expected, result.image_urls))
+            stages['scrape_stats'] = result.stats
+            image_urls = result.image_urls
+        except Exception as e:
+            stages['scrape_error'] = f'{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ""}'
+        finally:
+            await pool.close()
+
+    # 2. 다운로드
+    started = time.perf_counter()
+    async with ImageDownloader() as downloader:
+        download = await downloader.download(image_urls)
+    download_seconds = time.perf_counter() - started
+    stages['download_seconds'] = download_seconds
+    stages['download_images'] = download.succeeded
+    stages['download_failed'] = download.failed
+    stages['download_retries'] = download.retries
+    stages['download_bytes'] = download.bytes_downloaded
+    stages['download_mb_per_second'] = download.bytes_downloaded / download_seconds / 1e6
+
+    # 3. ZIP 생성 (메모리에서 조각을 만들기만 하고 버림)
+    started = time.perf_counter()
+    zip_bytes = sum(len(chunk) for chunk in stream_zip(download.images))
+    stages['zip_seconds'] = time.perf_counter() - started
+    stages['zip_bytes'] = zip_bytes
+    return stages
+
+
+def scrape_completeness(expected: List[str], scraped: List[str]) -> dict:
+    """스크래핑한 URL이 기대한 사진(미디어 키 기준)과 같은지 비교합니다. 빠진 사진과 예상하지 못한 사진의 수를 반환합니다."""
+    expected_keys = {media_key(url) for url in expected}
+    scraped_keys = {media_key(url) for url in scraped}
+    missing = len(expected_keys - scraped_keys)
+    unexpected = len(scraped_keys - expected_keys)
+    return {
+        'scrape_expected': len(expected_keys),
+        'scrape_missing': missing,
+        'scrape_unexpected': unexpected,
+        'scrape_complete': missing == 0 and unexpected == 0,
+    }
+
+
+async def _wait_until_ready(session: aiohttp.ClientSession, url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'앱 서버가 종료되었습니다 (exit code {process.returncode}).')
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError('앱 서버가 시작되지 않았습니다.')
+
+
+async def _timed_download(session: aiohttp.ClientSession, url: str, username: str) -> dict:
+    started = time.perf_counter()
+    ttfb = None
+    size = 0
+    async with session.post(url, json={'username': username}) as response:
+        async for chunk in response.content.iter_any():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            size += len(chunk)
+        return {'status': response.status, 'ttfb': ttfb, 'total': time.perf_counter() - started, 'bytes': size}
+
+
+async def bench_end_to_end(servers: FakeServers, concurrency: int, cookie_file: str, workdir: str, args) -> dict:
+    """uvicorn으로 앱을 실행하고 서로 다른 계정에 대해 /download를 동시에 요청합니다."""
+    port = _free_port()
+    env = dict(
+        os.environ,
+        INSTAGRAM_BASE_URL=servers.instagram_url,
+        COOKIE_FILE_PATH=cookie_file,
+        BROWSER_POOL_SIZE=str(min(concurrency, args.browser_pool_size)),
+        SCRAPE_EXTRACTION=args.extraction,
+        IMAGE_CACHE_MAX_BYTES='0',
+        JOB_ARTIFACT_DIR=os.path.join(workdir, 'jobs'),
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'src.asgi:application', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=REPO_ROOT, env=env,
+    )
+    base = f'http://127.0.0.1:{port}'
+    sampler = RssSampler(process.pid)
+    try:
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            await _wait_until_ready(session, base + '/', process)
+            sampler.start()
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                *(_timed_download(session, base + '/download', f'bench_e2e_{i}') for i in range(concurrency)),
+                return_exceptions=True,
+            )
+            wall = time.perf_counter() - started
+            await sampler.stop()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    ok = [r for r in responses if isinstance(r, dict) and r['status'] == 200]
+    errors = [repr(r) if isinstance(r, BaseException) else f"HTTP {r['status']}" for r in responses if r not in ok]
+    return {
+        'requests': concurrency,
+        'succeeded': len(ok),
+        'errors': errors,
+        'wall_seconds': wall,
+        'ttfb_p50': _percentile([r['ttfb'] for r in ok if r['ttfb'] is not None], 0.5),
+        'ttfb_max': _percentile([r['ttfb'] for r in ok if r['ttfb'] is not None], 1.0),
+        'total_p50': _percentile([r['total'] for r in ok], 0.5),
+        'total_max': _percentile([r['total'] for r in ok], 1.0),
+        'bytes_per_response': _percentile([r['bytes'] for r in ok], 0.5),
+        'peak_rss_mb': sampler.peak / 1e6 if sampler.peak is not None else None,
+    }
+
+
+async def run_scenario(posts: int, concurrency: int, args) -> dict:
+    config = FakeSiteConfig(
+        posts=posts,
+        page_latency=args.page_latency,
+        image_size=args.image_size,
+        cdn_latency=args.cdn_latency,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+    scenario = {'posts': posts, 'concurrency': concurrency, 'site': config.as_dict()}
+    with tempfile.TemporaryDirectory(prefix='ig-bench-') as workdir:
+        cookie_file = _write_empty_storage_state(workdir)
+        async with FakeServers(config) as servers:
+            scenario['stages'] = await bench_stages(servers, config, cookie_file, args)
+            if not args.skip_e2e:
+                try:
+                    scenario['end_to_end'] = await bench_end_to_end(servers, concurrency, cookie_file, workdir, args)
+                except Exception as e:
+                    scenario['end_to_end'] = {'error': f'{type(e).__name__}: {e}'}
+            scenario['cdn'] = dict(servers.cdn_stats)
+    return scenario
+
+
+def _metric(scenario: dict, path: str):
+    value = scenario
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """같은 (게시물 수, 동시 요청 수) 시나리오끼리 주요 지표의 변화율을 비교한 줄 목록을 반환합니다."""
+    previous = {(s['posts'], s['concurrency']): s for s in baseline.get('scenarios', [])}
+    lines = []
+    for scenario in current['scenarios']:
+        old = previous.get((scenario['posts'], scenario['concurrency']))
+        if old is None:
+            continue
+        lines.append(f"posts={scenario['posts']} concurrency={scenario['concurrency']}")
+        for path, lower_is_better in COMPARED_METRICS.items():
+            new_value, old_value = _metric(scenario, path), _metric(old, path)
+            if new_value is None or not old_value:
+                continue
+            change = (new_value - old_value) / old_value * 100
+            better = (change < 0) == lower_is_better
+            lines.append(f"  {path:34s} {old_value:10.3f} -> {new_value:10.3f} ({change:+6.1f}%{'' if abs(change) < 5 else (' better' if better else ' WORSE')})")
+    return lines
+
+
+def _summary_line(scenario: dict) -> str:
+    stages = scenario['stages']
+    e2e = scenario.get('end_to_end', {})
+
+    def fmt(value, unit=''):
+        return f'{value:.2f}{unit}' if isinstance(value, (int, float)) else '-'
+
+    completeness = ''
+    if stages.get('scrape_complete') is False:
+        completeness = f"(INCOMPLETE: {stages['scrape_missing']} missing, {stages['scrape_unexpected']} unexpected) "
+    return (
+        f"posts={scenario['posts']:<5} concurrency={scenario['concurrency']:<3} "
+        f"scrape={fmt(stages.get('scrape_seconds'), 's')} {completeness}"
+        f"download={fmt(stages.get('download_mb_per_second'), 'MB/s')} "
+        f"zip={fmt(stages.get('zip_seconds'), 's')} "
+        f"ttfb_p50={fmt(e2e.get('ttfb_p50'), 's')} "
+        f"total_p50={fmt(e2e.get('total_p50'), 's')} "
+        f"peak_rss={fmt(e2e.get('peak_rss_mb'), 'MB')}"
+    )
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='가짜 인스타그램/CDN을 이용한 오프라인 종단간 벤치마크')
+    parser.add_argument('--posts', type=_int_list, default=[12, 120, 600], help='게시물 수 목록 (쉼표 구분)')
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 4], help='동시 /download 요청 수 목록 (쉼표 구분)')
+    parser.add_argument('--image-size', type=int, default=150_000, help='이미지 크기(바이트)')
+    parser.add_argument('--page-latency', type=float, default=0.05, help='프로필/피드 응답 지연(초)')
+    parser.add_argument('--cdn-latency', type=float, default=0.02, help='CDN 응답 지연(초)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='CDN 429 응답 비율 (0~1)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--extraction', default='network', choices=['network', 'dom', 'html'])
+    parser.add_argument('--browser-pool-size', type=int, default=2)
+    parser.add_argument('--request-timeout', type=float, default=600.0)
+    parser.add_argument('--skip-scrape', action='store_true', help='브라우저 없이 다운로드/ZIP 단계만 측정')
+    parser.add_argument('--skip-e2e', action='store_true', help='uvicorn 종단간 측정 생략')
+    parser.add_argument('--output', help='결과를 저장할 JSON 파일 경로 (생략 시 표준 출력)')
+    parser.add_argument('--compare', help='비교할 이전 결과 JSON 파일 경로')
+    parser.add_argument('--strict', action='store_true', help='스크래핑 결과가 대역 서버의 사진과 다르면 종료 코드 1로 끝냄')
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> dict:
+    args = parse_args(argv)
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenarios': [],
+    }
+    for posts in args.posts:
+        for concurrency in args.concurrency:
+            scenario = await run_scenario(posts, concurrency, args)
+            report['scenarios'].append(scenario)
+            print(_summary_line(scenario), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+    return report
+
+
+def incomplete_scenarios(report: dict) -> List[dict]:
+    return [scenario for scenario in report['scenarios'] if scenario['stages'].get('scrape_complete') is False]
+
+
+if __name__ == '__main__':
+    report = asyncio.run(main())
+    incomplete = incomplete_scenarios(report)
+    for scenario in incomplete:
+        print(f"경고: posts={scenario['posts']} concurrency={scenario['concurrency']} 스크래핑 결과가 불완전합니다 "
+              f"(빠짐 {scenario['stages']['scrape_missing']}개, 예상 밖 {scenario['stages']['scrape_unexpected']}개).", file=sys.stderr)
+    if incomplete and report['args'].get('strict'):
+        sys.exit(1)
@@ -1,10 +1,437 @@
+import os
+import time
 import asyncio
-from flask import Flask, render_template, request, jsonify, Response
-from .scraper import scrape_profile_page, ProfileNotFoundException, ProfileIsPrivateException, ScrapeTimeoutException
-from .utils import download_images_as_bytes, create_zip_in_memory, ZipCreationException
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+from flask import Flask, render_template, request, jsonify, Response, send_file
+from .artifact_store import Artifact, ArtifactStore, archive_fingerprint
+from .batch import BatchDownloader
+from .browser_manager import BrowserPool, ResourceBlockPolicy, FIRST_PARTY_DOMAINS
+from .downloader import DownloadResult, ImageDownloader
+from .image_cache import ImageCache
+from .job_store import SharedJobManager, SqliteJobStore
+from .jobs import JobManager, JobQueueFullException, STAGE_DONE, STAGE_FAILED
+from .media_urls import ResolutionPolicy
+from .metrics import REGISTRY, REQUESTS, Trace, current_trace, observe_stage
+from .profile_cache import ProfileCache, normalize_username
+from .scraper import iter_profile_page, INSTAGRAM_URL, ProfileScrapeResult, ProfileNotFoundException, ProfileIsPrivateException, ScrapeTimeoutException
+from .session_pool import NoSessionAvailableException, SessionBlockedException, SessionPool
+from .single_flight import StreamFlight
+from .spool import MemoryBudget
+from .transcoder import ImageTranscoder, TranscodePreset
+from .utils import iter_images_as_bytes, astream_zip, release_image, write_zip
 
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
 
+# 브라우저 풀과 다운로더 세션은 특정 이벤트 루프에 묶이므로, 요청마다 asyncio.run()으로 루프를 새로 만들지 않고
+# 워커당 하나의 오래 사는 루프에서 모든 비동기 작업을 실행합니다.
+# ASGI 서버(src.asgi)에서는 서버의 루프를 사용하고, 개발 서버(flask run)에서는 백그라운드 스레드 루프를 만듭니다.
+_loop = None
+_loop_lock = threading.Lock()
+
+def use_event_loop(loop):
+    """공용 이벤트 루프를 지정합니다. ASGI 서버 시작(lifespan) 시 서버의 루프를 등록하는 데 사용합니다."""
+    global _loop
+    with _loop_lock:
+        _loop = loop
+
+def get_event_loop():
+    """공용 이벤트 루프를 반환합니다. 지정된 루프가 없으면 백그라운드 스레드에서 도는 루프를 만듭니다."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='async-loop', daemon=True).start()
+        return _loop
+
+# uvicorn 워커(프로세스) 수. 프로세스마다 따로 두는 작업 목록을 공유할지 정하는 데 사용합니다.
+web_concurrency = max(int(os.environ.get('WEB_CONCURRENCY', '1')), 1)
+# 같은 쿠키 파일(계정)로 스크래핑하는 전체 프로세스 수(uvicorn 워커 + python -m src.worker 프로세스).
+# 지정하지 않으면 uvicorn 워커 수를 사용하며, src.worker는 자식 프로세스에 자기 프로세스 수를 더한 값을 넘깁니다.
+session_processes = max(int(os.environ.get('SESSION_PROCESSES') or web_concurrency), 1)
+
+# 인증 세션(계정) 풀: COOKIE_FILE_PATHS에 쉼표로 구분한 여러 쿠키 파일을 주면 스크래핑을 계정들에 나눠 배정합니다.
+# 계정마다 분당 SESSION_RATE_PER_MINUTE회(0이면 제한 없음)로 요청을 제한하고, 요청 제한/로그인 화면을 만난 계정은
+# SESSION_COOLDOWN초 동안 쉬게 합니다. 갱신된 쿠키는 SESSION_SAVE_INTERVAL초마다 원래 파일에 다시 씁니다.
+# 토큰 버킷과 쿨다운은 프로세스마다 따로 있으므로, 계정 전체의 한도를 지키도록 요청 속도와 burst를
+# SESSION_PROCESSES로 나눠 각 프로세스에 배정합니다. 쿨다운은 차단을 만난 워커에만 적용되며, 다른 워커는 같은 계정으로
+# 차단을 만나면 그때 쉽니다.
+_cookie_file_paths = [
+    path.strip()
+    for path in os.environ.get('COOKIE_FILE_PATHS', os.environ.get('COOKIE_FILE_PATH', 'instagram_cookies.json')).split(',')
+    if path.strip()
+]
+session_pool = SessionPool(
+    _cookie_file_paths,
+    rate_per_minute=float(os.environ.get('SESSION_RATE_PER_MINUTE', '0')) / session_processes or None,
+    burst=float(os.environ.get('SESSION_BURST', '3')) / session_processes,
+    cooldown=float(os.environ.get('SESSION_COOLDOWN', '600')),
+    max_concurrent=int(os.environ.get('SESSION_MAX_CONCURRENCY', '0')) or None,
+    max_wait=float(os.environ.get('SESSION_MAX_WAIT', '120')),
+    save_interval=float(os.environ.get('SESSION_SAVE_INTERVAL', '300')),
+)
+
+browser_pool = BrowserPool(
+    size=int(os.environ.get('BROWSER_POOL_SIZE', '2')),
+    cookie_file_path=_cookie_file_paths[0],
+    max_uses=int(os.environ.get('BROWSER_MAX_USES', '50')),
+    idle_timeout=float(os.environ.get('BROWSER_IDLE_TIMEOUT', '300')),
+    sessions=session_pool,
+)
+
+# 스크래핑 옵션: 미디어 추출 방식과 스크롤 중 불필요한 리소스(이미지/미디어/폰트/3rd-party) 차단 여부,
+# 사진마다 받을 해상도(IMAGE_RESOLUTION: largest, smallest, max:N)
+# INSTAGRAM_BASE_URL은 벤치마크용 대역 서버(benchmarks/)를 가리킬 때 사용하며, 그 호스트도 1st-party로 취급합니다.
+_instagram_url = os.environ.get('INSTAGRAM_BASE_URL', INSTAGRAM_URL).rstrip('/')
+scrape_options = {
+    'extraction': os.environ.get('SCRAPE_EXTRACTION', 'network'),
+    'resource_policy': ResourceBlockPolicy(
+        first_party_domains=FIRST_PARTY_DOMAINS + (urlsplit(_instagram_url).hostname,),
+    ) if os.environ.get('SCRAPE_BLOCK_RESOURCES', '1') == '1' else None,
+    'base_url': _instagram_url,
+    'resolution': ResolutionPolicy.parse(os.environ.get('IMAGE_RESOLUTION', 'largest')),
+}
+
+# 같은 계정을 반복 요청할 때 전체 스크롤을 생략하기 위한 스크래핑 결과 캐시
+profile_cache = ProfileCache(
+    ttl=float(os.environ.get('PROFILE_CACHE_TTL', '600')),
+    full_refresh_after=float(os.environ.get('PROFILE_CACHE_FULL_REFRESH', '86400')),
+)
+
+# 최근에 받은 이미지를 다시 받지 않도록 하는 디스크 캐시 (IMAGE_CACHE_MAX_BYTES=0이면 비활성화)
+_image_cache_max_bytes = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', str(1024 ** 3)))
+image_cache = ImageCache(
+    os.environ.get('IMAGE_CACHE_DIR', '.cache/images'),
+    max_bytes=_image_cache_max_bytes,
+) if _image_cache_max_bytes > 0 else None
+
+# 다운로드한 이미지를 RAM에 둘 수 있는 한도. 프로세스 전체(SPOOL_MEMORY_BUDGET)와 요청/작업 하나(SPOOL_REQUEST_MEMORY_BUDGET)
+# 중 하나라도 넘으면 이미지는 SPOOL_DIR(기본: 시스템 임시 디렉터리)의 임시 파일로 넘어가고, ZIP은 그 스풀에서 읽어 만듭니다.
+memory_budget = MemoryBudget(int(os.environ.get('SPOOL_MEMORY_BUDGET', str(256 * 1024 ** 2))))
+
+# 받은 이미지를 ZIP에 넣기 전에 다시 압축하는 선택적 단계(Pillow 필요). IMAGE_TRANSCODE에 'mobile', 'small' 또는
+# '형식[:최대 크기[:품질]]'(예: 'webp:1080:75')을 주면 IMAGE_TRANSCODE_WORKERS개 프로세스(기본: CPU 코어 수)에서 변환하며,
+# 변환 결과는 (원본 해시, 설정)으로 IMAGE_TRANSCODE_CACHE_DIR에 캐시합니다. 비어 있으면 원본을 그대로 보냅니다.
+_transcode_preset = os.environ.get('IMAGE_TRANSCODE', '').strip()
+_transcode_cache_max_bytes = int(os.environ.get('IMAGE_TRANSCODE_CACHE_MAX_BYTES', str(1024 ** 3)))
+image_transcoder = ImageTranscoder(
+    TranscodePreset.parse(_transcode_preset, strip_metadata=os.environ.get('IMAGE_TRANSCODE_STRIP_METADATA', '1') == '1'),
+    workers=int(os.environ.get('IMAGE_TRANSCODE_WORKERS', '0')) or None,
+    max_pending=int(os.environ.get('IMAGE_TRANSCODE_MAX_PENDING', '0')) or None,
+    cache=ImageCache(
+        os.environ.get('IMAGE_TRANSCODE_CACHE_DIR', '.cache/transcoded'),
+        max_bytes=_transcode_cache_max_bytes,
+    ) if _transcode_cache_max_bytes > 0 else None,
+) if _transcode_preset else None
+
+# 요청 간에 커넥션 풀(keep-alive, DNS 캐시)을 공유하는 다운로더
+image_downloader = ImageDownloader(
+    max_concurrency=int(os.environ.get('DOWNLOAD_MAX_CONCURRENCY', '32')),
+    per_host_concurrency=int(os.environ.get('DOWNLOAD_PER_HOST_CONCURRENCY', '8')),
+    max_retries=int(os.environ.get('DOWNLOAD_MAX_RETRIES', '3')),
+    cache=image_cache,
+    memory_budget=memory_budget,
+    request_memory_limit=int(os.environ.get('SPOOL_REQUEST_MEMORY_BUDGET', str(32 * 1024 ** 2))),
+    spool_dir=os.environ.get('SPOOL_DIR') or None,
+    transcoder=image_transcoder,
+)
+
+# 큰 계정을 위한 백그라운드 작업(POST /jobs). 요청자별로 공정하게 순서를 돌며 JOB_WORKERS개씩 처리하고,
+# 완료된 ZIP은 JOB_ARTIFACT_TTL초 후 삭제합니다. (아래 함수들은 이 모듈에서 뒤에 정의되므로 lambda로 감쌈)
+# JOB_STORE_PATH(SQLite 파일)를 지정하면 같은 파일/JOB_ARTIFACT_DIR을 쓰는 모든 프로세스(uvicorn 워커, python -m src.worker,
+# 같은 볼륨의 다른 컨테이너)가 작업을 나눠 처리합니다. 워커가 죽으면 JOB_LEASE_SECONDS 후 다른 프로세스가 이어받습니다.
+_job_options = dict(
+    scrape=lambda username: scrape_profile_result(username),
+    downloader=image_downloader,
+    describe_error=lambda e, username: describe_error(e, username),
+    artifact_dir=os.environ.get('JOB_ARTIFACT_DIR', '.cache/jobs'),
+    workers=int(os.environ.get('JOB_WORKERS', '2')),
+    artifact_ttl=float(os.environ.get('JOB_ARTIFACT_TTL', '3600')),
+    max_pending_per_owner=int(os.environ.get('JOB_MAX_PENDING_PER_CLIENT', '10')),
+)
+# 작업을 메모리에만 두면 uvicorn 워커가 여럿일 때(WEB_CONCURRENCY > 1) 작업을 등록한 워커가 아닌 다른 워커로 간
+# 조회(GET /jobs/<id>)가 404가 되므로, 이때는 JOB_STORE_PATH가 없어도 JOB_ARTIFACT_DIR 안의 SQLite 저장소를 사용합니다.
+_job_store_path = os.environ.get('JOB_STORE_PATH') or (
+    os.path.join(_job_options['artifact_dir'], 'jobs.sqlite')
+    if web_concurrency > 1 else None
+)
+if _job_store_path:
+    job_manager = SharedJobManager(
+        SqliteJobStore(_job_store_path),
+        lease=float(os.environ.get('JOB_LEASE_SECONDS', '60')),
+        max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', '3')),
+        **_job_options,
+    )
+else:
+    job_manager = JobManager(**_job_options)
+
+# 완성된 아카이브를 (계정, 내용 지문)으로 보관하는 저장소. GET /archives/<username>은 ETag/Last-Modified/Range를 지원하므로
+# 끊긴 전송을 이어받을 수 있고, 게시물이 바뀌지 않은 계정은 이미지를 다시 받지 않습니다.
+artifact_store = ArtifactStore(
+    os.environ.get('ARCHIVE_DIR', '.cache/archives'),
+    max_bytes=int(os.environ.get('ARCHIVE_MAX_BYTES', str(10 * 1024 ** 3))),
+    ttl=float(os.environ.get('ARCHIVE_TTL', str(7 * 86400))),
+    # 일부 이미지가 빠진 아카이브를 이 시간 동안은 그대로 사용(계속 실패하는 URL 때문에 매번 다시 만들지 않도록)
+    alias_ttl=float(os.environ.get('ARCHIVE_PARTIAL_TTL', '600')),
+)
+
+# 여러 계정을 한 번에 받는 배치 다운로드(POST /batch). 브라우저 풀과 다운로더 세션을 공유하며 BATCH_PARALLELISM개 계정씩
+# 동시에 스크래핑하고, 한 요청에 최대 BATCH_MAX_USERNAMES개 계정까지 받습니다.
+batch_max_usernames = int(os.environ.get('BATCH_MAX_USERNAMES', '50'))
+batch_downloader = BatchDownloader(
+    iter_image_urls=lambda username: iter_profile_page(username, pool=browser_pool, cache=profile_cache, **scrape_options),
+    downloader=image_downloader,
+    describe_error=lambda e, username: describe_error(e, username),
+    parallelism=int(os.environ.get('BATCH_PARALLELISM', '2')),
+)
+
+# 1이면 /download 응답에 첫 이미지까지의 단계별 소요 시간을 Server-Timing 헤더로 붙임
+server_timing_enabled = os.environ.get('SERVER_TIMING', '0') == '1'
+
+# /metrics에서 stats()의 숫자 값을 ig_component_stat{component, stat} 게이지로 노출
+COMPONENT_STATS = REGISTRY.gauge('ig_component_stat', '컴포넌트별 상태/누적 통계(stats())', ['component', 'stat'])
+
+# 같은 계정을 동시에 요청하면 스크래핑과 다운로드를 한 번만 하고 결과를 함께 스트리밍.
+# 공유하는 이미지의 스풀은 모든 요청이 ZIP에 쓴 뒤 여기서 반납하므로, 응답 쪽(astream_zip)에서는 닫지 않음
+download_flight = StreamFlight(release=release_image)
+
+def run_async(coro):
+    """코루틴을 공용 이벤트 루프에서 실행하고 결과를 기다립니다."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+def iterate_async(agen):
+    """비동기 제너레이터를 공용 이벤트 루프에서 한 항목씩 꺼내는 동기 제너레이터로 감쌉니다."""
+    try:
+        while True:
+            try:
+                yield run_async(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_async(agen.aclose())
+
+async def _prepend(first, rest):
+    """이미 꺼낸 첫 항목을 다시 앞에 붙입니다. 소비가 중단되면 rest도 닫습니다."""
+    try:
+        yield first
+        async for item in rest:
+            yield item
+    finally:
+        await rest.aclose()
+
+class DownloadError(Exception):
+    """다운로드 준비 중 클라이언트에게 돌려줄 오류(HTTP 상태 코드와 메시지)"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def is_valid_username(username) -> bool:
+    return bool(username) and isinstance(username, str) and ' ' not in username
+
+def batch_usernames(data) -> list:
+    """
+    배치 요청 본문({"usernames": [...]})에서 계정 목록을 꺼냅니다.
+
+    Raises:
+        DownloadError: 목록이 비었거나, 너무 많거나, 유효하지 않은 계정명이 있는 경우(400).
+    """
+    usernames = data.get('usernames') if isinstance(data, dict) else None
+    if not isinstance(usernames, list) or not usernames:
+        raise DownloadError(400, '계정명 목록(usernames)이 필요합니다.')
+    if len(usernames) > batch_max_usernames:
+        raise DownloadError(400, f'한 번에 최대 {batch_max_usernames}개 계정까지 요청할 수 있습니다.')
+    invalid = [username for username in usernames if not is_valid_username(username)]
+    if invalid:
+        raise DownloadError(400, f'유효하지 않은 계정명입니다: {invalid[0]}')
+    return usernames
+
+def describe_error(e: Exception, username: str):
+    """스크래핑/다운로드 중 발생한 예외를 클라이언트에게 돌려줄 (HTTP 상태 코드, 메시지)로 변환합니다."""
+    if isinstance(e, ProfileNotFoundException):
+        return 404, f"'{username}' 계정을 찾을 수 없습니다."
+    if isinstance(e, ProfileIsPrivateException):
+        return 403, f"'{username}' 계정은 비공개이거나 게시물이 없습니다."
+    if isinstance(e, ScrapeTimeoutException):
+        return 408, '인스타그램에서 응답이 없어 시간 초과되었습니다. 잠시 후 다시 시도해주세요.' # 408 Request Timeout
+    if isinstance(e, (SessionBlockedException, NoSessionAvailableException)):
+        return 503, '인스타그램 요청이 일시적으로 제한되었습니다. 잠시 후 다시 시도해주세요.' # 503 Service Unavailable
+    app.logger.error(f"An unexpected error occurred: {e}", exc_info=e)
+    return 500, '알 수 없는 오류가 발생했습니다. 서버 로그를 확인하세요.'
+
+async def _profile_images(username: str):
+    """
+    스크래핑과 다운로드를 겹쳐 실행합니다. 스크롤 단계마다 발견한 이미지 URL을 바로 다운로더로 넘기므로
+    전체 시간이 (스크롤 시간 + 다운로드 시간)이 아니라 둘 중 긴 쪽에 가까워집니다.
+    """
+    found = 0
+
+    async def image_urls():
+        nonlocal found
+        urls = iter_profile_page(username, pool=browser_pool, cache=profile_cache, **scrape_options)
+        try:
+            async for url in urls:
+                found += 1
+                yield url
+        finally:
+            await urls.aclose()
+
+    async for image in iter_images_as_bytes(image_urls(), downloader=image_downloader):
+        yield image
+    if not found:
+        raise DownloadError(404, '다운로드할 이미지를 찾을 수 없습니다.')
+
+async def open_profile_download(username: str, trace: Optional[Trace] = None):
+    """
+    계정을 스크래핑하고 첫 이미지가 도착할 때까지 기다린 뒤, (파일명, 바이트) 비동기 이터레이터를 반환합니다.
+    첫 이미지까지 확인해 두므로 응답을 보내기 전에 오류를 HTTP 상태 코드로 알릴 수 있습니다.
+    스크래핑이 끝나기 전에도 첫 이미지가 도착하는 즉시 반환합니다.
+    `trace`가 주어지면 이 요청에서 실행되는 단계(브라우저 실행, 페이지 이동, 스크롤, 다운로드 등)의 구간이 기록됩니다.
+    진행 중인 다운로드에 합류한 경우에는 첫 이미지까지 기다린 시간만 'join' 단계로 기록됩니다.
+
+    Raises:
+        DownloadError: 계정 없음/비공개/타임아웃/다운로드 실패 등 클라이언트에게 알릴 오류.
+    """
+    if trace is not None:
+        current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        # 스크래핑 + 이미지 다운로드(비동기 제너레이터) - 첫 이미지가 도착할 때까지만 기다림
+        # 같은 계정의 다운로드가 진행 중이면 새로 받지 않고 거기에 합류
+        key = normalize_username(username)
+        joined = download_flight.joinable(key)
+        image_data = download_flight.subscribe(key, lambda: _profile_images(username))
+        try:
+            first_image = await image_data.__anext__()
+        except StopAsyncIteration:
+            raise DownloadError(500, '이미지를 다운로드하는 데 실패했습니다.')
+        # 공유 스트림의 스크래핑/다운로드 구간은 스트림을 시작한 요청의 Trace에 기록되므로,
+        # 합류한 요청에는 첫 이미지를 기다린 시간을 'join' 단계로 남김
+        observe_stage('join' if joined else 'first_image', time.perf_counter() - started, started)
+        return _prepend(first_image, image_data)
+
+    except DownloadError:
+        raise
+    except Exception as e:
+        raise DownloadError(*describe_error(e, username))
+
+async def scrape_profile_result(username: str) -> ProfileScrapeResult:
+    """백그라운드 작업용 스크래핑: 게시물 수도 보고할 수 있도록 ProfileScrapeResult를 반환합니다."""
+    return await profile_cache.get_or_scrape(username, pool=browser_pool, **scrape_options)
+
+def _fingerprint(image_urls) -> str:
+    # 해상도 정책이나 변환 설정이 다르면 같은 게시물이라도 다른 아카이브
+    variant = repr(scrape_options['resolution'])
+    if image_transcoder is not None:
+        variant += f" {image_transcoder.preset.key}"
+    return archive_fingerprint(image_urls, variant=variant)
+
+def stored_archive(username: str) -> Optional[Artifact]:
+    """
+    캐시된 최근 스크래핑 결과와 내용이 같은 아카이브가 저장되어 있으면 반환합니다.
+    브라우저나 네트워크를 사용하지 않으므로 POST /download 처리 전에 확인하는 데 사용합니다.
+    """
+    result = profile_cache.get(username)
+    if result is None or not result.image_urls:
+        return None
+    return artifact_store.get(username, _fingerprint(result.image_urls))
+
+async def build_archive(username: str) -> Artifact:
+    """
+    계정의 게시물 목록(캐시 또는 증분 스크래핑)으로 지문을 계산해 저장된 아카이브를 찾고, 없으면 모든 이미지를 받아 저장합니다.
+    아카이브 생성은 요청한 클라이언트의 연결이 끊겨도 끝까지 진행됩니다.
+
+    Raises:
+        DownloadError: 계정 없음/비공개/타임아웃/다운로드 실패 등 클라이언트에게 알릴 오류.
+    """
+    try:
+        result = await scrape_profile_result(username)
+        if not result.image_urls:
+            raise DownloadError(404, '다운로드할 이미지를 찾을 수 없습니다.')
+
+        async def build(f):
+            download = DownloadResult()
+            await write_zip(f, image_downloader.iter_images(result.image_urls, download))
+            if download.succeeded == 0:
+                raise DownloadError(500, '이미지를 다운로드하는 데 실패했습니다.')
+            # 받지 못한 이미지가 있으면 실제로 담긴 내용의 지문으로 저장
+            failed = {url for url, _ in download.failures}
+            return _fingerprint([url for url in result.image_urls if url not in failed])
+
+        return await artifact_store.get_or_build(username, _fingerprint(result.image_urls), build)
+    except DownloadError:
+        raise
+    except Exception as e:
+        raise DownloadError(*describe_error(e, username))
+
+def send_archive(artifact: Artifact, filename: str):
+    """
+    저장된 아카이브를 ETag/Last-Modified와 함께 보냅니다. GET 요청의 If-None-Match/If-Modified-Since(304)와
+    Range/If-Range(206)는 werkzeug가 처리하며, WSGI 서버가 wsgi.file_wrapper를 제공하면 sendfile로 전송됩니다.
+    """
+    response = send_file(
+        os.path.abspath(artifact.path),
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name=filename,
+        conditional=True,
+        etag=artifact.etag,
+        last_modified=artifact.modified,
+    )
+    # 내용이 바뀌면 지문(ETag)이 바뀌므로 매번 재검증
+    response.cache_control.no_cache = True
+    return response
+
+def download_filename(username: str) -> str:
+    return f'{username}_instagram_photos.zip'
+
+BATCH_FILENAME = 'instagram_photos_batch.zip'
+
+def collect_component_stats() -> None:
+    """각 컴포넌트의 stats()에서 숫자 값만 골라 게이지에 반영합니다."""
+    components = {
+        'browser_pool': browser_pool.stats(),
+        'sessions': session_pool.stats(),
+        'profile_cache': profile_cache.stats(),
+        'image_cache': image_cache.stats() if image_cache is not None else {},
+        'download_flight': download_flight.stats(),
+        'memory_budget': memory_budget.stats(),
+        'jobs': job_manager.stats(),
+        'batch': batch_downloader.stats(),
+        'artifact_store': artifact_store.stats(),
+        'transcoder': image_transcoder.stats() if image_transcoder is not None else {},
+    }
+    for component, stats in components.items():
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                COMPONENT_STATS.set(value, component=component, stat=stat)
+            elif isinstance(value, dict):
+                for key, nested in value.items():
+                    if isinstance(nested, (int, float)):
+                        COMPONENT_STATS.set(nested, component=component, stat=f'{stat}_{key}')
+
+async def startup():
+    """
+    워커 시작 시 브라우저 풀을 미리 띄우고(warm) 다운로더 세션을 엽니다.
+    쿠키 파일이 없어도 서버는 시작하며, 스크래핑 요청에서 오류가 보고됩니다.
+    """
+    try:
+        await browser_pool.start(warm=True)
+    except Exception as e:
+        app.logger.error(f"브라우저 풀을 시작하지 못했습니다: {e}")
+    await image_downloader.start()
+    await job_manager.start()
+
+async def shutdown():
+    await job_manager.close()
+    await image_downloader.close()
+    if image_transcoder is not None:
+        image_transcoder.close()
+    await browser_pool.close()
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -14,43 +441,111 @@ def download():
     data = request.get_json()
     username = data.get('username')
 
-    if not username or not isinstance(username, str) or ' ' in username:
+    if not is_valid_username(username):
         return jsonify({'error': '유효하지 않은 계정명입니다.'}), 400
-    
-    try:
-        # 1. 스크래핑(비동기 함수 실행)
-        image_urls = asyncio.run(scrape_profile_page(username))
-        if not image_urls:
-            return jsonify({'error': '다운로드할 이미지를 찾을 수 없습니다.'}), 404
-        
-        # 2. 이미지 다운로드(비동기 함수 실행)
-        image_data = asyncio.run(download_images_as_bytes(image_urls))
-        if not image_data:
-            return jsonify({'error': '이미지를 다운로드하는 데 실패했습니다.'}), 500
-        
-        # 3. ZIP 파일로 압축
-        zip_bytes = create_zip_in_memory(image_data)
-
-        # 4. ZIP 파일 응답 생성
-        return Response(
-            zip_bytes,
-            mimetype='application/zip',
-            headers={'Content-Disposition':
-            f'attachment;filename={username}_instagram_photos.zip'}
-        )
-    
-    except ProfileNotFoundException as e:
-        return jsonify({'error': f"'{username}' 계정을 찾을 수 없습니다."}), 404
-    except ProfileIsPrivateException as e:
-        return jsonify({'error': f"'{username}' 계정은 비공개이거나 게시물이 없습니다."}), 403
-    except ScrapeTimeoutException as e:
-        return jsonify({'error': '인스타그램에서 응답이 없어 시간 초과되었습니다. 잠시 후 다시 시도해주세요.'}), 408 # 408 Request Timeout
-    except ZipCreationException as e:
-        return jsonify({'error': 'ZIP 파일 생성 중 오류가 발생했습니다.'}), 500
-    except Exception as e:
-        app.logger.error(f"An unexpected error occurred: {e}", exc_info=True)
-        return jsonify({'error': '알 수 없는 오류가 발생했습니다. 서버 로그를 확인하세요.'}), 500
-    
+
+    # 게시물이 바뀌지 않았고 저장된 아카이브가 있으면 다시 받지 않고 그대로 보냄
+    artifact = stored_archive(username)
+    if artifact is not None:
+        return send_archive(artifact, download_filename(username))
+
+    trace = Trace()
+    try:
+        image_data = run_async(open_profile_download(username, trace))
+    except DownloadError as e:
+        return jsonify({'error': e.message}), e.status
+
+    # 다운로드가 끝나는 대로 ZIP 조각을 전송하는 스트리밍 응답 생성
+    headers = {'Content-Disposition': f'attachment;filename={download_filename(username)}'}
+    if server_timing_enabled:
+        headers['Server-Timing'] = trace.server_timing()
+    return Response(
+        iterate_async(astream_zip(image_data, close_images=False)),
+        mimetype='application/zip',
+        headers=headers,
+    )
+
+@app.route('/archives/<username>')
+def archive(username):
+    if not is_valid_username(username):
+        return jsonify({'error': '유효하지 않은 계정명입니다.'}), 400
+
+    try:
+        artifact = run_async(build_archive(username))
+    except DownloadError as e:
+        return jsonify({'error': e.message}), e.status
+    return send_archive(artifact, download_filename(username))
+
+@app.route('/batch', methods=['POST'])
+def batch_download():
+    try:
+        usernames = batch_usernames(request.get_json(silent=True))
+    except DownloadError as e:
+        return jsonify({'error': e.message}), e.status
+
+    # 계정별 오류는 응답 상태 코드 대신 아카이브의 manifest.json에 기록되므로 바로 스트리밍을 시작
+    return Response(
+        iterate_async(astream_zip(batch_downloader.iter_images(usernames))),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment;filename={BATCH_FILENAME}'},
+    )
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    data = request.get_json(silent=True) or {}
+    username = data.get('username')
+
+    if not is_valid_username(username):
+        return jsonify({'error': '유효하지 않은 계정명입니다.'}), 400
+
+    try:
+        job = run_async(job_manager.submit(username, owner=request.remote_addr or 'unknown'))
+    except JobQueueFullException as e:
+        return jsonify({'error': str(e)}), 429
+
+    return jsonify(job.to_dict()), 202, {'Location': f'/jobs/{job.id}'}
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다. 만료되었을 수 있습니다.'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다. 만료되었을 수 있습니다.'}), 404
+    if job.stage == STAGE_FAILED:
+        status, message = job.error
+        return jsonify({'error': message}), status
+    if job.stage != STAGE_DONE:
+        return jsonify({'error': '작업이 아직 완료되지 않았습니다.', 'stage': job.stage}), 409
+
+    # 작업의 ZIP은 만들어진 뒤 바뀌지 않으므로 작업 ID를 ETag로 사용(Range로 이어받기 가능)
+    return send_file(
+        os.path.abspath(job.artifact_path),
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name=download_filename(job.username),
+        conditional=True,
+        etag=job.id,
+    )
+
+@app.route('/metrics')
+def metrics():
+    collect_component_stats()
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.after_request
+def count_request(response):
+    if request.endpoint not in (None, 'static', 'metrics'):
+        REQUESTS.inc(endpoint=request.endpoint, status=str(response.status_code))
+    return response
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # 개발용 서버. 운영 환경에서는 ASGI 서버로 실행합니다: uvicorn src.asgi:application
+    run_async(startup())
+    app.run(debug=True, use_reloader=False)
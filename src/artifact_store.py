@@ -0,0 +1,234 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Awaitable, BinaryIO, Callable, Dict, Iterable, List, Optional
+from .media_urls import media_key
+from .profile_cache import is_valid_username, normalize_username
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def archive_fingerprint(image_urls: Iterable[str], variant: str = '') -> str:
+    """
+    아카이브 내용의 지문. 이미지 URL들의 미디어 키 집합(순서, 서명, CDN 호스트와 무관)과
+    `variant`(예: 해상도 정책)로 계산하므로, 게시물이 바뀌지 않은 계정은 같은 지문을 갖습니다.
+    """
+    hasher = hashlib.sha256(variant.encode('utf-8'))
+    for key in sorted({media_key(url) for url in image_urls}):
+        hasher.update(b'\n' + key.encode('utf-8'))
+    return hasher.hexdigest()[:32]
+
+
+class Artifact:
+    """저장된 아카이브 하나. 한 번 저장된 파일은 바뀌지 않으므로 지문을 강한 ETag로 사용할 수 있습니다."""
+
+    def __init__(self, username: str, fingerprint: str, path: str):
+        self.username = username
+        self.fingerprint = fingerprint
+        self.path = path
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.modified = stat.st_mtime
+
+    @property
+    def etag(self) -> str:
+        return self.fingerprint
+
+
+class ArtifactStore:
+    """
+    완성된 ZIP 아카이브를 (계정, 내용 지문) 키로 보관하는 로컬 저장소.
+
+    - 파일은 `root/<계정>/<지문>.zip`에 저장되며, 임시 파일에 쓴 뒤 os.replace로 옮기므로 다 쓰지 않은 파일은 보이지 않습니다.
+    - 같은 키의 아카이브는 덮어쓰지 않습니다. 같은 ETag에 대해 항상 같은 바이트를 돌려줘야 Range 이어받기가 안전합니다.
+    - 같은 키의 생성은 한 번만 실행되며(single-flight), 요청한 클라이언트의 연결이 끊겨도 끝까지 진행되어 다음 요청이 이어받을 수 있습니다.
+    - 일부 이미지를 받지 못해 실제 지문으로 저장한 경우, 예상 지문 → 실제 지문 별칭(`root/<계정>/<예상 지문>.alias`)을
+      `alias_ttl`초 동안 남깁니다. 그동안은 예상 지문으로도 그 아카이브를 돌려주므로, 계속 실패하는 URL 때문에 요청마다
+      전체를 다시 받지 않습니다. 별칭이 만료되면 다음 요청에서 빠진 이미지를 다시 시도합니다.
+    - 만든 지 `ttl`초가 지났거나 전체 용량이 `max_bytes`를 넘으면 오래된 아카이브부터 삭제합니다.
+    - 동기 메서드(`get`, `evict`)는 파일 시스템을 직접 사용하므로, 이벤트 루프에서는 `aget`/`get_or_build`를 사용합니다
+      (파일 확인/이동/삭제와 정리를 스레드에서 실행).
+
+    사용 예:
+    store = ArtifactStore('.cache/archives')
+    artifact = await store.get_or_build(username, fingerprint, lambda f: write_zip(f, images))
+    """
+
+    def __init__(self, root: str, max_bytes: int = 10 * 1024 ** 3, ttl: float = 7 * 86400.0, alias_ttl: float = 600.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.alias_ttl = alias_ttl
+        os.makedirs(root, exist_ok=True)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.alias_hits = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def get(self, username: str, fingerprint: str) -> Optional[Artifact]:
+        """저장된 아카이브가 있고 만료되지 않았으면 반환합니다. 유효한 별칭이 있으면 별칭이 가리키는 아카이브를 반환합니다."""
+        aliased = False
+        try:
+            artifact = Artifact(username, fingerprint, self._path(username, fingerprint))
+        except FileNotFoundError:
+            actual = self._alias(username, fingerprint)
+            if actual is None:
+                return None
+            try:
+                artifact = Artifact(username, actual, self._path(username, actual))
+            except FileNotFoundError:
+                return None
+            aliased = True
+        if time.time() - artifact.modified >= self.ttl:
+            return None
+        with self._lock:
+            self.hits += 1
+            self.alias_hits += aliased
+        return artifact
+
+    async def get_or_build(
+        self,
+        username: str,
+        fingerprint: str,
+        build: Callable[[BinaryIO], Awaitable[Optional[str]]],
+    ) -> Artifact:
+        """
+        저장된 아카이브를 반환하거나, 없으면 `build(f)`로 임시 파일에 내용을 쓰게 한 뒤 저장하고 반환합니다.
+        일부 이미지를 받지 못하는 등 내용이 예상과 다르면 `build`는 실제 내용의 지문을 반환하며, 그 지문으로 저장되고
+        예상 지문에서의 별칭이 `alias_ttl`초 동안 남습니다(별칭이 만료된 뒤의 요청은 빠진 이미지를 다시 받습니다).
+        `build`가 예외를 내면 임시 파일을 지우고 예외를 그대로 전달합니다.
+        """
+        artifact = await self.aget(username, fingerprint)
+        if artifact is not None:
+            return artifact
+        key = (normalize_username(username), fingerprint)
+        return await self._flight.do(key, lambda: self._build(username, fingerprint, build))
+
+    async def aget(self, username: str, fingerprint: str) -> Optional[Artifact]:
+        """get()을 스레드에서 실행합니다(이벤트 루프용)."""
+        return await asyncio.to_thread(self.get, username, fingerprint)
+
+    async def _build(self, username: str, fingerprint: str, build: Callable[[BinaryIO], Awaitable[Optional[str]]]) -> Artifact:
+        path = self._path(username, fingerprint)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            f = await asyncio.to_thread(_open_tmp, tmp_path)
+            try:
+                actual = await build(f)
+            finally:
+                await asyncio.to_thread(f.close)
+            if actual and actual != fingerprint:
+                await asyncio.to_thread(self._write_alias, username, fingerprint, actual)
+                fingerprint = actual
+                path = self._path(username, fingerprint)
+            artifact = await asyncio.to_thread(_commit, tmp_path, username, fingerprint, path)
+        except BaseException:
+            await asyncio.to_thread(_discard, tmp_path)
+            raise
+        with self._lock:
+            self.builds += 1
+        logger.info(f"아카이브 저장: {path}")
+        await asyncio.to_thread(self.evict)
+        return artifact
+
+    def _alias(self, username: str, fingerprint: str) -> Optional[str]:
+        path = self._path(username, fingerprint, '.alias')
+        try:
+            if time.time() - os.stat(path).st_mtime >= self.alias_ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_alias(self, username: str, expected: str, actual: str) -> None:
+        if self.alias_ttl <= 0:
+            return
+        path = self._path(username, expected, '.alias')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(actual)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 별칭은 재생성을 줄이기 위한 것이므로 저장하지 못해도 아카이브는 그대로 사용
+            logger.warning(f"아카이브 별칭 저장 실패: {path}, 오류: {e}")
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """만료된 아카이브와, 용량을 넘는 만큼의 오래된 아카이브를 삭제하고 삭제한 개수를 반환합니다. 만료된 별칭도 함께 지웁니다."""
+        now = time.time() if now is None else now
+        files: List[tuple] = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.endswith('.alias'):
+                    try:
+                        if now - os.stat(path).st_mtime >= self.alias_ttl:
+                            os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if not name.endswith('.zip'):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for modified, size, path in sorted(files):
+            if now - modified < self.ttl and total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.evictions += evicted
+        if evicted:
+            logger.info(f"아카이브 {evicted}개를 정리했습니다.")
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'alias_hits': self.alias_hits, 'builds': self.builds, 'evictions': self.evictions, **self._flight.stats()}
+
+    def _path(self, username: str, fingerprint: str, suffix: str = '.zip') -> str:
+        return os.path.join(self.root, _safe_dirname(username), f'{fingerprint}{suffix}')
+
+
+def _open_tmp(tmp_path: str) -> BinaryIO:
+    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+    return open(tmp_path, 'wb')
+
+
+def _commit(tmp_path: str, username: str, fingerprint: str, path: str) -> Artifact:
+    # 다른 프로세스가 먼저 저장했으면 그 파일을 유지(같은 ETag의 바이트가 바뀌지 않도록)
+    if os.path.exists(path):
+        os.unlink(tmp_path)
+    else:
+        os.replace(tmp_path, path)
+    return Artifact(username, fingerprint, path)
+
+
+def _discard(tmp_path: str) -> None:
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+
+
+def _safe_dirname(username: str) -> str:
+    """계정명을 디렉터리 이름으로 씁니다. 인스타그램 계정명에 쓸 수 없는 문자가 있으면(경로 조작 방지) 해시를 사용합니다."""
+    name = normalize_username(username)
+    if is_valid_username(name) and name.strip('.'):
+        return name
+    return '_' + hashlib.sha256(name.encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,258 @@
+# 운영 환경용 ASGI 엔트리포인트: uvicorn src.asgi:application --host 0.0.0.0 --port 5000 --workers 2
+# 워커마다 하나의 이벤트 루프(서버의 루프)에서 브라우저 풀, 다운로더 세션, 스크래퍼가 모두 실행됩니다.
+# - /download, /batch 는 ASGI로 직접 처리하여 스레드를 점유하지 않고 ZIP 조각을 스트리밍합니다.
+# - GET /archives/<username> 도 ASGI로 직접 처리하여 아카이브 생성과 파일 전송(304/206 포함)이 스레드를 점유하지 않습니다.
+# - 그 밖의 라우트(페이지, 정적 파일 등)는 asgiref의 WsgiToAsgi를 통해 Flask 앱으로 전달합니다.
+import os
+import json
+import asyncio
+import logging
+from email.utils import formatdate
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import parse_date, parse_etags, parse_if_range_header, parse_range_header
+from . import app as web
+from .metrics import REQUESTS, Trace
+from .utils import astream_zip
+
+logger = logging.getLogger(__name__)
+
+flask_asgi = WsgiToAsgi(web.app)
+
+# 저장된 아카이브를 서버가 pathsend 확장을 지원하지 않을 때(또는 Range 요청일 때) 읽어 보내는 단위
+FILE_CHUNK_SIZE = 256 * 1024
+
+ARCHIVES_PREFIX = '/archives/'
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            break
+    return body
+
+
+async def _send_json(send, status: int, payload: dict) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def download(scope, receive, send) -> None:
+    """POST /download 를 이벤트 루프에서 직접 처리하는 ASGI 핸들러. 동작과 오류 응답은 Flask 라우트와 같습니다."""
+    try:
+        data = json.loads(await _read_body(receive) or b'null')
+    except ValueError:
+        data = None
+    username = data.get('username') if isinstance(data, dict) else None
+
+    if not web.is_valid_username(username):
+        REQUESTS.inc(endpoint='download', status='400')
+        await _send_json(send, 400, {'error': '유효하지 않은 계정명입니다.'})
+        return
+
+    # 저장된 아카이브 확인(stat, 별칭 읽기)은 파일 시스템을 사용하므로 스레드에서
+    artifact = await asyncio.to_thread(web.stored_archive, username)
+    if artifact is not None:
+        await _send_artifact(scope, send, artifact, web.download_filename(username))
+        return
+
+    trace = Trace()
+    try:
+        image_data = await web.open_profile_download(username, trace)
+    except web.DownloadError as e:
+        REQUESTS.inc(endpoint='download', status=str(e.status))
+        await _send_json(send, e.status, {'error': e.message})
+        return
+
+    REQUESTS.inc(endpoint='download', status='200')
+    headers = []
+    if web.server_timing_enabled:
+        headers.append((b'server-timing', trace.server_timing().encode()))
+    # 공유 스트림(download_flight)의 이미지는 스트림 쪽에서 반납
+    await _send_zip(send, web.download_filename(username), image_data, headers, close_images=False)
+
+
+async def batch(scope, receive, send) -> None:
+    """POST /batch 를 이벤트 루프에서 직접 처리하는 ASGI 핸들러. 동작과 오류 응답은 Flask 라우트와 같습니다."""
+    try:
+        data = json.loads(await _read_body(receive) or b'null')
+    except ValueError:
+        data = None
+    try:
+        usernames = web.batch_usernames(data)
+    except web.DownloadError as e:
+        REQUESTS.inc(endpoint='batch_download', status=str(e.status))
+        await _send_json(send, e.status, {'error': e.message})
+        return
+
+    REQUESTS.inc(endpoint='batch_download', status='200')
+    await _send_zip(send, web.BATCH_FILENAME, web.batch_downloader.iter_images(usernames))
+
+
+async def archive(scope, receive, send) -> None:
+    """
+    GET /archives/<username> 을 이벤트 루프에서 직접 처리하는 ASGI 핸들러. 아카이브 생성(build_archive)을 루프에서 기다리고,
+    저장된 파일은 If-None-Match/If-Modified-Since(304)와 Range/If-Range(206)를 반영해 보냅니다. 동작은 Flask 라우트와 같습니다.
+    """
+    username = scope['path'][len(ARCHIVES_PREFIX):]
+    if not web.is_valid_username(username):
+        REQUESTS.inc(endpoint='archive', status='400')
+        await _send_json(send, 400, {'error': '유효하지 않은 계정명입니다.'})
+        return
+
+    try:
+        artifact = await web.build_archive(username)
+    except web.DownloadError as e:
+        REQUESTS.inc(endpoint='archive', status=str(e.status))
+        await _send_json(send, e.status, {'error': e.message})
+        return
+    await _send_artifact(scope, send, artifact, web.download_filename(username), endpoint='archive')
+
+
+async def _send_zip(send, filename: str, image_data, extra_headers=(), close_images: bool = True) -> None:
+    """(파일명, 이미지 내용) 스트림을 ZIP 조각으로 바꿔 200 응답으로 스트리밍합니다."""
+    headers = [
+        (b'content-type', b'application/zip'),
+        (b'content-disposition', f'attachment;filename={filename}'.encode('utf-8')),
+        *extra_headers,
+    ]
+    chunks = astream_zip(image_data, close_images=close_images)
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': headers,
+        })
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        # 클라이언트 연결이 끊긴 경우 남은 다운로드를 취소
+        await chunks.aclose()
+
+
+async def _send_artifact(scope, send, artifact, filename: str, endpoint: str = 'download') -> None:
+    """
+    저장된 아카이브 파일을 보냅니다. GET/HEAD 요청은 조건부 요청(304)과 단일 Range(206, 범위 밖이면 416)를 처리합니다.
+    파일 전체를 보낼 때 서버가 `http.response.pathsend` 확장을 지원하면 파일 경로만 넘겨 서버가 직접(sendfile 등) 보내게 하고,
+    아니면 스레드에서 조각씩 읽어 보냅니다.
+    """
+    request_headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+    conditional = scope['method'] in ('GET', 'HEAD')
+    headers = [
+        (b'etag', f'"{artifact.etag}"'.encode()),
+        (b'last-modified', formatdate(artifact.modified, usegmt=True).encode()),
+        # 내용이 바뀌면 지문(ETag)이 바뀌므로 매번 재검증
+        (b'cache-control', b'no-cache'),
+        (b'accept-ranges', b'bytes'),
+    ]
+    if conditional and _not_modified(request_headers, artifact):
+        REQUESTS.inc(endpoint=endpoint, status='304')
+        await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    headers += [
+        (b'content-type', b'application/zip'),
+        (b'content-disposition', f'attachment;filename={filename}'.encode('utf-8')),
+    ]
+    start, stop = 0, artifact.size
+    status = 200
+    if conditional and 'range' in request_headers and _if_range_matches(request_headers, artifact):
+        requested = parse_range_header(request_headers['range'])
+        span = requested.range_for_length(artifact.size) if requested is not None else None
+        if requested is not None and len(requested.ranges) == 1:
+            if span is None:
+                REQUESTS.inc(endpoint=endpoint, status='416')
+                headers = [(b'content-range', f'bytes */{artifact.size}'.encode())]
+                await send({'type': 'http.response.start', 'status': 416, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            start, stop = span
+            status = 206
+            headers.append((b'content-range', f'bytes {start}-{stop - 1}/{artifact.size}'.encode()))
+        # 여러 구간(multipart/byteranges)은 지원하지 않으며 Range를 무시하고 전체를 보냄
+
+    REQUESTS.inc(endpoint=endpoint, status=str(status))
+    headers.append((b'content-length', str(stop - start).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    if scope['method'] == 'HEAD':
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    if status == 200 and 'http.response.pathsend' in scope.get('extensions', {}):
+        await send({'type': 'http.response.pathsend', 'path': os.path.abspath(artifact.path)})
+        return
+    with open(artifact.path, 'rb') as f:
+        await asyncio.to_thread(f.seek, start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def _not_modified(request_headers: dict, artifact) -> bool:
+    """If-None-Match(약한 비교)가 있으면 그것으로, 없으면 If-Modified-Since로 304 여부를 판단합니다."""
+    if 'if-none-match' in request_headers:
+        etags = parse_etags(request_headers['if-none-match'])
+        return etags.star_tag or etags.contains_weak(artifact.etag)
+    since = parse_date(request_headers.get('if-modified-since'))
+    return since is not None and int(artifact.modified) <= since.timestamp()
+
+
+def _if_range_matches(request_headers: dict, artifact) -> bool:
+    """If-Range가 없거나 현재 파일과 일치하면(ETag는 강한 비교) Range를 적용합니다. 일치하지 않으면 전체를 보냅니다."""
+    if 'if-range' not in request_headers:
+        return True
+    if_range = parse_if_range_header(request_headers['if-range'])
+    if if_range.etag is not None:
+        return if_range.etag == artifact.etag
+    return if_range.date is not None and int(artifact.modified) <= if_range.date.timestamp()
+
+
+async def lifespan(scope, receive, send) -> None:
+    """워커 시작 시 서버의 루프를 공용 루프로 등록하고 브라우저 풀/다운로더를 준비합니다."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            web.use_event_loop(asyncio.get_running_loop())
+            try:
+                await web.startup()
+            except Exception as e:
+                logger.error(f"시작 중 오류 발생: {e}", exc_info=True)
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await web.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send) -> None:
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/download' and scope['method'] == 'POST':
+        await download(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/batch' and scope['method'] == 'POST':
+        await batch(scope, receive, send)
+    elif (scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD') and scope['path'].startswith(ARCHIVES_PREFIX)
+            and '/' not in scope['path'][len(ARCHIVES_PREFIX):]):
+        await archive(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
@@ -0,0 +1,182 @@
+import json
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Tuple
+from .downloader import DownloadResult, ImageData, ImageDownloader
+from .profile_cache import normalize_username
+from .utils import release_image
+
+logger = logging.getLogger(__name__)
+
+# 아카이브 마지막에 추가하는 계정별 결과 파일
+MANIFEST_NAME = 'manifest.json'
+
+
+class BatchEntry:
+    """배치 안에서 계정 하나의 처리 결과."""
+
+    def __init__(self, username: str):
+        self.username = username
+        self.status = 'pending'
+        self.images = 0
+        self.download = DownloadResult()
+        self.error = None
+        self.error_status = None
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        entry = {
+            'username': self.username,
+            'status': self.status,
+            'images': self.images,
+            'failed_images': self.download.failed,
+        }
+        if self.error is not None:
+            entry['error_status'] = self.error_status
+            entry['error'] = self.error
+        if self.started_at is not None and self.finished_at is not None:
+            entry['seconds'] = round(self.finished_at - self.started_at, 3)
+        return entry
+
+
+def unique_usernames(usernames: List[str]) -> List[str]:
+    """대소문자/@ 표기만 다른 중복 계정을 처음 나온 것만 남기고 제거합니다."""
+    seen = set()
+    unique = []
+    for username in usernames:
+        key = normalize_username(username)
+        if key not in seen:
+            seen.add(key)
+            unique.append(username)
+    return unique
+
+
+class BatchDownloader:
+    """
+    여러 계정을 한 번에 받아 계정별 폴더(`<username>/<파일명>`)로 된 하나의 아카이브 항목 스트림을 만듭니다.
+
+    - 최대 `parallelism`개 계정을 동시에 스크래핑하며, 브라우저 풀과 다운로더 세션(커넥션 풀)은 모든 계정이 공유합니다.
+    - 계정마다 스크래핑 중 발견한 URL을 바로 다운로드하고(iter_images_stream), 끝난 이미지는 도착 순서대로 내보냅니다.
+      소비자(ZIP 전송)가 느리면 `queue_size`에서 막혀 다운로드와 스크래핑도 함께 멈춥니다.
+    - 계정 하나의 오류(계정 없음, 비공개, 타임아웃 등)는 배치를 중단하지 않고 마지막 manifest.json에 기록됩니다.
+      도중에 실패한 계정의 이미 받은 이미지는 아카이브에 남습니다.
+
+    사용 예:
+    batch = BatchDownloader(iter_image_urls, downloader, describe_error)
+    async for arcname, data in batch.iter_images(['user_a', 'user_b']):
+        ...
+    """
+
+    def __init__(
+        self,
+        iter_image_urls: Callable[[str], AsyncIterator[str]],
+        downloader: ImageDownloader,
+        describe_error: Callable[[Exception, str], Tuple[int, str]],
+        parallelism: int = 2,
+        queue_size: int = 32,
+    ):
+        self.iter_image_urls = iter_image_urls
+        self.downloader = downloader
+        self.describe_error = describe_error
+        self.parallelism = parallelism
+        self.queue_size = queue_size
+        self.active = 0
+        self.batches = 0
+        self.profiles_succeeded = 0
+        self.profiles_failed = 0
+
+    async def iter_images(self, usernames: List[str]) -> AsyncIterator[Tuple[str, ImageData]]:
+        """(아카이브 내부 경로, 이미지 내용) 튜플을 내보내고, 마지막으로 manifest.json을 내보내는 비동기 제너레이터."""
+        entries = [BatchEntry(username) for username in unique_usernames(usernames)]
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        limit = asyncio.Semaphore(self.parallelism)
+        batch_done = object()
+        started_at = time.time()
+        self.batches += 1
+        self.active += 1
+
+        async def run_all() -> None:
+            try:
+                await asyncio.gather(*(self._run_profile(entry, limit, queue) for entry in entries))
+            finally:
+                await queue.put(batch_done)
+
+        runner = asyncio.ensure_future(run_all())
+        try:
+            while True:
+                item = await queue.get()
+                if item is batch_done:
+                    break
+                yield item
+            await runner
+            yield MANIFEST_NAME, self._manifest(entries, started_at)
+        finally:
+            # 소비자가 중간에 멈춘 경우(클라이언트 연결 종료 등) 남은 스크래핑/다운로드를 취소
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            # 소비자가 받아 가지 않은 이미지의 스풀 반납
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not batch_done:
+                    release_image(item)
+            self.active -= 1
+
+    async def _run_profile(self, entry: BatchEntry, limit: asyncio.Semaphore, queue: asyncio.Queue) -> None:
+        async with limit:
+            entry.status = 'running'
+            entry.started_at = time.time()
+            found = 0
+
+            async def image_urls():
+                nonlocal found
+                urls = self.iter_image_urls(entry.username)
+                try:
+                    async for url in urls:
+                        found += 1
+                        yield url
+                finally:
+                    await urls.aclose()
+
+            try:
+                async for filename, data in self.downloader.iter_images_stream(image_urls(), entry.download):
+                    await queue.put((f'{entry.username}/{filename}', data))
+                    entry.images += 1
+                if not found:
+                    self._fail(entry, 404, '다운로드할 이미지를 찾을 수 없습니다.')
+                elif not entry.images:
+                    self._fail(entry, 500, '이미지를 다운로드하는 데 실패했습니다.')
+                else:
+                    entry.status = 'ok'
+                    self.profiles_succeeded += 1
+            except Exception as e:
+                self._fail(entry, *self.describe_error(e, entry.username))
+            finally:
+                entry.finished_at = time.time()
+                logger.info(f"배치 계정 처리 완료: {entry.username} ({entry.status}, {entry.download.summary()})")
+
+    def _fail(self, entry: BatchEntry, status: int, message: str) -> None:
+        entry.status = 'error'
+        entry.error_status = status
+        entry.error = message
+        self.profiles_failed += 1
+
+    @staticmethod
+    def _manifest(entries: List[BatchEntry], started_at: float) -> bytes:
+        manifest = {
+            'started_at': started_at,
+            'finished_at': time.time(),
+            'succeeded': sum(entry.status == 'ok' for entry in entries),
+            'failed': sum(entry.status == 'error' for entry in entries),
+            'profiles': [entry.to_dict() for entry in entries],
+        }
+        return json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'active': self.active,
+            'batches': self.batches,
+            'profiles_succeeded': self.profiles_succeeded,
+            'profiles_failed': self.profiles_failed,
+        }
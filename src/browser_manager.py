@@ -1,41 +1,406 @@
 import os
+import time
+import asyncio
+import logging
 from contextlib import asynccontextmanager
-from playwright.async_api import Playwright, Page, Browser
-from typing import AsyncIterator
+from urllib.parse import urlsplit
+from playwright.async_api import Playwright, Page, Browser, BrowserContext, Route, async_playwright
+from typing import AsyncIterator, Dict, Optional
+from .metrics import span
+from .session_pool import Session, SessionBlockedException, SessionPool
+
+logger = logging.getLogger(__name__)
 
 class CookieFileNotFoundException(Exception):
     """로그인 쿠키 파일을 찾을 수 없을 때 발생하는 예외"""
     pass
 
+def _ensure_cookie_file(cookie_file_path: str) -> None:
+    if not os.path.exists(cookie_file_path):
+        raise CookieFileNotFoundException(
+            f"로그인 쿠키 파일({cookie_file_path})을 찾을 수 없습니다. "
+            "스크래퍼를 실행하기 전에 쿠키를 추출하여 프로젝트 루트에 저장해주세요."
+        )
+
 @asynccontextmanager
 async def get_authenticated_page(playwright: Playwright, cookie_file_path: str = 'instagram_cookies.json') -> AsyncIterator[Page]:
     """
     쿠키를 사용하여 인증된 Playwright 페이지 객체를 생성하는 컨텍스트 매니저.
-    
+
     사용 예:
     async with async_playwright() as p:
         async with get_authenticated_page(p) as page:
             await page.goto(...)
-            
+
     Args:
         playwright (Playwright): Playwright 인스턴스.
         cookie_file_path (str): 사용할 쿠키 파일의 경로.
-        
+
     Yields
         Page: 인증된 페이지 객체.
-        
+
     Raises:
         CookieFileNotFoundException: 쿠키 파일을 찾을 수 없을 때.
     """
-    if not os.path.exists(cookie_file_path):
-        raise CookieFileNotFoundException(
-            f"로그인 쿠키 파일({cookie_file_path})을 찾을 수 없습니다. "
-            "스크래퍼를 실행하기 전에 쿠키를 추출하여 프로젝트 루트에 저장해주세요."
-        )
-    
-    browser: Browser = await playwright.chromium.launch(headless=True)
+    _ensure_cookie_file(cookie_file_path)
+
+    with span('launch'):
+        browser: Browser = await playwright.chromium.launch(headless=True)
     try:
         context = await browser.new_context(storage_state=cookie_file_path)
         yield await context.new_page()
     finally:
-        await browser.close()
\ No newline at end of file
+        await browser.close()
+
+
+class _PooledBrowser:
+    """풀에서 관리되는 브라우저 슬롯 하나. 브라우저와 세션(계정)별 컨텍스트, 사용 통계를 보관합니다."""
+
+    def __init__(self, slot_id: int):
+        self.slot_id = slot_id
+        self.browser: Optional[Browser] = None
+        self.contexts: Dict[str, BrowserContext] = {}
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.browser is not None
+
+    def is_healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    async def drop_context(self, session_name: str) -> None:
+        """세션의 컨텍스트를 닫습니다. 다음 사용 때 쿠키 파일을 다시 읽어 새로 만듭니다."""
+        context = self.contexts.pop(session_name, None)
+        if context is not None:
+            try:
+                await context.close()
+            except Exception as e:
+                logger.warning(f"컨텍스트 종료 중 오류 발생 (슬롯 {self.slot_id}, 세션 {session_name}): {e}")
+
+    async def close(self) -> None:
+        browser, self.browser = self.browser, None
+        self.contexts = {}
+        self.uses = 0
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning(f"브라우저 종료 중 오류 발생 (슬롯 {self.slot_id}): {e}")
+
+
+class BrowserPool:
+    """
+    미리 띄워 둔(warm) Chromium 브라우저/컨텍스트를 재사용하는 풀.
+
+    요청마다 브라우저를 새로 실행하는 대신, 쿠키가 적용된 컨텍스트를 체크아웃하여
+    새 페이지만 열고, 사용이 끝나면 풀에 반환합니다.
+
+    - `sessions`(SessionPool)가 주어지면 페이지마다 계정(쿠키 파일)을 하나 배정받아 그 계정의 컨텍스트에서 페이지를 엽니다.
+      없으면 `cookie_file_path` 하나만 쓰는 제한 없는 세션 풀을 사용합니다.
+    - 페이지 사용 중 SessionBlockedException(요청 제한, 로그인 화면)이 나면 그 세션은 쿨다운에 들어가고,
+      이 슬롯의 해당 컨텍스트는 닫혀 다음 사용 때 쿠키 파일을 다시 읽습니다.
+
+    - 체크아웃 시 헬스 체크(연결 끊김 확인)를 수행하여 죽은 브라우저는 재시작합니다.
+    - `max_uses`회 사용된 브라우저는 메모리 누수를 막기 위해 재시작(recycle)합니다.
+    - `idle_timeout`초 이상 사용되지 않은 브라우저는 백그라운드에서 종료(evict)되며,
+      다음 체크아웃 시 다시 실행됩니다.
+
+    사용 예:
+    pool = BrowserPool(size=2)
+    await pool.start()
+    async with pool.page() as page:
+        await page.goto(...)
+    await pool.close()
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        cookie_file_path: str = 'instagram_cookies.json',
+        max_uses: int = 50,
+        idle_timeout: float = 300.0,
+        headless: bool = True,
+        sessions: Optional[SessionPool] = None,
+    ):
+        if size < 1:
+            raise ValueError("브라우저 풀 크기는 1 이상이어야 합니다.")
+        self.size = size
+        self.cookie_file_path = cookie_file_path
+        self.sessions = sessions or SessionPool([cookie_file_path])
+        self.max_uses = max_uses
+        self.idle_timeout = idle_timeout
+        self.headless = headless
+
+        self._playwright: Optional[Playwright] = None
+        self._playwright_manager = None
+        self._slots = [_PooledBrowser(i) for i in range(size)]
+        self._idle: Optional[asyncio.Queue] = None
+        self._reaper_task: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._started = False
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self, warm: bool = True) -> None:
+        """
+        Playwright를 시작하고 풀을 초기화합니다. `warm`이 True이면 모든 슬롯의 브라우저를 미리 실행합니다.
+
+        Raises:
+            CookieFileNotFoundException: 쿠키 파일을 찾을 수 없을 때.
+        """
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            for path in self.sessions.storage_state_paths:
+                _ensure_cookie_file(path)
+
+            self._playwright_manager = async_playwright()
+            self._playwright = await self._playwright_manager.start()
+            self._idle = asyncio.Queue()
+            for slot in self._slots:
+                self._idle.put_nowait(slot)
+
+            if warm:
+                try:
+                    await asyncio.gather(*(self._launch(slot) for slot in self._slots))
+                except Exception:
+                    # 일부만 실행된 상태로 남지 않도록 정리한 뒤 예외를 전달
+                    await asyncio.gather(*(slot.close() for slot in self._slots))
+                    await self._playwright_manager.__aexit__(None, None, None)
+                    self._playwright = None
+                    self._playwright_manager = None
+                    raise
+            if self.idle_timeout > 0:
+                self._reaper_task = asyncio.create_task(self._reap_idle())
+            self._started = True
+            logger.info(f"브라우저 풀 시작 (크기: {self.size}, warm: {warm})")
+
+    async def close(self) -> None:
+        """모든 브라우저를 종료하고 Playwright를 정지합니다."""
+        if not self._started:
+            return
+        self._started = False
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+            self._reaper_task = None
+        await asyncio.gather(*(slot.close() for slot in self._slots))
+        if self._playwright_manager is not None:
+            await self._playwright_manager.__aexit__(None, None, None)
+        self._playwright = None
+        self._playwright_manager = None
+        logger.info("브라우저 풀 종료")
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """
+        풀에서 브라우저를 체크아웃한 뒤 세션(계정)을 배정받아 인증된 새 페이지를 제공하는 컨텍스트 매니저.
+        풀이 시작되지 않았다면 먼저 시작합니다. 브라우저는 반환될 때까지, 세션은 요청 제한에 따라 대기할 수 있습니다.
+        브라우저를 기다리는 동안에는 세션의 토큰을 쓰지 않고 사용 시간에도 포함하지 않도록 브라우저를 먼저 받습니다.
+
+        Raises:
+            NoSessionAvailableException: 사용할 수 있는 세션이 없을 때(모두 쿨다운 중 등).
+        """
+        if not self._started:
+            await self.start(warm=False)
+
+        slot: _PooledBrowser = await self._idle.get()
+        try:
+            async with self.sessions.session() as session:
+                page = None
+                blocked = False
+                try:
+                    await self._prepare(slot)
+                    context = await self._context(slot, session)
+                    slot.uses += 1
+                    page = await context.new_page()
+                    try:
+                        yield page
+                    except SessionBlockedException:
+                        blocked = True
+                        raise
+                    if self.sessions.save_due(session):
+                        await self._save_storage_state(session, context)
+                finally:
+                    if page is not None:
+                        try:
+                            await page.close()
+                        except Exception:
+                            # 페이지를 닫지 못했다면 브라우저 상태를 신뢰할 수 없으므로 다음 체크아웃 때 재시작
+                            await slot.close()
+                    if blocked:
+                        await slot.drop_context(session.name)
+        finally:
+            slot.last_used = time.monotonic()
+            self._idle.put_nowait(slot)
+
+    def stats(self) -> dict:
+        """풀 상태(열린 브라우저 수, 대기 중인 슬롯 수, 슬롯별 사용 횟수)를 반환합니다."""
+        return {
+            'size': self.size,
+            'open': sum(1 for slot in self._slots if slot.is_open),
+            'idle': self._idle.qsize() if self._idle is not None else 0,
+            'uses': [slot.uses for slot in self._slots],
+        }
+
+    async def _prepare(self, slot: _PooledBrowser) -> None:
+        if slot.is_open and not slot.is_healthy():
+            logger.warning(f"비정상 브라우저 감지, 재시작합니다 (슬롯 {slot.slot_id})")
+            await slot.close()
+        elif slot.is_open and slot.uses >= self.max_uses:
+            logger.info(f"최대 사용 횟수({self.max_uses}) 도달, 브라우저를 재시작합니다 (슬롯 {slot.slot_id})")
+            await slot.close()
+        if not slot.is_open:
+            await self._launch(slot)
+
+    async def _launch(self, slot: _PooledBrowser) -> None:
+        """브라우저를 실행하고 모든 세션의 컨텍스트를 미리 만듭니다."""
+        with span('launch'):
+            browser = await self._playwright.chromium.launch(headless=self.headless)
+            try:
+                contexts = {
+                    session.name: await browser.new_context(storage_state=session.storage_state_path)
+                    for session in self.sessions.sessions
+                }
+            except Exception:
+                await browser.close()
+                raise
+        slot.browser, slot.contexts = browser, contexts
+        slot.uses = 0
+        slot.last_used = time.monotonic()
+
+    async def _context(self, slot: _PooledBrowser, session: Session) -> BrowserContext:
+        context = slot.contexts.get(session.name)
+        if context is None:
+            context = await slot.browser.new_context(storage_state=session.storage_state_path)
+            slot.contexts[session.name] = context
+        return context
+
+    async def _save_storage_state(self, session: Session, context: BrowserContext) -> None:
+        """갱신된 쿠키를 세션의 쿠키 파일에 다시 씁니다. 실패해도 스크래핑 결과에는 영향을 주지 않습니다."""
+        try:
+            await self.sessions.save_storage_state(session, await context.storage_state())
+        except Exception as e:
+            logger.warning(f"세션 '{session.name}'의 쿠키를 저장하지 못했습니다: {e}")
+
+    async def _reap_idle(self) -> None:
+        interval = max(self.idle_timeout / 2, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            await self.evict_idle()
+
+    async def evict_idle(self) -> int:
+        """
+        `idle_timeout`초 이상 사용되지 않은 브라우저를 종료하고 종료한 개수를 반환합니다.
+        체크아웃 중인 슬롯은 건드리지 않습니다.
+        """
+        now = time.monotonic()
+        idle_slots = []
+        while not self._idle.empty():
+            idle_slots.append(self._idle.get_nowait())
+        evicted = 0
+        try:
+            for slot in idle_slots:
+                if slot.is_open and now - slot.last_used >= self.idle_timeout:
+                    await slot.close()
+                    evicted += 1
+        finally:
+            for slot in idle_slots:
+                self._idle.put_nowait(slot)
+        if evicted:
+            logger.info(f"유휴 브라우저 {evicted}개를 종료했습니다.")
+        return evicted
+
+
+# 스크래핑에 필요 없는 리소스 유형. URL만 수집하고 이미지는 나중에 aiohttp로 다시 받으므로 차단합니다.
+DEFAULT_BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font'})
+
+# 그리드 렌더링과 피드 XHR에 필요한 1st-party 도메인
+FIRST_PARTY_DOMAINS = ('instagram.com', 'cdninstagram.com', 'fbcdn.net', 'facebook.com')
+
+
+class ResourceBlockPolicy:
+    """
+    스크래핑 중 `page.route`로 불필요한 요청을 중단(abort)시키는 정책.
+
+    기본적으로 이미지/미디어/폰트와 1st-party가 아닌(추적 스크립트 등) 모든 요청을 차단하고,
+    그리드가 필요로 하는 문서/스크립트/스타일시트/XHR(JSON)은 허용합니다.
+    """
+
+    def __init__(
+        self,
+        blocked_types=DEFAULT_BLOCKED_RESOURCE_TYPES,
+        first_party_domains=FIRST_PARTY_DOMAINS,
+        block_third_party: bool = True,
+    ):
+        self.blocked_types = frozenset(blocked_types)
+        self.first_party_domains = tuple(first_party_domains)
+        self.block_third_party = block_third_party
+
+    def is_first_party(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ''
+        return any(host == domain or host.endswith('.' + domain) for domain in self.first_party_domains)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if url.startswith('data:'):
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        return self.block_third_party and not self.is_first_party(url)
+
+
+class NetworkUsage:
+    """페이지 하나의 요청 허용/차단 개수와 수신 바이트(Content-Length 기준)를 기록합니다."""
+
+    def __init__(self):
+        self.allowed = 0
+        self.blocked = 0
+        self.blocked_by_type: Dict[str, int] = {}
+        self.bytes_received = 0
+
+    def record_response(self, response) -> None:
+        try:
+            self.bytes_received += int(response.headers.get('content-length') or 0)
+        except ValueError:
+            pass
+
+    def as_dict(self) -> dict:
+        return {
+            'allowed': self.allowed,
+            'blocked': self.blocked,
+            'blocked_by_type': dict(self.blocked_by_type),
+            'bytes_received': self.bytes_received,
+        }
+
+
+async def apply_resource_policy(page: Page, policy: Optional[ResourceBlockPolicy]) -> NetworkUsage:
+    """
+    페이지에 리소스 차단 정책을 적용하고, 요청/전송량 통계를 기록할 NetworkUsage를 반환합니다.
+    `policy`가 None이면 차단 없이 통계만 기록합니다.
+    """
+    usage = NetworkUsage()
+
+    if policy is not None:
+        async def handle(route: Route) -> None:
+            request = route.request
+            if policy.should_block(request.resource_type, request.url):
+                usage.blocked += 1
+                usage.blocked_by_type[request.resource_type] = usage.blocked_by_type.get(request.resource_type, 0) + 1
+                await route.abort()
+            else:
+                usage.allowed += 1
+                await route.continue_()
+
+        await page.route('**/*', handle)
+
+    page.on('response', usage.record_response)
+    return usage
@@ -0,0 +1,96 @@
+import logging
+from typing import Any, Dict, List, Optional, Set, Union
+from playwright.async_api import Page
+from .media_urls import ResolutionPolicy, media_key
+
+logger = logging.getLogger(__name__)
+
+# 이전 호출 이후 새로 나타난 게시물/이미지만 돌려주는 스크립트.
+# 이미 보낸 항목은 페이지 안의 Set에 기록하므로, 가상화로 DOM에서 사라진 게시물도 잃지 않고
+# 호출 비용은 새 게시물 수에 비례합니다.
+_COLLECT_DELTA_JS = """
+() => {
+    const seen = window.__igExtracted || (window.__igExtracted = new Set());
+    const isCdn = (src) => (src || '').includes('scontent');
+    const posts = [];
+    document.querySelectorAll('a[href*="/p/"]').forEach(a => {
+        const m = (a.getAttribute('href') || '').match(/\\/p\\/([^\\/?#]+)/);
+        if (m === null || seen.has('p:' + m[1])) return;
+        const imgs = Array.from(a.querySelectorAll('img')).filter(img => isCdn(img.getAttribute('src')));
+        // 이미지가 아직 로드되지 않은 게시물은 다음 호출에서 다시 확인
+        if (imgs.length === 0) return;
+        seen.add('p:' + m[1]);
+        posts.push({
+            id: m[1],
+            images: imgs.map(img => ({src: img.getAttribute('src'), srcset: img.getAttribute('srcset') || ''})),
+        });
+    });
+    const images = [];
+    document.querySelectorAll('img').forEach(img => {
+        const src = img.getAttribute('src');
+        if (!isCdn(src) || seen.has('i:' + src)) return;
+        seen.add('i:' + src);
+        images.push({src: src, srcset: img.getAttribute('srcset') || ''});
+    });
+    return {posts: posts, images: images};
+}
+"""
+
+
+class DomMediaCollector:
+    """
+    스크롤 단계마다 작은 page.evaluate로 새로 나타난 게시물 링크와 이미지 src/srcset만 가져와 누적합니다.
+
+    페이지 전체를 직렬화해 파싱하지 않으므로 비용이 새 게시물 수에 비례하고,
+    그리드 가상화로 DOM에서 빠진 게시물도 놓치지 않습니다.
+    이미지마다 src와 srcset 후보 중 `resolution` 정책에 맞는 URL 하나를 고르고, 같은 사진(미디어 키)은 한 번만 모읍니다.
+    """
+
+    def __init__(self, resolution: Union[str, ResolutionPolicy, None] = None):
+        self.policy = ResolutionPolicy.parse(resolution)
+        self.post_ids: List[str] = []
+        self.post_images: Dict[str, List[str]] = {}
+        self._loose_images: List[str] = []
+        self._seen_images: Set[str] = set()
+        self.calls = 0
+
+    @property
+    def image_urls(self) -> List[str]:
+        """게시물에 속한 이미지 URL. 게시물 링크를 찾지 못했다면 페이지의 CDN 이미지 전체를 반환합니다."""
+        urls = [url for post_id in self.post_ids for url in self.post_images[post_id]]
+        return urls if urls else list(self._loose_images)
+
+    async def collect(self, page: Page) -> int:
+        """페이지에서 새 항목을 가져와 누적하고, 새로 발견한 게시물 수를 반환합니다."""
+        delta = await page.evaluate(_COLLECT_DELTA_JS)
+        self.calls += 1
+        return self.add_delta(delta)
+
+    def add_delta(self, delta: Any) -> int:
+        if not isinstance(delta, dict):
+            return 0
+        added = 0
+        for post in delta.get('posts') or []:
+            post_id = post.get('id')
+            if not post_id or post_id in self.post_images:
+                continue
+            urls = []
+            keys = set()
+            for image in post.get('images') or []:
+                url = self._choose(image)
+                if url and media_key(url) not in keys:
+                    keys.add(media_key(url))
+                    urls.append(url)
+            self.post_ids.append(post_id)
+            self.post_images[post_id] = urls
+            added += 1
+        for image in delta.get('images') or []:
+            url = self._choose(image)
+            if url and media_key(url) not in self._seen_images:
+                self._seen_images.add(media_key(url))
+                self._loose_images.append(url)
+        return added
+
+    def _choose(self, image: Dict[str, str]) -> Optional[str]:
+        src = image.get('src')
+        return self.policy.choose_image(src, image.get('srcset')) if src else None
@@ -0,0 +1,405 @@
+import time
+import random
+import asyncio
+import logging
+import email.utils
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+import aiohttp
+from .image_cache import ImageCache
+from .media_urls import FilenameAllocator, media_key
+from .metrics import DOWNLOAD_BYTES, DOWNLOAD_IMAGES, DOWNLOAD_RETRIES, observe_stage
+from .spool import MemoryBudget, SpooledImage, READ_CHUNK_SIZE
+from .transcoder import ImageTranscoder
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 가치가 있는 HTTP 상태 코드(일시적 오류, 스로틀링)
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# 다운로드한 이미지 내용: 메모리 한도가 설정된 다운로더는 SpooledImage, 아니면 bytes
+ImageData = Union[bytes, SpooledImage]
+
+
+class DownloadResult:
+    """
+    다운로드 한 번의 결과 요약. 성공/실패 개수와 전송량, 처리 속도를 제공합니다.
+    `download()`로 받은 경우 `images`에 (파일명, 이미지 내용) 튜플이 담깁니다.
+    """
+
+    def __init__(self):
+        self.images: List[Tuple[str, ImageData]] = []
+        self.failures: List[Tuple[str, str]] = []
+        self.succeeded = 0
+        self.bytes_downloaded = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def failed(self) -> int:
+        return len(self.failures)
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return max(end - self.started_at, 1e-9)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_downloaded / self.elapsed
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+
+    def summary(self) -> str:
+        return (
+            f"성공 {self.succeeded}개(캐시 {self.cache_hits}개), 실패 {self.failed}개, 재시도 {self.retries}회, "
+            f"{self.bytes_downloaded / 1024:.1f}KB, {self.bytes_per_second / 1024:.1f}KB/s"
+        )
+
+
+def filename_from_url(url: str) -> str:
+    """URL의 마지막 경로 부분을 파일명으로 사용합니다."""
+    return url.split('/')[-1].split('?')[0]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After 헤더(초 단위 또는 HTTP 날짜)를 대기 시간(초)으로 변환합니다."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class ImageDownloader:
+    """
+    CDN 이미지를 동시성 제한, 커넥션 풀 튜닝, 재시도/백오프와 함께 다운로드하는 엔진.
+
+    - 전체 동시 요청 수(`max_concurrency`)와 호스트별 동시 요청 수(`per_host_concurrency`)를 제한합니다.
+    - keep-alive, DNS 캐시가 설정된 TCPConnector를 사용하며, 세션은 여러 다운로드에서 재사용할 수 있습니다.
+    - 429/5xx/네트워크 오류는 지터가 적용된 지수 백오프로 재시도하며, Retry-After 헤더를 존중합니다.
+    - `cache`가 주어지면 네트워크 요청 전에 디스크 캐시를 먼저 확인하고, 받은 이미지는 캐시에 저장합니다.
+    - `memory_budget`(프로세스 전체 한도)이 주어지면 응답 본문을 조각 단위로 SpooledImage에 받습니다.
+      다운로드 호출 하나(요청/작업 하나)가 RAM에 둘 수 있는 양은 `request_memory_limit`으로 제한되며,
+      두 한도 중 하나라도 넘으면 이미지는 `spool_dir`의 임시 파일로 넘어갑니다. 이때 내보내는 이미지 내용은 bytes 대신 SpooledImage입니다.
+    - `transcoder`가 주어지면 받은 이미지를 내보내기 전에 다시 압축합니다. 변환을 기다리는 동안 다운로드 슬롯을 반납하지 않으므로
+      변환 프로세스 풀이 밀리면 다운로드도 그만큼 느려집니다(backpressure). 캐시에는 원본을 저장합니다.
+
+    사용 예:
+    async with ImageDownloader() as downloader:
+        result = await downloader.download(image_urls)
+        logger.info(result.summary())
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        per_host_concurrency: int = 8,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        total_timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        keepalive_timeout: float = 30.0,
+        dns_cache_ttl: int = 300,
+        cache: Optional[ImageCache] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        request_memory_limit: int = 32 * 1024 ** 2,
+        spool_dir: Optional[str] = None,
+        transcoder: Optional[ImageTranscoder] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout, sock_read=read_timeout)
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.cache = cache
+        self.memory_budget = memory_budget
+        self.request_memory_limit = request_memory_limit
+        self.spool_dir = spool_dir
+        self.transcoder = transcoder
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._global_limit = asyncio.Semaphore(max_concurrency)
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> 'ImageDownloader':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """커넥션 풀이 설정된 aiohttp 세션을 생성합니다. 이미 열려 있으면 아무것도 하지 않습니다."""
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.per_host_concurrency,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        await self._session.__aenter__()
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None:
+            await session.__aexit__(None, None, None)
+
+    def request_budget(self) -> Optional[MemoryBudget]:
+        """다운로드 호출 하나에 쓸 메모리 한도를 만듭니다. 스풀링을 사용하지 않으면 None을 반환합니다."""
+        if self.memory_budget is None:
+            return None
+        return MemoryBudget(self.request_memory_limit, parent=self.memory_budget)
+
+    async def download(self, image_urls: List[str]) -> DownloadResult:
+        """모든 이미지를 다운로드하고, 이미지와 통계가 담긴 DownloadResult를 반환합니다."""
+        result = DownloadResult()
+        async for image in self.iter_images(image_urls, result):
+            result.images.append(image)
+        return result
+
+    async def iter_images(
+        self,
+        image_urls: List[str],
+        result: Optional[DownloadResult] = None,
+        names: Optional[FilenameAllocator] = None,
+    ) -> AsyncIterator[Tuple[str, ImageData]]:
+        """
+        다운로드가 끝나는 순서대로 (파일명, 이미지 내용) 튜플을 내보내는 비동기 제너레이터.
+        `result`가 주어지면 성공/실패/전송량 통계를 기록합니다. 실패한 이미지는 건너뜁니다.
+        같은 사진(미디어 키)의 URL은 한 번만 받으며, 파일명은 아카이브 안에서 겹치지 않도록 정합니다.
+        이미 저장된 파일과도 겹치지 않게 하려면 그 이름들을 등록해 둔 `names`(FilenameAllocator)를 넘깁니다.
+        """
+        await self.start()
+        result = result if result is not None else DownloadResult()
+        budget = self.request_budget()
+        names = names if names is not None else FilenameAllocator()
+        unique_urls = list({media_key(url): url for url in reversed(image_urls)}.values())[::-1]
+        tasks = [asyncio.ensure_future(self.fetch(url, result, budget, names.assign(url), names)) for url in unique_urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                image = await next_done
+                if image is not None:
+                    yield image
+        finally:
+            # 소비자가 중간에 멈춘 경우(클라이언트 연결 종료 등) 남은 다운로드를 취소
+            for task in tasks:
+                task.cancel()
+            result.finish()
+            logger.info(f"이미지 다운로드 완료: {result.summary()}")
+
+    async def iter_images_stream(
+        self,
+        image_urls: AsyncIterable[str],
+        result: Optional[DownloadResult] = None,
+        max_pending: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[str, ImageData]]:
+        """
+        URL 목록 대신 URL 스트림(예: 스크롤 중인 스크래퍼)을 받아, URL이 도착하는 즉시 다운로드를 시작하는 iter_images.
+
+        아직 소비되지 않은 다운로드(진행 중 + 완료 대기)는 최대 `max_pending`개(기본: max_concurrency의 2배)로 제한되며,
+        가득 차면 URL 스트림을 더 읽지 않습니다. 따라서 소비자가 느리면 그 압력이 스크래퍼까지 전달됩니다(backpressure).
+        URL 스트림에서 발생한 예외는 이미 받은 이미지를 모두 내보낸 뒤 전달됩니다. 같은 사진(미디어 키)의 URL은 한 번만 받습니다.
+        """
+        result = result if result is not None else DownloadResult()
+        budget = self.request_budget()
+        window = asyncio.Semaphore(max_pending or self.max_concurrency * 2)
+        completed: asyncio.Queue = asyncio.Queue()
+        tasks: Set[asyncio.Future] = set()
+        feed_done = object()
+
+        async def feed() -> None:
+            seen: Set[str] = set()
+            names = FilenameAllocator()
+            try:
+                async for url in image_urls:
+                    key = media_key(url)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    # 세션은 첫 URL이 도착했을 때 연다(스크래핑이 실패하면 네트워크를 사용하지 않음)
+                    await self.start()
+                    await window.acquire()
+                    task = asyncio.ensure_future(self.fetch(url, result, budget, names.assign(url), names))
+                    tasks.add(task)
+                    task.add_done_callback(completed.put_nowait)
+            finally:
+                completed.put_nowait(feed_done)
+
+        feeder = asyncio.ensure_future(feed())
+        feeding = True
+        try:
+            while feeding or tasks:
+                done = await completed.get()
+                if done is feed_done:
+                    feeding = False
+                    continue
+                tasks.discard(done)
+                window.release()
+                image = done.result()
+                if image is not None:
+                    yield image
+            # URL 스트림(스크래핑)에서 발생한 예외 전달
+            await feeder
+        finally:
+            feeder.cancel()
+            for task in tasks:
+                task.cancel()
+            # 읽는 도중인 URL 스트림은 feeder가 멈춘 뒤에 닫을 수 있음
+            await asyncio.gather(feeder, return_exceptions=True)
+            if hasattr(image_urls, 'aclose'):
+                await image_urls.aclose()
+            result.finish()
+            logger.info(f"이미지 다운로드 완료: {result.summary()}")
+
+    async def fetch(
+        self,
+        url: str,
+        result: Optional[DownloadResult] = None,
+        budget: Optional[MemoryBudget] = None,
+        filename: Optional[str] = None,
+        names: Optional[FilenameAllocator] = None,
+    ) -> Optional[Tuple[str, ImageData]]:
+        """
+        단일 이미지를 재시도와 함께 다운로드하여 (파일명, 이미지 내용) 튜플로 반환합니다.
+        `budget`이 주어지면 응답 본문을 조각 단위로 받아 SpooledImage로, 아니면 bytes로 반환합니다.
+        `filename`이 없으면 URL의 마지막 경로 부분을 파일명으로 사용합니다. 변환으로 파일명(확장자)이 바뀌면
+        `names`(FilenameAllocator)가 주어진 경우 아카이브 안의 다른 파일명과 겹치지 않게 다시 정합니다.
+        재시도 후에도 실패하면 None을 반환하고 `result.failures`에 사유를 기록합니다.
+        """
+        result = result if result is not None else DownloadResult()
+        filename = filename or filename_from_url(url)
+        cached = await self._cache_get(url)
+        if cached is not None:
+            result.succeeded += 1
+            result.cache_hits += 1
+            DOWNLOAD_IMAGES.inc(result='cache_hit')
+            return await self._transcode(url, filename, cached, budget, names)
+
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        reason = "unknown"
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self._global_limit, self._host_limit(host):
+                    async with self._session.get(url) as response:
+                        if response.status == 200:
+                            image = await self._read_body(response, budget)
+                            await self._cache_put(url, image)
+                            result.succeeded += 1
+                            result.bytes_downloaded += len(image)
+                            # 재시도 대기 시간을 포함한 이미지 한 장의 소요 시간
+                            observe_stage('download', time.perf_counter() - started, started)
+                            DOWNLOAD_BYTES.inc(len(image))
+                            DOWNLOAD_IMAGES.inc(result='ok')
+                            logger.info(f"다운로드 성공: {filename}")
+                            return await self._transcode(url, filename, image, budget, names)
+                        reason = f"HTTP {response.status}"
+                        if response.status not in RETRYABLE_STATUSES:
+                            break
+                        if response.status == 429:
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = f"{type(e).__name__}: {e}"
+            except Exception as e:
+                logger.error(f"다운로드 중 오류 발생: {url}, 오류: {e}", exc_info=True)
+                reason = f"{type(e).__name__}: {e}"
+                break
+
+            if attempt < self.max_retries:
+                result.retries += 1
+                DOWNLOAD_RETRIES.inc()
+                # 세마포어를 반납한 상태에서 대기하여 다른 다운로드가 슬롯을 사용할 수 있게 함
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        logger.warning(f"다운로드 실패 ({reason}): {url}")
+        result.failures.append((url, reason))
+        DOWNLOAD_IMAGES.inc(result='failed')
+        return None
+
+    async def _read_body(self, response: aiohttp.ClientResponse, budget: Optional[MemoryBudget]) -> ImageData:
+        """응답 본문을 읽습니다. `budget`이 있으면 전체를 한 번에 올리지 않고 조각 단위로 스풀에 받습니다."""
+        if budget is None:
+            return await response.read()
+        image = SpooledImage(budget, self.spool_dir)
+        try:
+            async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                image.write(chunk)
+        except BaseException:
+            image.close()
+            raise
+        return image
+
+    async def _transcode(
+        self,
+        url: str,
+        filename: str,
+        image: ImageData,
+        budget: Optional[MemoryBudget],
+        names: Optional[FilenameAllocator] = None,
+    ) -> Tuple[str, ImageData]:
+        """
+        `transcoder`가 있으면 이미지를 변환합니다. `budget`이 있으면 결과를 SpooledImage로 돌려주므로,
+        변환하지 않는 경우와 같은 방식으로 메모리 한도가 적용됩니다.
+        """
+        if self.transcoder is not None:
+            if isinstance(image, SpooledImage):
+                data = await asyncio.to_thread(image.read) if image.spilled else image.read()
+                image.close()
+                image = data
+            converted, image = await self.transcoder.transcode(filename, image)
+            if converted != filename and names is not None:
+                converted = names.rename(url, converted)
+            filename = converted
+        if budget is None or isinstance(image, SpooledImage):
+            return (filename, image)
+        spooled = SpooledImage(budget, self.spool_dir)
+        spooled.write(image)
+        return (filename, spooled)
+
+    async def _cache_get(self, url: str) -> Optional[bytes]:
+        if self.cache is None:
+            return None
+        try:
+            return await asyncio.to_thread(self.cache.get, url)
+        except OSError as e:
+            logger.warning(f"이미지 캐시 조회 실패: {url}, 오류: {e}")
+            return None
+
+    async def _cache_put(self, url: str, data: ImageData) -> None:
+        # 캐시 저장 실패(디스크 부족 등)는 다운로드 자체를 실패시키지 않음
+        if self.cache is None:
+            return
+        try:
+            await asyncio.to_thread(self.cache.put, url, data)
+        except OSError as e:
+            logger.warning(f"이미지 캐시 저장 실패: {url}, 오류: {e}")
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return limit
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """지터가 적용된 지수 백오프(full jitter). Retry-After가 있으면 그보다 짧게 기다리지 않습니다."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
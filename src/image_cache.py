@@ -0,0 +1,245 @@
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Iterable, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+# 요청마다(서명, 만료 시각) 또는 CDN 엣지마다 달라지는 쿼리 파라미터. 이 밖의 파라미터(stp 등 크기/자르기 변환)는 키에 포함
+VOLATILE_QUERY_PARAMS = {'oh', 'oe', 'ccb', 'edm'}
+VOLATILE_QUERY_PREFIXES = ('_nc_',)
+
+
+def canonical_asset_key(url: str) -> str:
+    """
+    CDN URL에서 캐시 키로 사용할 정규화된 자산 경로를 만듭니다.
+    `oh`/`oe` 같은 서명 파라미터, `_nc_*` 같은 엣지/추적 파라미터와 CDN 엣지 호스트명은 요청마다 달라지므로 제외합니다.
+    `stp`(크기/자르기) 같은 변환 파라미터는 같은 경로라도 다른 이미지를 가리키므로 정렬해서 키에 포함합니다.
+    """
+    parts = urlsplit(url)
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name not in VOLATILE_QUERY_PARAMS and not name.startswith(VOLATILE_QUERY_PREFIXES)
+    )
+    return f"{parts.path}?{urlencode(params)}" if params else parts.path
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """임시 파일에 쓴 뒤 os.replace로 교체하여, 다른 프로세스가 쓰다 만 파일을 읽지 않도록 합니다."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class ImageCache:
+    """
+    내용 해시로 이미지를 저장하는 디스크 캐시(content-addressed cache).
+
+    - `keys/`에는 정규화된 자산 경로의 해시 → 내용 해시 매핑을, `blobs/`에는 내용 해시 이름의 이미지를 저장합니다.
+      같은 이미지가 여러 키로 참조되어도 디스크에는 한 번만 저장됩니다.
+    - 모든 쓰기는 원자적(임시 파일 + rename)이므로 여러 워커 프로세스가 같은 디렉터리를 공유할 수 있습니다.
+    - 전체 용량이 `max_bytes`를 넘으면 가장 오래 사용되지 않은 blob(mtime 기준)부터 삭제하고(LRU),
+      삭제된 blob을 가리키는 키 파일도 함께 지워 `keys/`가 계속 늘어나지 않게 합니다.
+    - 적중/미스 카운터로 절약한 대역폭을 측정할 수 있습니다.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._keys_dir = os.path.join(root, 'keys')
+        self._blobs_dir = os.path.join(root, 'blobs')
+        os.makedirs(self._keys_dir, exist_ok=True)
+        os.makedirs(self._blobs_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.stores = 0
+        self.evictions = 0
+        self._total_bytes = self._scan_total_bytes()
+
+    def get(self, url: str) -> Optional[bytes]:
+        """캐시에 있으면 이미지 바이트를, 없으면 None을 반환합니다. 적중 시 LRU 순서를 갱신합니다."""
+        key_path = self._key_path(url)
+        try:
+            with open(key_path, 'r') as f:
+                digest = f.read().strip()
+            blob_path = self._blob_path(digest)
+            with open(blob_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if hashlib.sha256(data).hexdigest() != digest:
+            # 손상된 blob은 버리고 미스로 처리
+            logger.warning(f"손상된 캐시 항목을 삭제합니다: {digest}")
+            self._remove(blob_path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        try:
+            os.utime(blob_path, (now, now))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(data)
+        return data
+
+    def put(self, url: str, data: Union[bytes, Iterable[bytes]]) -> str:
+        """
+        이미지를 캐시에 저장하고 내용 해시를 반환합니다. 용량을 넘으면 LRU 방식으로 정리합니다.
+        `data`가 조각 이터러블(예: 디스크로 넘어간 SpooledImage)이면 전체를 메모리에 올리지 않고 해시를 계산하며 기록합니다.
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            digest = hashlib.sha256(data).hexdigest()
+            blob_path = self._blob_path(digest)
+            stored = 0
+            if not os.path.exists(blob_path):
+                _atomic_write(blob_path, data)
+                stored = len(data)
+        else:
+            digest, stored = self._write_chunks(data)
+        if stored:
+            with self._lock:
+                self._total_bytes += stored
+                self.stores += 1
+        _atomic_write(self._key_path(url), digest.encode())
+
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+        return digest
+
+    def _write_chunks(self, chunks: Iterable[bytes]):
+        """조각을 임시 파일에 쓰면서 해시를 계산하고, 같은 blob이 없을 때만 제자리로 옮깁니다. (해시, 새로 저장한 바이트 수)를 반환합니다."""
+        os.makedirs(self._blobs_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._blobs_dir, prefix='.tmp-')
+        try:
+            hasher = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            blob_path = self._blob_path(digest)
+            if os.path.exists(blob_path):
+                self._remove(tmp_path)
+                return digest, 0
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(tmp_path, blob_path)
+            return digest, size
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+    def evict(self) -> int:
+        """
+        용량이 `max_bytes` 이하가 될 때까지 가장 오래 사용되지 않은 blob을 삭제하고, 삭제한 개수를 반환합니다.
+        blob을 삭제했으면 없는 blob을 가리키는 키 파일도 정리합니다.
+        """
+        with self._lock:
+            blobs = []
+            for dirpath, _, filenames in os.walk(self._blobs_dir):
+                for name in filenames:
+                    if name.startswith('.tmp-'):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    blobs.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in blobs)
+            evicted = 0
+            for _, size, path in sorted(blobs):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                evicted += 1
+            self._total_bytes = total
+            self.evictions += evicted
+            removed_keys = self._sweep_keys() if evicted else 0
+        if evicted:
+            logger.info(f"이미지 캐시에서 {evicted}개 항목(키 {removed_keys}개)을 정리했습니다.")
+        return evicted
+
+    def _sweep_keys(self) -> int:
+        """없는 blob(삭제되었거나 손상되어 버려진)을 가리키는 키 파일을 지우고 지운 개수를 반환합니다."""
+        removed = 0
+        for dirpath, _, filenames in os.walk(self._keys_dir):
+            for name in filenames:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    with open(path, 'r') as f:
+                        digest = f.read().strip()
+                except FileNotFoundError:
+                    continue
+                if not digest or not os.path.exists(self._blob_path(digest)):
+                    self._remove(path)
+                    removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        """캐시 적중/미스 카운터와 현재 사용량을 반환합니다."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _key_path(self, url: str) -> str:
+        key_digest = hashlib.sha256(canonical_asset_key(url).encode('utf-8')).hexdigest()
+        return os.path.join(self._keys_dir, key_digest[:2], key_digest)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blobs_dir, digest[:2], digest)
+
+    def _scan_total_bytes(self) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(self._blobs_dir):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+        return total
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
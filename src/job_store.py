@@ -0,0 +1,368 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+import socket
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+from .jobs import Job, JobManager, JobQueueFullException, STAGE_QUEUED, STAGE_SCRAPING, STAGE_DONE, STAGE_FAILED
+from .profile_cache import normalize_username
+
+logger = logging.getLogger(__name__)
+
+# 작업 하나의 상태(최신 진행률 스냅숏 포함)를 담는 테이블
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    username_key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    artifact_path TEXT,
+    error_status INTEGER,
+    error_message TEXT,
+    snapshot TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_stage ON jobs (stage, created_at);
+CREATE INDEX IF NOT EXISTS jobs_username ON jobs (username_key, stage);
+"""
+
+_FINISHED = (STAGE_DONE, STAGE_FAILED)
+
+
+class StoredJob:
+    """다른 프로세스가 처리 중이거나 끝낸 작업을 저장소에서 읽은 것. 라우트에서 Job과 같은 방식으로 사용합니다."""
+
+    def __init__(self, row: sqlite3.Row):
+        self.id = row['id']
+        self.username = row['username']
+        self.owner = row['owner']
+        self.stage = row['stage']
+        self.artifact_path = row['artifact_path']
+        self.error: Optional[Tuple[int, str]] = (
+            (row['error_status'], row['error_message']) if row['error_status'] is not None else None
+        )
+        self.created_at = row['created_at']
+        self.finished_at = row['finished_at']
+        self.attempts = row['attempts']
+        self._snapshot = json.loads(row['snapshot']) if row['snapshot'] else {}
+
+    def to_dict(self) -> dict:
+        data = {
+            'id': self.id,
+            'username': self.username,
+            'posts_found': 0,
+            'images_total': 0,
+            'images_done': 0,
+            'bytes_downloaded': 0,
+            'eta_seconds': None,
+            'timings': {},
+            'spans': [],
+            'spans_dropped': 0,
+        }
+        # 진행률은 처리 중인 워커가 마지막 하트비트에 기록한 값
+        data.update(self._snapshot)
+        data.update({
+            'stage': self.stage,
+            'error': self.error[1] if self.error else None,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        })
+        return data
+
+
+class SqliteJobStore:
+    """
+    여러 프로세스(또는 같은 볼륨을 쓰는 여러 컨테이너)가 공유하는 SQLite 작업 저장소.
+
+    작업 상태 변경은 모두 `BEGIN IMMEDIATE` 트랜잭션 안에서 이루어지므로, 같은 작업을 두 워커가 동시에 가져가지 않습니다.
+    작업을 가져간 워커는 임대(lease)를 받고 하트비트로 연장하며, 임대가 끝난 작업(워커가 죽은 경우)은 다른 워커가 다시 가져갑니다.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 30.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            # WAL: 읽기(상태 조회)가 쓰기(하트비트)를 기다리지 않음
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            db.execute('COMMIT')
+
+    def submit(self, username: str, owner: str, max_pending_per_owner: int) -> Tuple[StoredJob, bool]:
+        """
+        작업을 추가하고 (작업, 새로 만들었는지)를 반환합니다. 같은 계정의 작업이 끝나지 않았으면 그 작업을 반환합니다.
+
+        Raises:
+            JobQueueFullException: 해당 사용자의 대기 작업이 너무 많을 때.
+        """
+        key = normalize_username(username)
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT * FROM jobs WHERE username_key = ? AND stage NOT IN (?, ?) ORDER BY created_at LIMIT 1',
+                (key, *_FINISHED),
+            ).fetchone()
+            if row is not None:
+                return StoredJob(row), False
+            pending = db.execute(
+                'SELECT COUNT(*) FROM jobs WHERE owner = ? AND stage = ?', (owner, STAGE_QUEUED),
+            ).fetchone()[0]
+            if pending >= max_pending_per_owner:
+                raise JobQueueFullException(f"대기 중인 작업이 너무 많습니다. (최대 {max_pending_per_owner}개)")
+            job_id = uuid.uuid4().hex
+            db.execute(
+                'INSERT INTO jobs (id, username, username_key, owner, stage, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, username, key, owner, STAGE_QUEUED, time.time()),
+            )
+            return StoredJob(db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()), True
+
+    def get(self, job_id: str) -> Optional[StoredJob]:
+        with self._connect() as db:
+            row = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return StoredJob(row) if row is not None else None
+
+    def claim(self, worker_id: str, lease: float, max_attempts: int, now: Optional[float] = None) -> Optional[StoredJob]:
+        """
+        대기 중이거나 임대가 끝난 작업 하나를 가져와 `lease`초 동안 임대합니다. 가져갈 작업이 없으면 None.
+        처리 중인 작업이 적은 사용자의 작업을 먼저, 같으면 오래된 작업을 먼저 가져옵니다(사용자 간 공정성).
+        `max_attempts`번 가져갔는데도 끝나지 않은(워커가 계속 죽은) 작업은 실패로 기록합니다.
+        """
+        now = time.time() if now is None else now
+        with self._transaction() as db:
+            while True:
+                row = db.execute(
+                    """
+                    SELECT * FROM jobs AS j
+                    WHERE j.stage = ? OR (j.stage NOT IN (?, ?, ?) AND j.lease_expires < ?)
+                    ORDER BY (
+                        SELECT COUNT(*) FROM jobs AS r
+                        WHERE r.owner = j.owner AND r.stage NOT IN (?, ?, ?) AND r.lease_expires >= ?
+                    ), j.created_at
+                    LIMIT 1
+                    """,
+                    (STAGE_QUEUED, STAGE_QUEUED, *_FINISHED, now, STAGE_QUEUED, *_FINISHED, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row['stage'] != STAGE_QUEUED:
+                    logger.warning(f"임대가 끝난 작업을 다시 처리합니다: {row['id']} (워커 {row['lease_owner']})")
+                if row['attempts'] >= max_attempts:
+                    db.execute(
+                        'UPDATE jobs SET stage = ?, error_status = ?, error_message = ?, lease_owner = NULL, finished_at = ? WHERE id = ?',
+                        (STAGE_FAILED, 500, '작업을 처리하던 워커가 반복해서 중단되었습니다.', now, row['id']),
+                    )
+                    continue
+                db.execute(
+                    'UPDATE jobs SET stage = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ? WHERE id = ?',
+                    (STAGE_SCRAPING, worker_id, now + lease, row['id']),
+                )
+                return StoredJob(db.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone())
+
+    def heartbeat(self, job: Job, worker_id: str, lease: float) -> bool:
+        """임대를 연장하고 진행률을 기록합니다. 임대를 잃었으면(다른 워커가 가져감) False."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                'UPDATE jobs SET stage = ?, lease_expires = ?, snapshot = ? WHERE id = ? AND lease_owner = ? AND stage NOT IN (?, ?)',
+                (job.stage, time.time() + lease, json.dumps(job.to_dict()), job.id, worker_id, *_FINISHED),
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job: Job, worker_id: str) -> bool:
+        """작업 결과(ZIP 경로 또는 오류)를 기록합니다. 임대를 잃었으면 기록하지 않고 False."""
+        error_status, error_message = job.error if job.error else (None, None)
+        with self._transaction() as db:
+            cursor = db.execute(
+                """
+                UPDATE jobs SET stage = ?, artifact_path = ?, error_status = ?, error_message = ?, snapshot = ?,
+                    finished_at = ?, lease_owner = NULL
+                WHERE id = ? AND lease_owner = ?
+                """,
+                (job.stage, job.artifact_path, error_status, error_message, json.dumps(job.to_dict()),
+                 job.finished_at or time.time(), job.id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, job_id: str, worker_id: str) -> None:
+        """종료하는 워커의 작업을 대기열로 되돌립니다. 중단된 시도는 재시도 횟수에 포함하지 않습니다."""
+        with self._transaction() as db:
+            db.execute(
+                'UPDATE jobs SET stage = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, lease_expires = NULL '
+                'WHERE id = ? AND lease_owner = ?',
+                (STAGE_QUEUED, job_id, worker_id),
+            )
+
+    def expire(self, ttl: float, now: Optional[float] = None) -> int:
+        """끝난 지 `ttl`초가 지난 작업과 ZIP 파일을 삭제하고, 삭제한 작업 수를 반환합니다."""
+        now = time.time() if now is None else now
+        with self._transaction() as db:
+            rows = db.execute(
+                'SELECT id, artifact_path FROM jobs WHERE stage IN (?, ?) AND finished_at <= ?',
+                (*_FINISHED, now - ttl),
+            ).fetchall()
+            db.executemany('DELETE FROM jobs WHERE id = ?', [(row['id'],) for row in rows])
+        for row in rows:
+            if row['artifact_path']:
+                try:
+                    os.unlink(row['artifact_path'])
+                except FileNotFoundError:
+                    pass
+        return len(rows)
+
+    def stage_counts(self) -> Dict[str, int]:
+        with self._connect() as db:
+            return {row['stage']: row['count'] for row in db.execute('SELECT stage, COUNT(*) AS count FROM jobs GROUP BY stage')}
+
+
+class SharedJobManager(JobManager):
+    """
+    SQLite 작업 저장소(SqliteJobStore)를 통해 여러 프로세스가 작업을 나눠 처리하는 JobManager.
+
+    - 작업 등록/조회는 저장소를 거치므로, 어느 프로세스에 요청이 와도 같은 작업을 보고 같은 계정의 작업에 합류합니다.
+    - 각 프로세스의 워커는 자기 브라우저 풀로 작업을 처리하며, 저장소에서 작업을 가져가(claim) `lease`초 임대를 받고
+      `lease / 3`초마다 하트비트로 진행률을 기록하고 임대를 연장합니다.
+    - 워커 프로세스가 죽어 임대가 끝난 작업은 다른 워커가 다시 처리합니다(최대 `max_attempts`번).
+      정상 종료하는 워커는 처리 중인 작업을 대기열로 되돌립니다.
+    - ZIP은 `artifact_dir`(모든 프로세스가 공유하는 볼륨)에 실행(워커, 시도 횟수)마다 다른 이름으로 저장되므로,
+      임대를 잃은 워커와 이어받은 워커가 서로의 파일을 덮어쓰거나 지우지 않습니다. 임대를 잃은 워커는 실행 중인 작업을 바로 취소합니다.
+    """
+
+    def __init__(
+        self,
+        store: SqliteJobStore,
+        *args,
+        lease: float = 60.0,
+        max_attempts: int = 3,
+        poll_interval: float = 1.0,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.store = store
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        # 파일명에 쓸 수 있는 워커 식별자
+        self._worker_tag = re.sub(r'[^A-Za-z0-9_-]', '-', self.worker_id)
+        # 이 프로세스에서 실행 중인 작업 id → 저장소에 기록된 시도 횟수
+        self._attempts: Dict[str, int] = {}
+        self.claimed = 0
+        self.lost_leases = 0
+        # 이 프로세스에서 처리 중인 작업(진행률을 저장소보다 정확하게 보여줌)
+        self._running: Dict[str, Job] = {}
+
+    async def submit(self, username: str, owner: str) -> StoredJob:
+        await self.start()
+        job, created = await asyncio.to_thread(self.store.submit, username, owner, self.max_pending_per_owner)
+        if created:
+            logger.info(f"작업 등록: {job.id} ('{username}', 요청자 {owner})")
+        else:
+            self.coalesced += 1
+            logger.info(f"'{username}' 진행 중인 작업 {job.id}에 합류합니다.")
+        return job
+
+    def get(self, job_id: str):
+        return self._running.get(job_id) or self.store.get(job_id)
+
+    async def _next_job(self) -> Job:
+        while True:
+            stored = await asyncio.to_thread(self.store.claim, self.worker_id, self.lease, self.max_attempts)
+            if stored is not None:
+                self.claimed += 1
+                job = Job(stored.username, stored.owner)
+                job.id = stored.id
+                job.created_at = stored.created_at
+                self._attempts[job.id] = stored.attempts
+                return job
+            await asyncio.sleep(self.poll_interval)
+
+    def artifact_name(self, job: Job) -> str:
+        return f'{job.id}-{self._worker_tag}-{self._attempts.get(job.id, 0)}'
+
+    async def run(self, job: Job) -> None:
+        self._running[job.id] = job
+        lost = asyncio.Event()
+        work = asyncio.ensure_future(super().run(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job, lost, work))
+        try:
+            await work
+        except asyncio.CancelledError:
+            if not lost.is_set() or asyncio.current_task().cancelling():
+                # 종료 중: 다른 워커가 바로 이어서 처리하도록 대기열로 되돌림
+                await asyncio.shield(asyncio.to_thread(self.store.release, job.id, self.worker_id))
+                raise
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            del self._running[job.id]
+            self._attempts.pop(job.id, None)
+
+        if lost.is_set() or not await asyncio.to_thread(self.store.finish, job, self.worker_id):
+            # 임대를 잃은 사이 다른 워커가 이 작업을 가져갔으므로 결과를 버림(이 실행의 파일만 삭제)
+            self.lost_leases += 1
+            logger.warning(f"작업 {job.id}의 임대를 잃어 결과를 버립니다.")
+            if job.artifact_path and os.path.exists(job.artifact_path):
+                os.unlink(job.artifact_path)
+
+    async def _heartbeat(self, job: Job, lost: asyncio.Event, work: asyncio.Future) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                if not await asyncio.to_thread(self.store.heartbeat, job, self.worker_id, self.lease):
+                    # 다른 워커가 이어받았으므로 스크래핑/다운로드를 계속할 필요가 없음
+                    lost.set()
+                    work.cancel()
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"작업 {job.id} 하트비트 실패: {e}")
+
+    def expire(self, now: Optional[float] = None) -> int:
+        expired = self.store.expire(self.artifact_ttl, now)
+        if expired:
+            logger.info(f"만료된 작업 {expired}개를 정리했습니다.")
+        return expired
+
+    async def _expire_periodically(self) -> None:
+        interval = max(min(self.artifact_ttl / 4, 300.0), 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.expire)
+
+    def stats(self) -> dict:
+        stages = self.store.stage_counts()
+        return {
+            'jobs': sum(stages.values()),
+            'stages': stages,
+            'coalesced': self.coalesced,
+            'running': len(self._running),
+            'claimed': self.claimed,
+            'lost_leases': self.lost_leases,
+        }
@@ -0,0 +1,271 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from .downloader import DownloadResult, ImageDownloader
+from .metrics import Trace, current_trace
+from .profile_cache import normalize_username
+from .scraper import ProfileScrapeResult
+from .utils import write_zip
+
+logger = logging.getLogger(__name__)
+
+# 작업 단계
+STAGE_QUEUED = 'queued'
+STAGE_SCRAPING = 'scraping'
+STAGE_DOWNLOADING = 'downloading'
+STAGE_DONE = 'done'
+STAGE_FAILED = 'failed'
+
+
+class JobQueueFullException(Exception):
+    """한 사용자가 대기열에 너무 많은 작업을 올렸을 때 발생하는 예외"""
+    pass
+
+
+class Job:
+    """스크래핑 + 다운로드 작업 하나의 상태와 진행률."""
+
+    def __init__(self, username: str, owner: str):
+        self.id = uuid.uuid4().hex
+        self.username = username
+        self.owner = owner
+        self.stage = STAGE_QUEUED
+        self.posts_found = 0
+        self.images_total = 0
+        self.download: Optional[DownloadResult] = None
+        self.artifact_path: Optional[str] = None
+        self.error: Optional[Tuple[int, str]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # 단계별 소요 시간(브라우저 실행, 페이지 이동, 스크롤, 다운로드, ZIP 등)
+        self.trace = Trace()
+
+    @property
+    def images_done(self) -> int:
+        if self.download is None:
+            return 0
+        return self.download.succeeded + self.download.failed
+
+    @property
+    def bytes_downloaded(self) -> int:
+        return self.download.bytes_downloaded if self.download is not None else 0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """다운로드 단계에서 지금까지의 처리 속도로 추정한 남은 시간(초)."""
+        if self.stage != STAGE_DOWNLOADING or not self.images_done:
+            return None
+        remaining = self.images_total - self.images_done
+        return self.download.elapsed / self.images_done * remaining
+
+    def to_dict(self) -> dict:
+        eta = self.eta_seconds
+        return {
+            'id': self.id,
+            'username': self.username,
+            'stage': self.stage,
+            'posts_found': self.posts_found,
+            'images_total': self.images_total,
+            'images_done': self.images_done,
+            'bytes_downloaded': self.bytes_downloaded,
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'error': self.error[1] if self.error else None,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'timings': self.trace.as_dict(),
+            'spans': self.trace.span_list(),
+            'spans_dropped': self.trace.dropped_spans,
+        }
+
+
+class JobManager:
+    """
+    스크래핑 + 다운로드를 백그라운드에서 처리하는 작업 관리자.
+
+    - 고정된 수(`workers`)의 워커가 작업을 처리합니다.
+    - 사용자(owner)별 대기열을 라운드 로빈으로 돌며 작업을 꺼내므로, 한 사용자가 작업을 많이 올려도
+      다른 사용자의 작업이 뒤로 밀리지 않습니다. 사용자당 대기 작업 수는 `max_pending_per_owner`로 제한합니다.
+    - 같은 계정의 작업이 대기 중이거나 실행 중이면 새 작업을 만들지 않고 그 작업을 돌려줍니다.
+    - 완료된 ZIP은 `artifact_dir`에 저장되며 `artifact_ttl`초 후 작업 정보와 함께 삭제됩니다.
+    """
+
+    def __init__(
+        self,
+        scrape: Callable[[str], Awaitable[ProfileScrapeResult]],
+        downloader: ImageDownloader,
+        describe_error: Callable[[Exception, str], Tuple[int, str]],
+        artifact_dir: str = '.cache/jobs',
+        workers: int = 2,
+        artifact_ttl: float = 3600.0,
+        max_pending_per_owner: int = 10,
+    ):
+        self.scrape = scrape
+        self.downloader = downloader
+        self.describe_error = describe_error
+        self.artifact_dir = artifact_dir
+        self.workers = workers
+        self.artifact_ttl = artifact_ttl
+        self.max_pending_per_owner = max_pending_per_owner
+
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[str, Job] = {}
+        self.coalesced = 0
+        self._queues: Dict[str, Deque[Job]] = {}
+        self._owners: Deque[str] = deque()
+        self._available: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """워커와 만료 정리 작업을 시작합니다. 이미 시작되었으면 아무것도 하지 않습니다."""
+        if self._tasks:
+            return
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        self._available = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._expire_periodically()))
+
+    async def close(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def submit(self, username: str, owner: str) -> Job:
+        """
+        작업을 대기열에 추가하고 반환합니다. 같은 계정의 작업이 끝나지 않았으면 그 작업을 반환합니다.
+
+        Raises:
+            JobQueueFullException: 해당 사용자의 대기 작업이 너무 많을 때.
+        """
+        await self.start()
+        key = normalize_username(username)
+        active = self._active.get(key)
+        if active is not None:
+            self.coalesced += 1
+            logger.info(f"'{username}' 진행 중인 작업 {active.id}에 합류합니다.")
+            return active
+        async with self._available:
+            queue = self._queues.get(owner)
+            if queue is not None and len(queue) >= self.max_pending_per_owner:
+                raise JobQueueFullException(f"대기 중인 작업이 너무 많습니다. (최대 {self.max_pending_per_owner}개)")
+            job = Job(username, owner)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            if queue is None:
+                queue = self._queues[owner] = deque()
+                self._owners.append(owner)
+            queue.append(job)
+            self._available.notify()
+        logger.info(f"작업 등록: {job.id} ('{username}', 요청자 {owner})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def _next_job(self) -> Job:
+        async with self._available:
+            while not self._owners:
+                await self._available.wait()
+            owner = self._owners.popleft()
+            queue = self._queues[owner]
+            job = queue.popleft()
+            # 남은 작업이 있으면 순서를 맨 뒤로 보내 다른 사용자에게 차례를 넘김
+            if queue:
+                self._owners.append(owner)
+            else:
+                del self._queues[owner]
+            return job
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job = await self._next_job()
+            await self.run(job)
+
+    def artifact_name(self, job: Job) -> str:
+        """작업 ZIP 파일명(확장자 제외). 같은 작업을 여러 번 실행할 수 있는 관리자는 실행마다 다른 이름을 돌려줍니다."""
+        return job.id
+
+    async def run(self, job: Job) -> None:
+        """작업 하나를 실행합니다: 스크래핑 → 다운로드 → ZIP 파일 저장."""
+        job.started_at = time.time()
+        trace_token = current_trace.set(job.trace)
+        name = self.artifact_name(job)
+        tmp_path = os.path.join(self.artifact_dir, f'.{name}.zip.tmp')
+        try:
+            job.stage = STAGE_SCRAPING
+            scraped = await self.scrape(job.username)
+            image_urls = scraped.image_urls
+            job.posts_found = len(scraped.post_ids)
+            job.images_total = len(image_urls)
+            if not image_urls:
+                raise _JobError(404, '다운로드할 이미지를 찾을 수 없습니다.')
+
+            job.stage = STAGE_DOWNLOADING
+            job.download = DownloadResult()
+            with open(tmp_path, 'wb') as f:
+                await write_zip(f, self.downloader.iter_images(image_urls, job.download))
+            if job.download.succeeded == 0:
+                raise _JobError(500, '이미지를 다운로드하는 데 실패했습니다.')
+
+            artifact_path = os.path.join(self.artifact_dir, f'{name}.zip')
+            os.replace(tmp_path, artifact_path)
+            job.artifact_path = artifact_path
+            job.stage = STAGE_DONE
+            logger.info(f"작업 완료: {job.id} ({job.download.summary()})")
+        except asyncio.CancelledError:
+            job.stage = STAGE_FAILED
+            job.error = (503, '서버가 종료되어 작업이 취소되었습니다.')
+            raise
+        except _JobError as e:
+            job.stage = STAGE_FAILED
+            job.error = (e.status, e.message)
+        except Exception as e:
+            job.stage = STAGE_FAILED
+            job.error = self.describe_error(e, job.username)
+        finally:
+            current_trace.reset(trace_token)
+            job.finished_at = time.time()
+            key = normalize_username(job.username)
+            if self._active.get(key) is job:
+                del self._active[key]
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """완료(또는 실패) 후 `artifact_ttl`초가 지난 작업과 ZIP 파일을 삭제하고, 삭제한 작업 수를 반환합니다."""
+        now = time.time() if now is None else now
+        expired = [
+            job for job in self._jobs.values()
+            if job.finished_at is not None and now - job.finished_at >= self.artifact_ttl
+        ]
+        for job in expired:
+            del self._jobs[job.id]
+            if job.artifact_path and os.path.exists(job.artifact_path):
+                os.unlink(job.artifact_path)
+        if expired:
+            logger.info(f"만료된 작업 {len(expired)}개를 정리했습니다.")
+        return len(expired)
+
+    def stats(self) -> dict:
+        stages: Dict[str, int] = {}
+        for job in self._jobs.values():
+            stages[job.stage] = stages.get(job.stage, 0) + 1
+        return {'jobs': len(self._jobs), 'stages': stages, 'coalesced': self.coalesced}
+
+    async def _expire_periodically(self) -> None:
+        interval = max(min(self.artifact_ttl / 4, 300.0), 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            self.expire()
+
+
+class _JobError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
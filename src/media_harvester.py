@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Union
+from playwright.async_api import Page, Response
+from .media_urls import ResolutionPolicy, media_key
+
+logger = logging.getLogger(__name__)
+
+# 프로필 피드 데이터를 담고 있는 응답 URL 패턴
+FEED_URL_MARKERS = (
+    '/graphql/query',
+    '/api/graphql',
+    '/api/v1/feed/user/',
+    '/api/v1/users/web_profile_info',
+)
+
+
+def _choose_candidate_url(media: Dict[str, Any], policy: ResolutionPolicy) -> Optional[str]:
+    """미디어 노드의 해상도 후보 중 정책에 맞는 이미지 URL을 고릅니다. (API v1 / GraphQL 형식 모두 지원)"""
+    candidates = []
+    versions = media.get('image_versions2') or {}
+    for candidate in versions.get('candidates') or []:
+        if candidate.get('url'):
+            candidates.append((candidate['url'], candidate.get('width')))
+    for resource in media.get('display_resources') or []:
+        if resource.get('src'):
+            candidates.append((resource['src'], resource.get('config_width')))
+    if candidates:
+        return policy.choose(candidates)
+    return media.get('display_url')
+
+
+def _media_children(media: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """캐러셀(여러 장) 게시물의 하위 미디어 목록을 반환합니다. 캐러셀이 아니면 빈 리스트."""
+    if media.get('carousel_media'):
+        return list(media['carousel_media'])
+    sidecar = media.get('edge_sidecar_to_children') or {}
+    return [edge['node'] for edge in sidecar.get('edges') or [] if edge.get('node')]
+
+
+def _media_owner(media: Dict[str, Any]) -> Optional[str]:
+    owner = media.get('user') or media.get('owner') or {}
+    return owner.get('username')
+
+
+def _is_post_media(node: Dict[str, Any]) -> bool:
+    has_code = isinstance(node.get('code') or node.get('shortcode'), str)
+    has_media = any(key in node for key in ('image_versions2', 'display_url', 'display_resources', 'carousel_media', 'edge_sidecar_to_children'))
+    return has_code and has_media
+
+
+class NetworkMediaHarvester:
+    """
+    프로필 페이지가 받아오는 피드/GraphQL JSON 응답을 가로채 게시물 미디어를 수집합니다.
+
+    렌더링된 HTML을 파싱하지 않으므로 그리드 가상화나 프로필 사진/썸네일의 영향을 받지 않으며,
+    캐러셀의 하위 이미지와 해상도별 URL을 얻을 수 있습니다. 해상도는 `resolution` 정책(기본: 가장 큰 해상도)으로 고릅니다.
+
+    사용 예:
+    harvester = NetworkMediaHarvester(username)
+    harvester.attach(page)
+    await page.goto(...)
+    ... 스크롤 ...
+    await harvester.drain()
+    harvester.post_ids, harvester.post_images
+    """
+
+    def __init__(self, username: str, resolution: Union[str, ResolutionPolicy, None] = None):
+        self.username = username.lower()
+        self.policy = ResolutionPolicy.parse(resolution)
+        self.post_ids: List[str] = []
+        self.post_images: Dict[str, List[str]] = {}
+        self.media_ids: Set[str] = set()
+        self.responses_parsed = 0
+        # 요청 제한(HTTP 429)으로 거절된 피드 응답 수
+        self.throttled = 0
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def image_urls(self) -> List[str]:
+        return [url for post_id in self.post_ids for url in self.post_images[post_id]]
+
+    def attach(self, page: Page) -> None:
+        """페이지의 response 이벤트에 핸들러를 등록합니다. page.goto 전에 호출해야 첫 페이지 데이터도 수집됩니다."""
+        page.on('response', self._on_response)
+
+    async def drain(self) -> None:
+        """아직 파싱 중인 응답 처리가 모두 끝날 때까지 기다립니다."""
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    def _on_response(self, response: Response) -> None:
+        if not any(marker in response.url for marker in FEED_URL_MARKERS):
+            return
+        if response.status == 429:
+            self.throttled += 1
+            return
+        task = asyncio.ensure_future(self._consume(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _consume(self, response: Response) -> None:
+        try:
+            if 'json' not in (response.headers.get('content-type') or '') and '/graphql' not in response.url:
+                return
+            payload = await response.json()
+        except Exception as e:
+            # 리다이렉트/본문 없는 응답 등은 무시
+            logger.debug(f"응답 JSON 파싱 건너뜀: {response.url}, 오류: {e}")
+            return
+        self.responses_parsed += 1
+        self.feed(payload)
+
+    def feed(self, payload: Any) -> int:
+        """JSON 객체에서 게시물 미디어를 찾아 누적하고, 새로 발견한 게시물 수를 반환합니다."""
+        added = 0
+        stack = [payload]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(reversed(node))
+                continue
+            if not isinstance(node, dict):
+                continue
+            if _is_post_media(node):
+                if self._add_post(node):
+                    added += 1
+                continue
+            stack.extend(reversed(list(node.values())))
+        return added
+
+    def _add_post(self, media: Dict[str, Any]) -> bool:
+        owner = _media_owner(media)
+        if owner is not None and owner.lower() != self.username:
+            # 추천 게시물 등 다른 계정의 미디어는 제외
+            return False
+        post_id = media.get('code') or media.get('shortcode')
+        if post_id in self.post_images:
+            return False
+
+        urls = []
+        keys = set()
+        for child in _media_children(media) or [media]:
+            url = _choose_candidate_url(child, self.policy)
+            if url and media_key(url) not in keys:
+                keys.add(media_key(url))
+                urls.append(url)
+            media_id = child.get('pk') or child.get('id')
+            if media_id is not None:
+                self.media_ids.add(str(media_id))
+        if not urls:
+            return False
+
+        self.post_ids.append(post_id)
+        self.post_images[post_id] = urls
+        return True
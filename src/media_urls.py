@@ -0,0 +1,161 @@
+import os
+import re
+import hashlib
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+# 인스타그램 CDN 파일명(<미디어 ID>_<...>_<...>_n.jpg). 해상도/서명이 달라도 같은 사진이면 파일명이 같습니다.
+_INSTAGRAM_MEDIA_FILENAME = re.compile(r'^\d+(?:_\d+)+_[a-z]\.[A-Za-z0-9]+$')
+
+# 해상도 변형을 나타내는 크기 토큰(예: stp=dst-jpg_e35_s640x640_sh0.08, 경로의 /p1080x1080/)
+_SIZE_TOKEN = re.compile(r'(?:^|[_/.-])[sp](\d+)x(\d+)(?=$|[_/.-])')
+
+# 예전 형식 URL 경로에 들어가는 변형 세그먼트(크기, 품질, 크롭). 미디어 식별에는 사용하지 않습니다.
+_VARIANT_SEGMENT = re.compile(r'^(?:[sp]\d+x\d+|e\d+|sh\d+(?:\.\d+)?|c[\d.]+a|dst-[\w.-]+)$')
+
+# 후보 이미지: (URL, 가로 픽셀 수 또는 알 수 없으면 None)
+Candidate = Tuple[str, Optional[int]]
+
+
+def parse_srcset(srcset: Optional[str]) -> List[Candidate]:
+    """img의 srcset("url 640w, url 1080w" 또는 "url 2x")을 (URL, 가로 픽셀 수) 목록으로 변환합니다. x 서술자는 크기를 알 수 없는 것으로 취급합니다."""
+    candidates = []
+    for part in (srcset or '').split(','):
+        fields = part.strip().split()
+        if not fields:
+            continue
+        width = None
+        if len(fields) > 1 and fields[1].endswith('w') and fields[1][:-1].isdigit():
+            width = int(fields[1][:-1])
+        candidates.append((fields[0], width))
+    return candidates
+
+
+def url_size_hint(url: str) -> Optional[int]:
+    """URL의 크기 토큰(stp 쿼리 또는 경로)에서 긴 변의 픽셀 수를 추정합니다. 없으면 None."""
+    parts = urlsplit(url)
+    sources = [parts.path] + parse_qs(parts.query).get('stp', [])
+    sizes = [max(int(w), int(h)) for source in sources for w, h in _SIZE_TOKEN.findall(source)]
+    return max(sizes) if sizes else None
+
+
+def media_key(url: str) -> str:
+    """
+    같은 사진의 해상도/서명/CDN 엣지 변형을 하나로 묶는 키.
+    인스타그램 CDN 파일명은 미디어마다 고유하므로 그대로 사용하고, 그 밖의 URL은 변형 세그먼트를 뺀 경로를 사용합니다.
+    """
+    path = urlsplit(url).path
+    tail = path.rsplit('/', 1)[-1]
+    if _INSTAGRAM_MEDIA_FILENAME.match(tail):
+        return os.path.splitext(tail)[0]
+    return '/'.join(segment for segment in path.split('/') if not _VARIANT_SEGMENT.match(segment))
+
+
+class ResolutionPolicy:
+    """
+    같은 사진의 여러 해상도 중 하나를 고르는 정책.
+
+    - 'largest': 가장 큰 해상도(기본값)
+    - 'smallest': 가장 작은 해상도
+    - 'max:N' (또는 'N'): N픽셀 이하 중 가장 큰 해상도. 모두 N보다 크면 가장 작은 해상도
+    크기를 아는 후보가 있으면 크기를 모르는 후보보다 우선하며, 모두 모르면 처음 후보를 사용합니다.
+    """
+
+    MODES = ('largest', 'smallest', 'max')
+
+    def __init__(self, mode: str = 'largest', max_px: Optional[int] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"지원하지 않는 해상도 정책입니다: {mode}")
+        if mode == 'max' and (max_px is None or max_px <= 0):
+            raise ValueError("'max' 정책에는 양수 max_px가 필요합니다.")
+        self.mode = mode
+        self.max_px = max_px
+
+    @classmethod
+    def parse(cls, value: Union[str, 'ResolutionPolicy', None]) -> 'ResolutionPolicy':
+        """'largest', 'smallest', 'max:1080', '1080' 형식의 문자열을 정책으로 변환합니다."""
+        if isinstance(value, ResolutionPolicy):
+            return value
+        value = (value or 'largest').strip().lower()
+        if value.startswith('max:'):
+            value = value[len('max:'):]
+        if value.isdigit():
+            return cls('max', int(value))
+        return cls(value)
+
+    def choose(self, candidates: Sequence[Candidate]) -> Optional[str]:
+        sized = [(width, url) for url, width in candidates if width]
+        if not sized:
+            return candidates[0][0] if candidates else None
+        if self.mode == 'smallest':
+            return min(sized, key=lambda c: c[0])[1]
+        if self.mode == 'max':
+            fitting = [c for c in sized if c[0] <= self.max_px]
+            if not fitting:
+                return min(sized, key=lambda c: c[0])[1]
+            return max(fitting, key=lambda c: c[0])[1]
+        return max(sized, key=lambda c: c[0])[1]
+
+    def choose_image(self, src: str, srcset: Optional[str] = None) -> str:
+        """img 요소 하나(src와 srcset)에서 정책에 맞는 URL을 고릅니다."""
+        candidates = [(src, url_size_hint(src))]
+        candidates.extend((url, width or url_size_hint(url)) for url, width in parse_srcset(srcset))
+        return self.choose(candidates) or src
+
+    def __repr__(self) -> str:
+        return f"ResolutionPolicy({self.mode!r}, max_px={self.max_px!r})"
+
+
+def select_media_urls(urls: Iterable[str], policy: Union[str, ResolutionPolicy, None] = None) -> List[str]:
+    """
+    URL들을 미디어 키로 묶어 미디어마다 정책에 맞는 URL 하나만 남깁니다. 순서는 미디어가 처음 나온 순서를 따릅니다.
+    크기 정보는 URL의 크기 토큰에서 추정합니다.
+    """
+    policy = ResolutionPolicy.parse(policy)
+    groups: Dict[str, List[Candidate]] = {}
+    for url in urls:
+        groups.setdefault(media_key(url), []).append((url, url_size_hint(url)))
+    return [policy.choose(candidates) for candidates in groups.values()]
+
+
+class FilenameAllocator:
+    """
+    다운로드 한 번(아카이브 하나) 안에서 미디어마다 겹치지 않는 파일명을 정합니다.
+
+    인스타그램 CDN 파일명은 미디어마다 고유하므로 그대로 사용합니다. 그 밖의 URL은 마지막 경로 부분을 쓰되,
+    다른 미디어가 이미 같은 이름을 쓰고 있으면 미디어 키 해시를 붙입니다(같은 URL이면 항상 같은 접미사).
+    """
+
+    def __init__(self):
+        self._names: Dict[str, str] = {}
+        self._taken: Set[str] = set()
+
+    def reserve(self, key: str, name: str) -> None:
+        """이미 저장된 미디어(미디어 키)의 파일명을 등록합니다. 이후 다른 미디어에는 이 이름을 주지 않습니다."""
+        self._names[key] = name
+        self._taken.add(name)
+
+    def assign(self, url: str) -> str:
+        key = media_key(url)
+        name = self._names.get(key)
+        if name is not None:
+            return name
+        return self._take(key, urlsplit(url).path.rsplit('/', 1)[-1] or 'image')
+
+    def rename(self, url: str, name: str) -> str:
+        """
+        미디어에 정한 파일명을 새 이름(예: 변환 후 확장자가 바뀐 이름)으로 바꿔 반환합니다.
+        다른 미디어가 이미 그 이름을 쓰고 있으면(예: a.jpg와 a.png가 모두 a.webp로 변환) 미디어 키 해시를 붙입니다.
+        """
+        key = media_key(url)
+        if self._names.get(key) == name:
+            return name
+        return self._take(key, name)
+
+    def _take(self, key: str, name: str) -> str:
+        if name in self._taken:
+            stem, ext = os.path.splitext(name)
+            name = f"{stem}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}{ext}"
+        self._names[key] = name
+        self._taken.add(name)
+        return name
@@ -0,0 +1,246 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 단계별 소요 시간 히스토그램의 기본 버킷(초). 이미지 한 장(수 ms)부터 큰 계정의 스크롤(수 분)까지 포함.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: 레이블이 맞지 않습니다 (필요: {self.labelnames}, 받음: {tuple(labels)})")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """단조 증가하는 카운터."""
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """현재 값을 나타내는 게이지. /metrics 요청 시 다른 컴포넌트의 stats()로 갱신합니다."""
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """누적 버킷 히스토그램(_bucket, _sum, _count)."""
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        counts = self._counts.get(self._key(labels))
+        return counts[-1] if counts else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key in sorted(self._counts):
+                for bound, count in zip(self.buckets, self._counts[key]):
+                    labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {_format_value(self._sums[key])}')
+                lines.append(f'{self.name}_count{labels} {self._counts[key][-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """메트릭 모음. `render()`는 Prometheus 텍스트 형식(text/plain; version=0.0.4)을 반환합니다."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"이미 등록된 메트릭입니다: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# 단계: launch(브라우저 실행), goto(프로필 페이지 이동), scroll(전체 스크롤), scroll_step(스크롤 1회),
+#       extract(미디어 추출), download(이미지 한 장), zip(ZIP 조각 생성 누적 시간), first_image(요청 후 첫 이미지까지)
+STAGE_SECONDS = REGISTRY.histogram('ig_stage_duration_seconds', '단계별 소요 시간(초)', ['stage'])
+DOWNLOAD_BYTES = REGISTRY.counter('ig_download_bytes_total', 'CDN에서 받은 이미지 바이트 수')
+DOWNLOAD_IMAGES = REGISTRY.counter('ig_download_images_total', '이미지 다운로드 결과별 개수', ['result'])
+DOWNLOAD_RETRIES = REGISTRY.counter('ig_download_retries_total', '이미지 다운로드 재시도 횟수')
+REQUESTS = REGISTRY.counter('ig_requests_total', '엔드포인트/상태 코드별 요청 수', ['endpoint', 'status'])
+ZIP_BYTES = REGISTRY.counter('ig_zip_bytes_total', '전송한 ZIP 바이트 수')
+
+
+# Trace 하나가 보관하는 구간(span) 수 상한. 넘은 뒤의 구간은 단계별 합계/횟수에만 반영됩니다.
+MAX_TRACE_SPANS = 256
+
+
+class Trace:
+    """
+    요청 하나의 단계별 구간(span) 기록. 같은 단계가 여러 번 나오면(스크롤 1회, 이미지 한 장 등) 횟수와 합계를 누적하고,
+    개별 구간(단계, 요청 시작 기준 시작 시각, 소요 시간)은 처음 `max_spans`개만 보관하여 오래 걸리는 작업에서도 크기가 늘지 않습니다.
+    `server_timing()`은 Server-Timing 응답 헤더 값을 만듭니다.
+    """
+
+    def __init__(self, max_spans: int = MAX_TRACE_SPANS):
+        self.started = time.perf_counter()
+        self.max_spans = max_spans
+        self.spans: List[Tuple[str, float, float]] = []
+        self.dropped_spans = 0
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, stage: str, duration: float, started: Optional[float] = None) -> None:
+        if len(self.spans) < self.max_spans:
+            started = started if started is not None else time.perf_counter() - duration
+            self.spans.append((stage, started - self.started, duration))
+        else:
+            self.dropped_spans += 1
+        self.totals[stage] = self.totals.get(stage, 0.0) + duration
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def span_list(self) -> List[dict]:
+        """보관한 구간 목록(시작 순서). `start`는 요청 시작 기준 초입니다."""
+        return [
+            {'stage': stage, 'start': round(offset, 4), 'seconds': round(duration, 4)}
+            for stage, offset, duration in self.spans
+        ]
+
+    def as_dict(self) -> dict:
+        return {
+            stage: {'seconds': round(total, 4), 'count': self.counts[stage]}
+            for stage, total in self.totals.items()
+        }
+
+    def server_timing(self) -> str:
+        entries = []
+        for stage, total in self.totals.items():
+            description = f'; desc="x{self.counts[stage]}"' if self.counts[stage] > 1 else ''
+            entries.append(f'{stage};dur={total * 1000:.1f}{description}')
+        entries.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(entries)
+
+
+# 현재 요청의 Trace. asyncio 태스크는 생성 시 컨텍스트를 복사하므로 요청에서 시작된 하위 태스크의 구간도 기록됩니다.
+current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+
+
+def observe_stage(stage: str, duration: float, started: Optional[float] = None) -> None:
+    """단계 소요 시간을 히스토그램과 (있으면) 현재 요청의 Trace에 기록합니다."""
+    STAGE_SECONDS.observe(duration, stage=stage)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage, duration, started)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    with 블록의 실행 시간을 단계 소요 시간으로 기록합니다. (async 함수 안에서도 사용 가능)
+
+    사용 예:
+    with span('goto'):
+        await page.goto(url)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, started)
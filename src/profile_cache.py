@@ -0,0 +1,171 @@
+import re
+import time
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+from .browser_manager import BrowserPool
+from .media_urls import media_key
+from .scraper import scrape_profile, iter_profile_image_urls, ProfileScrapeResult
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+# 인스타그램 계정명에 쓸 수 있는 문자(영문 소문자, 숫자, 마침표, 밑줄)와 길이(최대 30자). 정규화한 계정명에 적용합니다.
+USERNAME_PATTERN = re.compile(r'^[a-z0-9._]{1,30}$')
+
+
+def normalize_username(username: str) -> str:
+    """인스타그램 계정명은 대소문자를 구분하지 않으므로 캐시 키로 쓸 때 정규화합니다."""
+    return username.strip().lstrip('@').lower()
+
+
+def is_valid_username(username) -> bool:
+    """
+    계정명이 (정규화된) 인스타그램 계정명 형식인지 확인합니다. 값을 고치지 않고 그대로 검사하므로,
+    '@'나 대문자를 허용하려면 normalize_username()을 먼저 적용한 뒤 그 값을 계속 사용해야 합니다.
+    """
+    return isinstance(username, str) and bool(USERNAME_PATTERN.match(username))
+
+
+class _CachedProfile:
+    def __init__(self, result: ProfileScrapeResult):
+        self.result = result
+        self.scraped_at = time.monotonic()
+        self.full_scraped_at = self.scraped_at
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.scraped_at
+
+
+def merge_scrape_results(newer: ProfileScrapeResult, older: ProfileScrapeResult) -> ProfileScrapeResult:
+    """
+    증분 스크래핑 결과(newer)를 기존 결과(older) 앞에 병합합니다.
+    게시물과 이미지는 화면 순서(최신 먼저)를 유지하며 중복(같은 미디어 키) 없이 합쳐집니다.
+    """
+    post_ids: List[str] = []
+    post_images: Dict[str, List[str]] = {}
+    for source in (newer, older):
+        for post_id in source.post_ids:
+            if post_id not in post_images:
+                post_ids.append(post_id)
+                post_images[post_id] = list(source.post_images.get(post_id, []))
+
+    # 같은 사진은 서명(oh/oe)이 새로운 쪽(newer)의 URL을 사용
+    image_urls: List[str] = []
+    seen = set()
+    for url in newer.image_urls + older.image_urls:
+        if media_key(url) not in seen:
+            seen.add(media_key(url))
+            image_urls.append(url)
+    return ProfileScrapeResult(newer.username, post_ids, image_urls, post_images)
+
+
+class ProfileCache:
+    """
+    계정별 스크래핑 결과(게시물 ID, 이미지 URL) 캐시.
+
+    - `ttl`초 이내의 결과는 브라우저를 띄우지 않고 그대로 반환합니다.
+    - `ttl`이 지난 결과는 증분 스크래핑으로 갱신합니다. 이미 알고 있는 게시물이 보이는 즉시 스크롤을 멈추고
+      새 게시물만 기존 결과 앞에 병합합니다.
+    - 마지막 전체 스크래핑 후 `full_refresh_after`초가 지나면 삭제된 게시물을 반영하기 위해 전체 스크래핑을 합니다.
+    - 같은 계정의 스크래핑이 진행 중이면 새로 브라우저를 띄우지 않고 그 결과를 함께 받습니다(single-flight).
+
+    사용 예:
+    cache = ProfileCache(ttl=600)
+    result = await cache.get_or_scrape(username, pool=browser_pool)
+    """
+
+    def __init__(self, ttl: float = 600.0, full_refresh_after: float = 86400.0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.full_refresh_after = full_refresh_after
+        self.max_entries = max_entries
+        self._entries: Dict[str, _CachedProfile] = {}
+        self.hits = 0
+        self.incremental_scrapes = 0
+        self.full_scrapes = 0
+        self._flight = SingleFlight()
+
+    def get(self, username: str) -> Optional[ProfileScrapeResult]:
+        """TTL 이내의 캐시된 결과가 있으면 반환합니다."""
+        entry = self._entries.get(normalize_username(username))
+        if entry is not None and entry.age < self.ttl:
+            return entry.result
+        return None
+
+    def put(self, username: str, result: ProfileScrapeResult) -> None:
+        """전체 스크래핑 결과를 캐시에 저장합니다."""
+        key = normalize_username(username)
+        self._entries.pop(key, None)
+        self._entries[key] = _CachedProfile(result)
+        # 삽입 순서가 가장 오래된 항목부터 정리
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+
+    def invalidate(self, username: str) -> None:
+        self._entries.pop(normalize_username(username), None)
+
+    async def get_or_scrape(self, username: str, pool: Optional[BrowserPool] = None, **scrape_options) -> ProfileScrapeResult:
+        """
+        캐시된 결과를 반환하거나, 오래된 결과는 증분 스크래핑으로, 없는 결과는 전체 스크래핑으로 가져옵니다.
+        `scrape_options`는 scrape_profile에 그대로 전달됩니다.
+        """
+        key = normalize_username(username)
+        entry = self._entries.get(key)
+
+        if entry is not None and entry.age < self.ttl:
+            self.hits += 1
+            logger.info(f"'{username}' 스크래핑 결과 캐시 적중")
+            return entry.result
+
+        return await self._flight.do(key, lambda: self._scrape(key, username, pool, scrape_options))
+
+    async def _scrape(self, key: str, username: str, pool: Optional[BrowserPool], scrape_options: dict) -> ProfileScrapeResult:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.full_scraped_at < self.full_refresh_after:
+            self.incremental_scrapes += 1
+            logger.info(f"'{username}' 증분 스크래핑 (알려진 게시물 {len(entry.result.post_ids)}개)")
+            newer = await scrape_profile(username, pool=pool, known_post_ids=set(entry.result.post_ids), **scrape_options)
+            merged = merge_scrape_results(newer, entry.result)
+            full_scraped_at = entry.full_scraped_at
+            self.put(key, merged)
+            self._entries[key].full_scraped_at = full_scraped_at
+            return merged
+
+        self.full_scrapes += 1
+        result = await scrape_profile(username, pool=pool, **scrape_options)
+        self.put(key, result)
+        return result
+
+    async def iter_image_urls(self, username: str, pool: Optional[BrowserPool] = None, **scrape_options) -> AsyncIterator[str]:
+        """
+        get_or_scrape의 파이프라인 버전. 캐시가 없어 전체 스크래핑이 필요하면 스크롤 단계마다 발견한 URL을
+        바로 내보내고 끝난 결과를 캐시에 저장합니다. 캐시 적중과 증분 스크래핑(짧음)은 결과 목록을 그대로 내보냅니다.
+        """
+        key = normalize_username(username)
+        entry = self._entries.get(key)
+        needs_full_scrape = entry is None or (
+            entry.age >= self.ttl and time.monotonic() - entry.full_scraped_at >= self.full_refresh_after
+        )
+        if not needs_full_scrape or self._flight.running(key):
+            result = await self.get_or_scrape(username, pool=pool, **scrape_options)
+            for url in result.image_urls:
+                yield url
+            return
+
+        self.full_scrapes += 1
+        urls = iter_profile_image_urls(username, pool=pool, on_result=lambda result: self.put(key, result), **scrape_options)
+        try:
+            async for url in urls:
+                yield url
+        finally:
+            await urls.aclose()
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'incremental_scrapes': self.incremental_scrapes,
+            'full_scrapes': self.full_scrapes,
+            'coalesced': self._flight.coalesced,
+        }
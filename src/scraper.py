@@ -1,10 +1,23 @@
 # 인스타그램 스크래핑을 위한 핵심 로직을 포함할 파일
+import re
+import time
 import asyncio
 import logging
-from playwright.async_api import async_playwright, TimeoutError
-from bs4 import BeautifulSoup
-from typing import List
-from .browser_manager import get_authenticated_page, CookieFileNotFoundException
+from playwright.async_api import async_playwright, Page, TimeoutError
+try:
+    # HTML 파싱(extraction='html')에서만 필요한 선택적 의존성
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+from .browser_manager import get_authenticated_page, apply_resource_policy, BrowserPool, ResourceBlockPolicy, CookieFileNotFoundException
+from .scroll_engine import ScrollEngine
+from .media_harvester import NetworkMediaHarvester
+from .dom_extractor import DomMediaCollector
+from .media_urls import ResolutionPolicy, media_key
+from .metrics import observe_stage, span
+from .session_pool import LoginRequiredException, RateLimitedException
 
 logger = logging.getLogger(__name__)
 
@@ -21,67 +34,395 @@ class ScrapeTimeoutException(Exception):
     """스크래핑 중 타임아웃이 발생했을 때의 예외"""
     pass
 
-async def scrape_profile_page(username: str) -> List[str]:
+@asynccontextmanager
+async def _open_page(pool: Optional[BrowserPool]) -> AsyncIterator[Page]:
+    """브라우저 풀이 주어지면 풀에서 페이지를 체크아웃하고, 없으면 브라우저를 새로 실행합니다."""
+    if pool is not None:
+        async with pool.page() as page:
+            yield page
+    else:
+        async with async_playwright() as p:
+            async with get_authenticated_page(p) as page:
+                yield page
+
+# 인스타그램 주소. 벤치마크 등에서는 로컬 대역 서버 주소로 바꿔 사용합니다(base_url).
+INSTAGRAM_URL = 'https://www.instagram.com'
+
+# 게시물 링크(/p/<id>/ 또는 /<username>/p/<id>/)에서 게시물 ID를 추출하는 정규식
+POST_ID_PATTERN = re.compile(r"/p/([^/?#]+)")
+
+# 미디어 URL 추출 방식: 피드 JSON 응답 가로채기(network), 스크롤 단계별 DOM 증분 추출(dom), 최종 HTML 파싱(html)
+EXTRACTION_MODES = ('network', 'dom', 'html')
+
+# 로그인되지 않은 세션이 이동되는 로그인 화면 경로
+LOGIN_PATH = '/accounts/login'
+
+# 프로필 그리드가 나타나기를 기다리는 최대 시간
+PROFILE_READY_TIMEOUT_MS = 10000
+
+# 게시물 링크 또는 비공개/게시물 없음 안내가 나타날 때까지 기다리는 조건
+_PROFILE_READY_JS = """
+() => document.querySelector('a[href*="/p/"]') !== null
+    || /This account is private|No posts yet/i.test(document.body ? document.body.innerText : '')
+"""
+
+class ProfileScrapeResult:
+    """
+    프로필 스크래핑 결과. 화면 순서(최신 게시물 먼저)의 게시물 ID와 이미지 URL을 담습니다.
+    """
+
+    def __init__(self, username: str, post_ids: List[str], image_urls: List[str], post_images: Dict[str, List[str]]):
+        self.username = username
+        self.post_ids = post_ids
+        self.image_urls = image_urls
+        self.post_images = post_images
+        # 스크롤 시간, 요청 허용/차단 수, 수신 바이트 등 스크래핑 통계
+        self.stats: Dict[str, object] = {}
+
+def parse_profile_html(html: str, resolution: Union[str, ResolutionPolicy, None] = None) -> Tuple[List[str], List[str], Dict[str, List[str]]]:
+    """
+    프로필 페이지 HTML에서 (게시물 ID 목록, 이미지 URL 목록, 게시물별 이미지 URL)을 추출합니다.
+    이미지마다 src와 srcset 중 `resolution` 정책에 맞는 URL을 고르고, 같은 사진(미디어 키)은 한 번만 포함합니다.
+    beautifulsoup4와 lxml이 설치되어 있어야 합니다.
+    """
+    if BeautifulSoup is None:
+        raise ImportError("HTML 파싱에는 beautifulsoup4와 lxml 패키지가 필요합니다.")
+    soup = BeautifulSoup(html, "lxml")
+    policy = ResolutionPolicy.parse(resolution)
+
+    post_ids: List[str] = []
+    post_images: Dict[str, List[str]] = {}
+    for anchor in soup.find_all('a', href=POST_ID_PATTERN):
+        post_id = POST_ID_PATTERN.search(anchor['href']).group(1)
+        if post_id not in post_images:
+            post_ids.append(post_id)
+            post_images[post_id] = []
+        keys = {media_key(url) for url in post_images[post_id]}
+        for img in anchor.find_all('img', src=True):
+            if 'scontent' in img['src']:
+                url = policy.choose_image(img['src'], img.get('srcset'))
+                if media_key(url) not in keys:
+                    keys.add(media_key(url))
+                    post_images[post_id].append(url)
+
+    image_urls: List[str] = []
+    seen = set()
+    for img in soup.find_all('img'):
+        # 'src' 속성이 있고, CDN 주소 형식을 포함하는 경우만 추출(인스타그램 게시물-CDN 주소 형식 포함)
+        if 'src' in img.attrs and 'scontent' in img['src']:
+            url = policy.choose_image(img['src'], img.get('srcset'))
+            if media_key(url) not in seen:
+                seen.add(media_key(url))
+                image_urls.append(url)
+    return post_ids, image_urls, post_images
+
+async def scrape_profile(
+    username: str,
+    pool: Optional[BrowserPool] = None,
+    known_post_ids: Optional[Set[str]] = None,
+    scroll_engine: Optional[ScrollEngine] = None,
+    extraction: str = 'network',
+    resource_policy: Optional[ResourceBlockPolicy] = None,
+    on_media: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+    base_url: str = INSTAGRAM_URL,
+    resolution: Union[str, ResolutionPolicy, None] = None,
+) -> ProfileScrapeResult:
     """
     주어진 인스타그램 계정 페이지로 이동하여 모든 게시물이 로드될 때까지 스크롤하고,
-    모든 게시물 이미지의 URL을 추출하여 리스트로 반환합니다.
+    게시물 ID와 게시물 이미지 URL을 추출합니다.
+
+    `pool`이 주어지면 미리 실행된 브라우저를 재사용하여 브라우저 실행 비용을 생략합니다.
+    `known_post_ids`가 주어지면 이미 알고 있는 게시물이 화면에 나타나는 즉시 스크롤을 멈춥니다(증분 스크래핑).
+    `scroll_engine`으로 스크롤 대기 시간과 예산(최대 게시물 수, 최대 시간)을 조정할 수 있습니다.
+
+    `extraction`이 'network'이면 페이지가 받아오는 피드 JSON 응답에서 미디어를 수집하고,
+    'dom'이면 스크롤 단계마다 새로 나타난 게시물만 페이지 안에서 추출하며,
+    'html'이면 스크롤 후 최종 HTML을 파싱합니다.
+    'network' 모드에서도 DOM 증분 추출을 함께 하여, 피드 응답에 나오지 않은 게시물(HTML로 그려진 첫 화면 등)을 결과에 더합니다.
+    'network' 결과가 비어 있으면 DOM 증분 추출 결과로, 그것도 비어 있으면 (bs4가 설치된 경우) HTML 파싱으로 대체합니다.
+
+    `resource_policy`가 주어지면 이미지/미디어/폰트/3rd-party 요청을 차단하여 스크롤 중 전송량을 줄입니다.
+    결과의 `stats`에 스크롤 시간과 요청 허용/차단 수, 수신 바이트가 기록됩니다.
+
+    `on_media`가 주어지면 스크롤 단계마다 새로 발견한 게시물의 이미지 URL 목록으로 호출하고, 종료 직전에
+    최종 결과에서 아직 보내지 않은 URL로 한 번 더 호출합니다. 콜백이 대기하는 동안에는 스크롤도 멈춥니다(backpressure).
+
+    `base_url`로 인스타그램 대신 같은 구조의 다른 서버(예: 벤치마크용 대역 서버)를 스크래핑할 수 있습니다.
+
+    `resolution`(ResolutionPolicy 또는 'largest'/'smallest'/'max:N')은 사진마다 여러 해상도 중 어느 URL을 고를지 정합니다.
+    해상도나 서명(oh/oe)만 다른 같은 사진은 미디어 키로 묶여 URL 하나만 결과에 포함됩니다.
     """
+    if extraction not in EXTRACTION_MODES:
+        raise ValueError(f"지원하지 않는 추출 방식입니다: {extraction}")
     logger.info(f"'{username}' 계정 스크래핑 시작...")
+    emitter = _MediaEmitter(on_media) if on_media is not None else None
+    policy = ResolutionPolicy.parse(resolution)
 
-    async with async_playwright() as p:
-        async with get_authenticated_page(p) as page:
-            # 인스타그램 프로필 페이지로 이동
+    async with _open_page(pool) as page:
+        usage = await apply_resource_policy(page, resource_policy)
+        harvester = None
+        if extraction == 'network':
+            harvester = NetworkMediaHarvester(username, resolution=policy)
+            harvester.attach(page)
+        collector = DomMediaCollector(resolution=policy) if extraction in ('network', 'dom') else None
+
+        # 인스타그램 프로필 페이지로 이동
+        try:
+            with span('goto'):
+                response = await page.goto(f"{base_url}/{username}/", timeout=60000)
+            _check_session(page, response)
+        
+            # 계정 없음 오류 확인(더 안정적인 text selector 사용)
+            not_found_locator = page.locator("text=/Sorry, this page isn't available/i")
+
+            if await not_found_locator.is_visible():
+                raise ProfileNotFoundException(f"'{username}' 계정을 찾을 수 없습니다.")
+            
+            # 게시물 링크가 하나도 없는지 확인하여 비공개/게시물 없는 계정 감지
+            # 공개 프로필에는 항상 '/p/'로 시작하는 게시물 링크(a 태그)가 존재
+            # 고정 대기 대신 게시물 링크나 비공개 안내가 나타나는 즉시 진행
             try:
-                await page.goto(f"https://www.instagram.com/{username}/", timeout=60000)
+                await page.wait_for_function(_PROFILE_READY_JS, polling='mutation', timeout=PROFILE_READY_TIMEOUT_MS)
+            except TimeoutError:
+                pass
+            post_locator = page.locator(f"a[href^='/{username}/p/']")
+
+            # 게시물 요소가 하나도 없다면 비공개 계정으로 간주.
+            if await post_locator.count() == 0:
+                raise ProfileIsPrivateException(f"'{username}' 계정은 비공개이거나 게시물이 없습니다.")
             
-                # 계정 없음 오류 확인(더 안정적인 text selector 사용)
-                not_found_locator = page.locator("text=/Sorry, this page isn't available/i")
-
-                if await not_found_locator.is_visible():
-                    raise ProfileNotFoundException(f"'{username}' 계정을 찾을 수 없습니다.")
-                
-                # 게시물 링크가 하나도 없는지 확인하여 비공개/게시물 없는 계정 감지
-                # 공개 프로필에는 항상 '/p/'로 시작하는 게시물 링크(a 태그)가 존재
-                # 잠시 기다려 페이지가 로드될 시간을 제공
-                await page.wait_for_timeout(2000)
-                post_locator = page.locator(f"a[href^='/{username}/p/']")
-
-                # 게시물 요소가 하나도 없다면 비공개 계정으로 간주.
-                if await post_locator.count() == 0:
-                    raise ProfileIsPrivateException(f"'{username}' 계정은 비공개이거나 게시물이 없습니다.")
-                
-                logger.info("페이지 스크롤 시작...")
-                # 페이지의 모든 게시물을 로드하기 위해 아래로 스크롤
-                last_height = await page.evaluate("document.body.scrollHeight")
-                while True:
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-                    await page.wait_for_timeout(2000) # 새 콘텐츠가 로드될 때까지 대기
-                    new_height = await page.evaluate("document.body.scrollHeight")
-                    if new_height == last_height:
-                        break
-                    last_height = new_height
-
-                logger.info("페이지 스크롤 완료.")
+            logger.info("페이지 스크롤 시작...")
+            # 페이지의 모든 게시물을 로드하기 위해 아래로 스크롤
+            async def on_step(page: Page) -> None:
+                if collector is not None:
+                    await collector.collect(page)
+                if emitter is not None:
+                    # 같은 단계에서 둘 다 찾았으면 네트워크 수집 결과(원본 해상도)를 먼저 보냄
+                    if harvester is not None:
+                        await emitter.emit_posts('network', harvester.post_ids, harvester.post_images)
+                    if collector is not None:
+                        await emitter.emit_posts('dom', collector.post_ids, collector.post_images)
+
+            scroll_stats = await (scroll_engine or ScrollEngine()).run(
+                page,
+                known_post_ids=known_post_ids,
+                on_step=on_step if collector is not None or emitter is not None else None,
+            )
+
+            logger.info("페이지 스크롤 완료.")
+
+            extract_started = time.perf_counter()
+            result = None
+            if harvester is not None:
+                await harvester.drain()
+                if harvester.throttled and not harvester.post_ids:
+                    raise RateLimitedException(f"피드 요청 {harvester.throttled}개가 요청 제한(429)으로 거절되었습니다.")
+                if harvester.post_ids:
+                    logger.info(f"네트워크 응답 {harvester.responses_parsed}개에서 총 {len(harvester.image_urls)}개의 이미지 URL을 수집했습니다.")
+                    # 첫 화면처럼 피드 응답 없이 HTML로 그려진 게시물은 DOM 추출 결과로 채움
+                    result = ProfileScrapeResult(username, *_merge_posts(
+                        harvester.post_ids, harvester.post_images,
+                        collector.post_ids if collector is not None else [], collector.post_images if collector is not None else {},
+                    ))
+                else:
+                    logger.warning("네트워크 응답에서 미디어를 찾지 못해 DOM 추출 결과로 대체합니다.")
 
+            if result is None and collector is not None:
+                if collector.image_urls:
+                    logger.info(f"DOM 증분 추출({collector.calls}회)로 총 {len(collector.image_urls)}개의 이미지 URL을 찾았습니다.")
+                    result = ProfileScrapeResult(username, collector.post_ids, collector.image_urls, collector.post_images)
+                elif BeautifulSoup is None:
+                    logger.warning("DOM에서 이미지를 찾지 못했고 bs4가 없어 HTML 파싱을 건너뜁니다.")
+                    result = ProfileScrapeResult(username, collector.post_ids, [], collector.post_images)
+                else:
+                    logger.warning("DOM에서 이미지를 찾지 못해 HTML 파싱으로 대체합니다.")
+
+            if result is None:
                 # 스크롤 후 최종 페이지 콘텐츠 다시 가져오기
                 final_page_content = await page.content()
 
-            except TimeoutError:
-                raise ScrapeTimeoutException(f"'{username}' 계정을 스크래핑하는 중 타임아웃이 발생했습니다.")
+        except TimeoutError:
+            raise ScrapeTimeoutException(f"'{username}' 계정을 스크래핑하는 중 타임아웃이 발생했습니다.")
 
+        if result is None:
             # BeautifulSoup을 사용하여 이미지 URL 파싱
             logger.info("이미지 URL 파싱 시작...")
-            soup = BeautifulSoup(final_page_content, "lxml")
-            img_tags = soup.find_all('img')
+            post_ids, image_urls, post_images = parse_profile_html(final_page_content, resolution=policy)
+            logger.info(f"총 {len(image_urls)}개의 고유한 이미지 URL을 찾았습니다.")
+            result = ProfileScrapeResult(username, post_ids, image_urls, post_images)
+        observe_stage('extract', time.perf_counter() - extract_started, extract_started)
 
-            image_urls = set()
-            for img in img_tags:
-                # 'src' 속성이 있고, CDN 주소 형식을 포함하는 경우만 추출(인스타그램 게시물-CDN 주소 형식 포함)
-                if 'src' in img.attrs and 'scontent' in img['src']:
-                    image_urls.add(img['src'])
+        result.stats = {
+            'scroll_seconds': scroll_stats.elapsed,
+            'scroll_steps': scroll_stats.steps,
+            'scroll_stop_reason': scroll_stats.stop_reason,
+            'network': usage.as_dict(),
+        }
+        logger.info(f"스크래핑 통계: {result.stats}")
 
-            logger.info(f"총 {len(image_urls)}개의 고유한 이미지 URL을 찾았습니다.")
-            return list(image_urls)
+    # 브라우저 페이지를 반납한 뒤 남은 URL을 전달(소비자가 느려도 페이지를 붙잡지 않도록)
+    if emitter is not None:
+        await emitter.emit_result(result)
+    return result
+
+def _merge_posts(
+    post_ids: List[str],
+    post_images: Dict[str, List[str]],
+    extra_post_ids: List[str],
+    extra_post_images: Dict[str, List[str]],
+) -> Tuple[List[str], List[str], Dict[str, List[str]]]:
+    """
+    네트워크 수집 결과에 DOM에서만 발견한 게시물을 더해 (게시물 ID 목록, 이미지 URL 목록, 게시물별 이미지 URL)을 반환합니다.
+    두 곳 모두에 있는 게시물은 네트워크 결과(원본 해상도, 캐러셀 전체)를 사용합니다. DOM에서만 발견한 게시물은 화면 순서를 따라
+    그 뒤에 처음 나오는 네트워크 게시물 앞에 넣고, 그런 게시물이 없으면 맨 뒤에 붙입니다.
+    """
+    known = set(post_ids)
+    before: Dict[str, List[str]] = {}
+    pending: List[str] = []
+    for post_id in extra_post_ids:
+        if post_id in known:
+            if pending:
+                before.setdefault(post_id, []).extend(pending)
+                pending = []
+        elif extra_post_images.get(post_id):
+            pending.append(post_id)
+    if not before and not pending:
+        return post_ids, [url for post_id in post_ids for url in post_images[post_id]], post_images
+
+    merged_ids: List[str] = []
+    for post_id in post_ids:
+        merged_ids.extend(before.get(post_id, []))
+        merged_ids.append(post_id)
+    merged_ids.extend(pending)
+    merged_images = {post_id: post_images.get(post_id) or extra_post_images[post_id] for post_id in merged_ids}
+    logger.info(f"피드 응답에 없던 게시물 {len(merged_ids) - len(post_ids)}개를 DOM 추출 결과에서 추가했습니다.")
+
+    image_urls: List[str] = []
+    keys: Set[str] = set()
+    for post_id in merged_ids:
+        for url in merged_images[post_id]:
+            if media_key(url) not in keys:
+                keys.add(media_key(url))
+                image_urls.append(url)
+    return merged_ids, image_urls, merged_images
+
+def _check_session(page: Page, response) -> None:
+    """
+    프로필 페이지 응답에서 세션이 막혔는지 확인합니다.
+
+    Raises:
+        RateLimitedException: 요청 제한(HTTP 429)으로 거절된 경우.
+        LoginRequiredException: 로그인 화면으로 이동된 경우(쿠키 만료 등).
+    """
+    if response is not None and response.status == 429:
+        raise RateLimitedException("인스타그램이 요청을 제한했습니다(429).")
+    if LOGIN_PATH in page.url:
+        raise LoginRequiredException("로그인 화면으로 이동되었습니다. 쿠키가 만료되었을 수 있습니다.")
+
+class _MediaEmitter:
+    """
+    스크롤 중 발견한 이미지를 미디어 키 기준으로 한 번씩만 on_media 콜백에 전달합니다.
+    같은 게시물을 DOM 추출로 먼저 보냈더라도 네트워크 수집에서 나온 그 게시물의 다른 사진(캐러셀 등)은 전달하며,
+    해상도나 서명(oh/oe)만 다른 같은 사진은 다시 보내지 않습니다.
+    """
+
+    def __init__(self, on_media: Callable[[List[str]], Awaitable[None]]):
+        self.on_media = on_media
+        self.keys: Set[str] = set()
+        # 추출 방식별로 이미 확인한 게시물 수. 게시물 목록은 뒤에 추가만 되고, 게시물의 이미지는 추가된 뒤 바뀌지 않음
+        self._checked: Dict[str, int] = {}
+
+    async def emit_posts(self, source: str, post_ids: List[str], post_images: Dict[str, List[str]]) -> None:
+        start = self._checked.get(source, 0)
+        self._checked[source] = len(post_ids)
+        await self._emit([url for post_id in post_ids[start:] for url in post_images.get(post_id) or []])
+
+    async def emit_result(self, result: ProfileScrapeResult) -> None:
+        # 최종 결과에서 아직 보내지 않은 사진(대체 추출 결과, 게시물에 연결되지 않은 이미지 포함)
+        await self._emit(result.image_urls)
+
+    async def _emit(self, urls: List[str]) -> None:
+        new_urls = []
+        for url in urls:
+            key = media_key(url)
+            if key not in self.keys:
+                self.keys.add(key)
+                new_urls.append(url)
+        if new_urls:
+            await self.on_media(new_urls)
+
+async def iter_profile_image_urls(
+    username: str,
+    pool: Optional[BrowserPool] = None,
+    queue_size: int = 64,
+    on_result: Optional[Callable[[ProfileScrapeResult], None]] = None,
+    **scrape_options,
+) -> AsyncIterator[str]:
+    """
+    스크롤이 끝나기를 기다리지 않고, 스크롤 단계마다 발견한 이미지 URL을 바로 내보내는 비동기 제너레이터.
+
+    스크래핑은 백그라운드 태스크에서 실행되며 URL은 최대 `queue_size`개까지 버퍼링됩니다.
+    소비자(다운로더)가 따라오지 못해 버퍼가 차면 스크롤이 멈춥니다. 소비자가 중간에 멈추면 스크래핑을 취소합니다.
+    스크래핑이 끝나면 `on_result`를 최종 ProfileScrapeResult로 호출하고, 스크래핑 중 예외는 소비자에게 전달됩니다.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    end = object()
+    error: Optional[Exception] = None
+
+    async def put_urls(urls: List[str]) -> None:
+        for url in urls:
+            await queue.put(url)
+
+    async def run() -> None:
+        nonlocal error
+        try:
+            result = await scrape_profile(username, pool=pool, on_media=put_urls, **scrape_options)
+            if on_result is not None:
+                on_result(result)
+        except Exception as e:
+            error = e
+        await queue.put(end)
+
+    task = asyncio.ensure_future(run())
+    try:
+        while True:
+            url = await queue.get()
+            if url is end:
+                break
+            yield url
+        if error is not None:
+            raise error
+    finally:
+        task.cancel()
+
+async def scrape_profile_page(username: str, pool: Optional[BrowserPool] = None, cache=None, **scrape_options) -> List[str]:
+    """
+    주어진 인스타그램 계정 페이지로 이동하여 모든 게시물이 로드될 때까지 스크롤하고,
+    모든 게시물 이미지의 URL을 추출하여 리스트로 반환합니다.
+
+    `cache`(ProfileCache)가 주어지면 캐시된 결과를 사용하거나 증분 스크래핑으로 갱신합니다.
+    `scrape_options`(extraction, resource_policy 등)는 scrape_profile에 그대로 전달됩니다.
+    """
+    if cache is not None:
+        result = await cache.get_or_scrape(username, pool=pool, **scrape_options)
+    else:
+        result = await scrape_profile(username, pool=pool, **scrape_options)
+    return result.image_urls
+
+async def iter_profile_page(username: str, pool: Optional[BrowserPool] = None, cache=None, **scrape_options) -> AsyncIterator[str]:
+    """
+    scrape_profile_page의 파이프라인 버전. 이미지 URL을 발견하는 대로 내보냅니다.
+    `cache`(ProfileCache)가 주어지면 캐시된 결과를 바로 내보내거나 스크래핑 결과를 캐시에 저장합니다.
+    """
+    if cache is not None:
+        urls = cache.iter_image_urls(username, pool=pool, **scrape_options)
+    else:
+        urls = iter_profile_image_urls(username, pool=pool, **scrape_options)
+    try:
+        async for url in urls:
+            yield url
+    finally:
+        await urls.aclose()
 
 # 직접 실행하여 테스트 python scraper.py
 if __name__ == '__main__':
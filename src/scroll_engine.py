@@ -0,0 +1,148 @@
+import time
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Set
+from playwright.async_api import Page, TimeoutError
+from .metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# 지금까지 화면에 나타난 게시물 링크를 페이지 안의 Set에 누적합니다.
+# 인스타그램은 그리드를 가상화하므로 현재 DOM의 링크 개수가 아니라 누적 개수를 진행 신호로 사용합니다.
+_COLLECT_STATE_JS = """
+() => {
+    const seen = window.__igSeenPosts || (window.__igSeenPosts = new Set());
+    document.querySelectorAll('a[href*="/p/"]').forEach(a => seen.add(a.getAttribute('href')));
+    return {count: seen.size, height: document.body.scrollHeight};
+}
+"""
+
+# MutationObserver 기반 폴링(polling="mutation")으로 DOM이 바뀔 때마다 평가되는 진행 조건
+_PROGRESS_JS = """
+(prev) => {
+    const seen = window.__igSeenPosts || (window.__igSeenPosts = new Set());
+    document.querySelectorAll('a[href*="/p/"]').forEach(a => seen.add(a.getAttribute('href')));
+    return seen.size > prev.count || document.body.scrollHeight > prev.height;
+}
+"""
+
+# 알고 있는 게시물 링크가 화면에 나타났는지 확인하는 스크립트(증분 스크래핑용)
+_HAS_KNOWN_POST_JS = """
+(known) => Array.from(document.querySelectorAll('a[href*="/p/"]')).some(a => {
+    const m = (a.getAttribute('href') || '').match(/\\/p\\/([^\\/?#]+)/);
+    return m !== null && known.includes(m[1]);
+})
+"""
+
+_SCROLL_TO_BOTTOM_JS = "window.scrollTo(0, document.body.scrollHeight);"
+_NUDGE_UP_JS = "window.scrollBy(0, -window.innerHeight);"
+
+
+class ScrollStats:
+    """스크롤 한 번의 실행 결과(스크롤 횟수, 발견한 게시물 수, 정체 횟수, 소요 시간, 종료 사유)."""
+
+    def __init__(self):
+        self.steps = 0
+        self.posts_seen = 0
+        self.stalls = 0
+        self.elapsed = 0.0
+        self.stop_reason = ''
+
+    def __repr__(self) -> str:
+        return (
+            f"ScrollStats(steps={self.steps}, posts_seen={self.posts_seen}, stalls={self.stalls}, "
+            f"elapsed={self.elapsed:.2f}s, stop_reason={self.stop_reason!r})"
+        )
+
+
+class ScrollEngine:
+    """
+    고정된 sleep 대신 실제 신호(새 게시물 링크, 페이지 높이 변화)를 기다리며 프로필 그리드를 스크롤하는 엔진.
+
+    - 스크롤 후 MutationObserver 폴링으로 새 게시물이 나타나는 즉시 다음 스크롤로 넘어갑니다.
+    - 대기 시간 제한은 최근 로딩 시간의 지수 이동 평균(EWMA)에 맞춰 조정됩니다.
+    - 새 콘텐츠가 나타나지 않으면(정체) 위로 살짝 스크롤했다가 다시 내려 로딩을 재시도하고,
+      `stall_retries`회 연속 정체되면 끝에 도달한 것으로 판단합니다.
+    - `max_posts`, `max_duration`으로 스크롤 예산을 제한할 수 있습니다.
+    """
+
+    def __init__(
+        self,
+        initial_timeout: float = 3.0,
+        min_timeout: float = 0.5,
+        max_timeout: float = 10.0,
+        timeout_multiplier: float = 4.0,
+        stall_retries: int = 2,
+        max_posts: Optional[int] = None,
+        max_duration: Optional[float] = None,
+    ):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.stall_retries = stall_retries
+        self.max_posts = max_posts
+        self.max_duration = max_duration
+
+    async def run(
+        self,
+        page: Page,
+        known_post_ids: Optional[Set[str]] = None,
+        on_step: Optional[Callable[[Page], Awaitable[Any]]] = None,
+    ) -> ScrollStats:
+        """
+        더 이상 새 게시물이 로드되지 않거나, 예산을 다 쓰거나, 알고 있는 게시물에 도달할 때까지 스크롤합니다.
+        `on_step`이 주어지면 매 스크롤 단계와 종료 직전에 호출합니다(증분 추출용).
+        """
+        stats = ScrollStats()
+        started = time.monotonic()
+        known: Optional[List[str]] = list(known_post_ids) if known_post_ids else None
+        load_time_avg: Optional[float] = None
+        timeout = self.initial_timeout
+        consecutive_stalls = 0
+
+        state = await page.evaluate(_COLLECT_STATE_JS)
+        while True:
+            if on_step is not None:
+                await on_step(page)
+            stats.posts_seen = state['count']
+            if self.max_posts is not None and state['count'] >= self.max_posts:
+                stats.stop_reason = 'max_posts'
+                break
+            if self.max_duration is not None and time.monotonic() - started >= self.max_duration:
+                stats.stop_reason = 'max_duration'
+                break
+            if known and await page.evaluate(_HAS_KNOWN_POST_JS, known):
+                logger.info("이미 알고 있는 게시물에 도달하여 스크롤을 중단합니다.")
+                stats.stop_reason = 'known_post'
+                break
+
+            await page.evaluate(_SCROLL_TO_BOTTOM_JS)
+            stats.steps += 1
+            wait_started = time.monotonic()
+            try:
+                await page.wait_for_function(_PROGRESS_JS, arg=state, polling='mutation', timeout=timeout * 1000)
+            except TimeoutError:
+                observe_stage('scroll_step', time.monotonic() - wait_started)
+                consecutive_stalls += 1
+                stats.stalls += 1
+                if consecutive_stalls > self.stall_retries:
+                    stats.stop_reason = 'end_of_feed'
+                    break
+                # 느린 네트워크일 수 있으므로 대기 시간을 늘리고, 살짝 위로 올려 무한 스크롤 트리거를 다시 발생시킴
+                timeout = min(timeout * 2, self.max_timeout)
+                await page.evaluate(_NUDGE_UP_JS)
+                continue
+
+            load_time = time.monotonic() - wait_started
+            observe_stage('scroll_step', load_time)
+            load_time_avg = load_time if load_time_avg is None else 0.7 * load_time_avg + 0.3 * load_time
+            timeout = min(max(load_time_avg * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+            consecutive_stalls = 0
+            state = await page.evaluate(_COLLECT_STATE_JS)
+
+        if on_step is not None:
+            await on_step(page)
+        stats.elapsed = time.monotonic() - started
+        observe_stage('scroll', stats.elapsed)
+        logger.info(f"스크롤 종료: {stats!r}")
+        return stats
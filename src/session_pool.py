@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBlockedException(Exception):
+    """인스타그램이 세션(계정)의 요청을 막았을 때의 예외. 이 예외로 끝난 세션은 쿨다운에 들어갑니다."""
+    pass
+
+class RateLimitedException(SessionBlockedException):
+    """요청이 너무 많아 제한(HTTP 429)되었을 때 발생하는 예외"""
+    pass
+
+class LoginRequiredException(SessionBlockedException):
+    """로그인 화면으로 이동되어(쿠키 만료 등) 프로필을 볼 수 없을 때 발생하는 예외"""
+    pass
+
+class NoSessionAvailableException(Exception):
+    """대기 시간 안에 사용할 수 있는 세션이 없을 때(모두 쿨다운 중 등) 발생하는 예외"""
+    pass
+
+
+class TokenBucket:
+    """
+    초당 `rate`개씩 채워지고 최대 `burst`개까지 쌓이는 토큰 버킷. `rate`가 None이면 제한하지 않습니다.
+    시간(`now`)은 호출하는 쪽에서 넘겨받습니다(기본값 time.monotonic()).
+    """
+
+    def __init__(self, rate: Optional[float], burst: float = 1.0, now: Optional[float] = None):
+        if rate is not None and rate <= 0:
+            raise ValueError("토큰 충전 속도는 0보다 커야 합니다.")
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic() if now is None else now
+
+    def tokens(self, now: Optional[float] = None) -> float:
+        if self.rate is None:
+            return self.burst
+        now = time.monotonic() if now is None else now
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return self._tokens
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """토큰 하나가 생길 때까지 남은 시간(초). 지금 사용할 수 있으면 0."""
+        tokens = self.tokens(now)
+        if tokens >= 1.0:
+            return 0.0
+        return (1.0 - tokens) / self.rate
+
+    def take(self, now: Optional[float] = None) -> bool:
+        if self.tokens(now) < 1.0:
+            return False
+        if self.rate is not None:
+            self._tokens -= 1.0
+        return True
+
+
+class Session:
+    """인증된 storage state(쿠키 파일) 하나와 그 계정의 요청 제한, 사용 통계."""
+
+    def __init__(self, name: str, storage_state_path: str, bucket: TokenBucket, now: float):
+        self.name = name
+        self.storage_state_path = storage_state_path
+        self.bucket = bucket
+        self.in_use = 0
+        self.uses = 0
+        self.blocked = 0
+        self.cooldown_until = 0.0
+        self.busy_seconds = 0.0
+        self.saved_at = now
+        self.started_at = now
+
+    def cooling_down(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def utilization(self, now: float) -> float:
+        """시작 후 평균 동시 사용 수(체크아웃 시간의 합 / 경과 시간). 1이면 한 계정이 쉬지 않고 사용된 것입니다."""
+        elapsed = now - self.started_at
+        return self.busy_seconds / elapsed if elapsed > 0 else 0.0
+
+
+class SessionPool:
+    """
+    여러 인증 세션(계정별 쿠키 파일)에 스크래핑을 나눠 배정하는 풀.
+
+    - 계정마다 토큰 버킷으로 요청 속도를 제한합니다(`rate_per_minute`, `burst`). None이면 제한하지 않습니다.
+    - 쿨다운 중이 아니고 토큰이 있는 세션 중 사용 중인 페이지가 가장 적은 세션을 고릅니다.
+      모든 세션이 토큰을 기다리거나 쿨다운 중이면 가장 빨리 사용할 수 있게 될 때까지 기다립니다(최대 `max_wait`초).
+    - 사용 중 SessionBlockedException(요청 제한, 로그인 화면)이 나면 그 세션은 `cooldown`초 동안 배정되지 않습니다.
+    - 사용을 마친 세션의 갱신된 쿠키는 `save_interval`초에 한 번씩 원래 파일에 원자적으로(임시 파일 + os.replace) 다시 씁니다.
+    - 토큰 버킷과 쿨다운은 이 풀(프로세스) 안에서만 적용됩니다. 여러 프로세스가 같은 계정을 쓰면 한도를 프로세스 수로 나눠 주어야 합니다.
+
+    사용 예:
+    sessions = SessionPool(['account_a.json', 'account_b.json'], rate_per_minute=10)
+    async with sessions.session() as session:
+        context = await browser.new_context(storage_state=session.storage_state_path)
+        ...
+    """
+
+    def __init__(
+        self,
+        storage_state_paths: List[str],
+        rate_per_minute: Optional[float] = None,
+        burst: float = 3.0,
+        cooldown: float = 600.0,
+        max_concurrent: Optional[int] = None,
+        max_wait: Optional[float] = 120.0,
+        save_interval: float = 300.0,
+    ):
+        if not storage_state_paths:
+            raise ValueError("세션 풀에는 쿠키 파일이 하나 이상 필요합니다.")
+        self.cooldown = cooldown
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.save_interval = save_interval
+        now = time.monotonic()
+        rate = rate_per_minute / 60.0 if rate_per_minute else None
+        self.sessions: List[Session] = []
+        for path in storage_state_paths:
+            name = _session_name(path, {session.name for session in self.sessions})
+            self.sessions.append(Session(name, path, TokenBucket(rate, burst, now), now))
+        self.waits = 0
+        self.saves = 0
+        self._changed: Optional[asyncio.Condition] = None
+
+    @property
+    def storage_state_paths(self) -> List[str]:
+        return [session.storage_state_path for session in self.sessions]
+
+    async def acquire(self) -> Session:
+        """
+        사용할 세션을 골라 토큰 하나를 쓰고 반환합니다. 사용이 끝나면 반드시 release()를 호출해야 합니다.
+
+        Raises:
+            NoSessionAvailableException: `max_wait`초 안에 사용할 수 있는 세션이 없을 때.
+        """
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        started = time.monotonic()
+        waited = False
+        async with self._changed:
+            while True:
+                now = time.monotonic()
+                session, wait = self._pick(now)
+                if session is not None:
+                    session.bucket.take(now)
+                    session.in_use += 1
+                    session.uses += 1
+                    return session
+                remaining = None if self.max_wait is None else self.max_wait - (now - started)
+                if remaining is not None and (remaining <= 0 or (wait is not None and wait > remaining)):
+                    raise NoSessionAvailableException(
+                        "사용할 수 있는 인스타그램 세션이 없습니다(요청 제한 또는 쿨다운 중). 잠시 후 다시 시도해주세요."
+                    )
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                try:
+                    await asyncio.wait_for(self._changed.wait(), wait if wait is not None else remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _pick(self, now: float):
+        """
+        (지금 사용할 세션, 없으면 None과 다시 확인할 때까지 기다릴 시간)을 반환합니다.
+        모든 세션이 동시 사용 수 제한에 걸려 있으면 기다릴 시간은 None(반납될 때까지)입니다.
+        """
+        ready = []
+        wait = None
+        for session in self.sessions:
+            if session.cooling_down(now):
+                until = session.cooldown_until - now
+            elif self.max_concurrent is not None and session.in_use >= self.max_concurrent:
+                # 다른 세션이 반납되면 Condition으로 깨어남
+                continue
+            else:
+                until = session.bucket.wait_time(now)
+                if until == 0:
+                    ready.append(session)
+                    continue
+            wait = until if wait is None else min(wait, until)
+        if ready:
+            # 가장 덜 바쁜 세션, 같으면 토큰이 많이 남은 세션
+            return min(ready, key=lambda s: (s.in_use, -s.bucket.tokens(now), s.uses)), 0.0
+        return None, wait
+
+    async def release(self, session: Session, busy_seconds: float = 0.0, error: Optional[BaseException] = None) -> None:
+        """세션을 반납합니다. `error`가 SessionBlockedException이면 세션을 쿨다운에 넣습니다."""
+        session.in_use -= 1
+        session.busy_seconds += busy_seconds
+        if isinstance(error, SessionBlockedException):
+            session.blocked += 1
+            session.cooldown_until = time.monotonic() + self.cooldown
+            logger.warning(f"세션 '{session.name}'이(가) 차단되어 {self.cooldown:.0f}초 동안 쉽니다: {error}")
+        if self._changed is not None:
+            async with self._changed:
+                self._changed.notify_all()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[Session]:
+        """세션을 체크아웃하는 컨텍스트 매니저. 블록에서 나온 예외로 쿨다운 여부를 판단합니다."""
+        session = await self.acquire()
+        started = time.monotonic()
+        error = None
+        try:
+            yield session
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await self.release(session, time.monotonic() - started, error)
+
+    def save_due(self, session: Session, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return now - session.saved_at >= self.save_interval
+
+    async def save_storage_state(self, session: Session, state: dict) -> None:
+        """갱신된 storage state(쿠키)를 세션의 파일에 원자적으로 씁니다. 쓰는 도중의 파일은 다른 프로세스에 보이지 않습니다."""
+        session.saved_at = time.monotonic()
+        await asyncio.to_thread(_write_json_atomic, session.storage_state_path, state)
+        self.saves += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'sessions': len(self.sessions),
+            'available': sum(1 for session in self.sessions if not session.cooling_down(now)),
+            'waits': self.waits,
+            'saves': self.saves,
+            'in_use': {session.name: session.in_use for session in self.sessions},
+            'uses': {session.name: session.uses for session in self.sessions},
+            'blocked': {session.name: session.blocked for session in self.sessions},
+            'utilization': {session.name: round(session.utilization(now), 4) for session in self.sessions},
+            'cooldown_seconds': {
+                session.name: round(max(session.cooldown_until - now, 0.0), 1) for session in self.sessions
+            },
+        }
+
+
+def _session_name(path: str, taken) -> str:
+    """쿠키 파일 이름(확장자 제외)을 세션 이름으로 사용합니다. 겹치면 번호를 붙입니다."""
+    base = os.path.splitext(os.path.basename(path))[0] or 'session'
+    name, i = base, 2
+    while name in taken:
+        name, i = f'{base}_{i}', i + 1
+    return name
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
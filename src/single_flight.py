@@ -0,0 +1,208 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    같은 키로 동시에 들어온 호출을 하나로 합칩니다(single-flight).
+
+    처음 호출한 쪽(leader)의 코루틴만 실행하고, 실행 중에 같은 키로 들어온 호출은 그 결과(또는 예외)를 함께 받습니다.
+    코루틴은 별도 태스크로 실행되므로 leader 요청이 취소되어도 함께 기다리는 호출에는 영향이 없습니다.
+
+    사용 예:
+    flight = SingleFlight()
+    result = await flight.do(username, lambda: scrape_profile(username))
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.info(f"'{key}' 진행 중인 작업에 합류합니다.")
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 기다리던 호출이 모두 취소된 경우에도 "exception was never retrieved" 경고가 나지 않도록 예외를 확인
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {'in_flight': len(self._calls), 'leaders': self.leaders, 'coalesced': self.coalesced}
+
+
+class SharedStream:
+    """
+    하나의 비동기 이터레이터를 동시에 시작한 여러 소비자가 함께 읽도록 공유합니다.
+
+    원본은 백그라운드 태스크가 한 번만 읽고, 각 소비자는 같은 항목을 같은 순서로 받습니다.
+    모든 소비자가 받아 간 항목은 바로 버리고(`release`가 주어지면 그 항목으로 호출), 아직 받아 가지 않은 항목이
+    `max_buffered`개가 되면 원본 읽기를 멈추므로, 보관하는 항목은 가장 느린 소비자와의 차이만큼으로 제한됩니다.
+    처음부터 다시 보내 줄 수 없으므로 소비자는 첫 항목이 나오기 전에만 합류할 수 있습니다(`joinable`).
+    모든 소비자가 떠나면 원본 읽기를 취소합니다.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator,
+        on_close: Optional[Callable[[], Any]] = None,
+        release: Optional[Callable[[Any], Any]] = None,
+        max_buffered: int = 8,
+    ):
+        self._items: Deque[Any] = deque()
+        # _items[0]의 순번(지금까지 버린 항목 수)
+        self._offset = 0
+        self._produced = 0
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        # 소비자별로 다음에 받을 항목의 순번
+        self._positions: Dict[int, int] = {}
+        self._next_subscriber = 0
+        self._on_close = on_close
+        self._release = release
+        self.max_buffered = max_buffered
+        self._task = asyncio.ensure_future(self._pump(source))
+
+    @property
+    def joinable(self) -> bool:
+        """아직 항목이 하나도 나오지 않아 새 소비자가 처음부터 함께 받을 수 있는지 여부."""
+        return self._produced == 0 and not self._done
+
+    @property
+    def buffered(self) -> int:
+        return len(self._items)
+
+    async def _pump(self, source: AsyncIterator) -> None:
+        try:
+            async for item in source:
+                async with self._changed:
+                    self._items.append(item)
+                    self._produced += 1
+                    self._changed.notify_all()
+                    # 느린 소비자가 따라올 때까지 원본 읽기를 멈춤(backpressure)
+                    await self._changed.wait_for(lambda: len(self._items) < self.max_buffered)
+        except Exception as e:
+            self._error = e
+        finally:
+            if hasattr(source, 'aclose'):
+                await source.aclose()
+            self._done = True
+            if self._on_close is not None:
+                self._on_close()
+            async with self._changed:
+                self._changed.notify_all()
+
+    def subscribe(self) -> AsyncIterator:
+        """새 소비자를 등록하고 항목을 처음부터 내보내는 비동기 제너레이터를 반환합니다."""
+        token = self._next_subscriber
+        self._next_subscriber += 1
+        self._positions[token] = self._offset
+        return self._iterate(token)
+
+    async def _iterate(self, token: int) -> AsyncIterator:
+        index = self._positions[token]
+        try:
+            while True:
+                async with self._changed:
+                    # 이전 항목의 처리가 끝났으므로(다음 항목을 요청함) 받아 간 것으로 기록
+                    self._positions[token] = index
+                    self._trim()
+                    await self._changed.wait_for(lambda: index < self._offset + len(self._items) or self._done)
+                    if index < self._offset + len(self._items):
+                        item = self._items[index - self._offset]
+                    elif self._error is not None:
+                        raise self._error
+                    else:
+                        return
+                index += 1
+                yield item
+        finally:
+            del self._positions[token]
+            if not self._positions and not self._done:
+                self._task.cancel()
+                # 취소 중인 스트림에 새 소비자가 합류하지 않도록 바로 해제
+                if self._on_close is not None:
+                    self._on_close()
+            if self._positions:
+                # 가장 느린 소비자가 떠났으면 남은 소비자 기준으로 버림
+                async with self._changed:
+                    self._trim()
+            else:
+                self._trim(all_items=True)
+
+    def _trim(self, all_items: bool = False) -> None:
+        """모든 소비자가 받아 간 항목을 버립니다. `all_items`이면 남은 소비자가 없으므로 전부 버립니다."""
+        consumed = self._offset + len(self._items) if all_items else min(self._positions.values(), default=self._offset)
+        trimmed = False
+        while self._offset < consumed and self._items:
+            item = self._items.popleft()
+            self._offset += 1
+            trimmed = True
+            if self._release is not None:
+                self._release(item)
+        if trimmed and not all_items:
+            # 버퍼에 자리가 났으므로 원본 읽기 재개
+            self._changed.notify_all()
+
+
+class StreamFlight:
+    """
+    같은 키로 동시에 요청된 스트림(예: 같은 계정의 이미지 다운로드)을 하나의 SharedStream으로 합칩니다.
+    첫 항목이 나오기 전에 들어온 요청만 합류하며, 그 뒤에 들어온 요청이나 스트림이 끝난 뒤의 요청은 새 스트림을 시작합니다.
+    `release`가 주어지면 모든 소비자가 받아 간 항목으로 호출합니다(예: 스풀 반납).
+    """
+
+    def __init__(self, release: Optional[Callable[[Any], Any]] = None):
+        self.release = release
+        self._streams: Dict[Hashable, SharedStream] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def joinable(self, key: Hashable) -> bool:
+        """지금 `subscribe(key, ...)`를 호출하면 진행 중인 스트림에 합류하는지 여부."""
+        stream = self._streams.get(key)
+        return stream is not None and stream.joinable
+
+    def subscribe(self, key: Hashable, factory: Callable[[], AsyncIterator]) -> AsyncIterator:
+        stream = self._streams.get(key)
+        if stream is not None and stream.joinable:
+            self.coalesced += 1
+            logger.info(f"'{key}' 진행 중인 다운로드에 합류합니다.")
+        else:
+            self.leaders += 1
+            stream = self._start(key, factory)
+        return stream.subscribe()
+
+    def _start(self, key: Hashable, factory: Callable[[], AsyncIterator]) -> SharedStream:
+        stream = SharedStream(factory(), on_close=lambda: self._forget(key, stream), release=self.release)
+        # 이미 항목을 내보낸 스트림이 있으면 이후 요청은 이 새 스트림에 합류
+        self._streams[key] = stream
+        return stream
+
+    def _forget(self, key: Hashable, stream: SharedStream) -> None:
+        if self._streams.get(key) is stream:
+            del self._streams[key]
+
+    def stats(self) -> dict:
+        return {'in_flight': len(self._streams), 'leaders': self.leaders, 'coalesced': self.coalesced}
@@ -0,0 +1,164 @@
+import logging
+import tempfile
+import threading
+import weakref
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 디스크 스풀 파일을 읽어 내보내는 조각 크기(ZIP 조각 크기와 비슷하게 유지)
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class MemoryBudget:
+    """
+    RAM에 보관할 수 있는 이미지 바이트 수 한도.
+
+    요청(또는 작업) 하나의 한도는 `parent`로 프로세스 전체 한도에 연결하며, 예약은 양쪽 한도를 모두 만족할 때만 성공합니다.
+    예약에 실패한 이미지는 디스크로 넘어갑니다(spill). 여러 스레드(ZIP 작성, 캐시 저장)에서 사용할 수 있습니다.
+
+    사용 예:
+    process_budget = MemoryBudget(256 * 1024 ** 2)
+    request_budget = MemoryBudget(32 * 1024 ** 2, parent=process_budget)
+    """
+
+    def __init__(self, limit: int, parent: Optional['MemoryBudget'] = None):
+        self.limit = limit
+        self.parent = parent
+        self.in_use = 0
+        self.peak = 0
+        self.spills = 0
+        self.spilled_bytes = 0
+        self._lock = threading.Lock()
+
+    def try_reserve(self, size: int) -> bool:
+        with self._lock:
+            if self.in_use + size > self.limit:
+                return False
+            if self.parent is not None and not self.parent.try_reserve(size):
+                return False
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.in_use -= size
+        if self.parent is not None:
+            self.parent.release(size)
+
+    def record_spill(self, size: int) -> None:
+        with self._lock:
+            self.spills += 1
+            self.spilled_bytes += size
+        if self.parent is not None:
+            self.parent.record_spill(size)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'in_use': self.in_use,
+                'peak': self.peak,
+                'spills': self.spills,
+                'spilled_bytes': self.spilled_bytes,
+            }
+
+
+class _SpoolState:
+    """SpooledImage가 정리될 때(close 또는 가비지 컬렉션) 반납할 자원. finalizer가 이미지 객체를 참조하지 않도록 분리합니다."""
+
+    def __init__(self, budget: MemoryBudget):
+        self.budget = budget
+        self.reserved = 0
+        self.file = None
+
+    def release(self) -> None:
+        if self.reserved:
+            self.budget.release(self.reserved)
+            self.reserved = 0
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SpooledImage:
+    """
+    다운로드한 이미지 한 장을 조각 단위로 받아 두는 스풀.
+
+    `budget`에 여유가 있는 동안은 RAM에 두고, 예약에 실패하면 그때까지 받은 조각까지 임시 파일(`spool_dir`)로 옮긴 뒤
+    나머지도 파일에 씁니다. 크기를 아는 조각 이터러블(`len()`, 반복)이므로 ZipStreamWriter.add에 그대로 넘길 수 있고,
+    여러 번 처음부터 읽을 수 있어 합쳐진 요청(StreamFlight)의 소비자들이 함께 사용할 수 있습니다.
+    `close()`를 호출하거나 더 이상 참조되지 않으면 예약한 메모리를 반납하고 임시 파일을 삭제합니다.
+    """
+
+    def __init__(self, budget: MemoryBudget, spool_dir: Optional[str] = None):
+        self.spool_dir = spool_dir
+        self.size = 0
+        self._chunks: List[bytes] = []
+        self._lock = threading.Lock()
+        self._state = _SpoolState(budget)
+        self._finalizer = weakref.finalize(self, self._state.release)
+
+    @property
+    def spilled(self) -> bool:
+        return self._state.file is not None
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        with self._lock:
+            if self._state.file is None:
+                if self._state.budget.try_reserve(len(chunk)):
+                    self._state.reserved += len(chunk)
+                    self._chunks.append(bytes(chunk))
+                    self.size += len(chunk)
+                    return
+                self._spill()
+            self._state.file.seek(0, 2)
+            self._state.file.write(chunk)
+            self.size += len(chunk)
+
+    def _spill(self) -> None:
+        self._state.file = tempfile.TemporaryFile(dir=self.spool_dir, prefix='spool-')
+        self._state.file.writelines(self._chunks)
+        self._chunks = []
+        self._state.budget.release(self._state.reserved)
+        self._state.reserved = 0
+        self._state.budget.record_spill(self.size)
+        logger.debug(f"메모리 한도를 넘어 이미지를 디스크로 옮겼습니다 ({self.size}바이트까지 받음)")
+
+    def chunks(self, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """받아 둔 내용을 처음부터 조각 단위로 내보냅니다. 디스크에 있는 경우에도 한 번에 조각 하나만 메모리에 올립니다."""
+        if self._state.file is None:
+            yield from list(self._chunks)
+            return
+        offset = 0
+        while offset < self.size:
+            # 여러 소비자가 같은 파일을 읽을 수 있으므로 위치 이동과 읽기를 한 번에 수행
+            with self._lock:
+                self._state.file.seek(offset)
+                chunk = self._state.file.read(min(chunk_size, self.size - offset))
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+    def read(self) -> bytes:
+        return b''.join(self.chunks())
+
+    def close(self) -> None:
+        self._chunks = []
+        self._finalizer()
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self.chunks()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __enter__(self) -> 'SpooledImage':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
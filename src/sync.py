@@ -0,0 +1,354 @@
+# 여러 계정의 사진을 디렉터리로 내려받는 명령줄 동기화 도구. 저장소 루트에서 실행합니다.
+#
+#   python -m src.sync usernames.txt --out out --parallelism 4
+#
+# 계정마다 `out/<username>/`에 이미지를 바로 쓰고, 받은 파일을 `out/<username>/.manifest.json`에 기록합니다.
+# 다시 실행하면 알고 있는 게시물이 보이는 즉시 스크롤을 멈추는 짧은(증분) 스크래핑만 하고, 이미 받은 사진은 다시 받지 않습니다.
+# 끝나면 계정별 결과와 전체 처리량을 출력하며, 실패한 계정이 있으면 종료 코드 1을 반환합니다.
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+from .browser_manager import BrowserPool, ResourceBlockPolicy, FIRST_PARTY_DOMAINS
+from .downloader import DownloadResult, ImageData, ImageDownloader
+from .media_urls import FilenameAllocator, ResolutionPolicy, media_key
+from .profile_cache import is_valid_username, normalize_username
+from .scraper import scrape_profile, INSTAGRAM_URL, ProfileScrapeResult
+from .session_pool import SessionPool
+from .spool import SpooledImage
+
+logger = logging.getLogger(__name__)
+
+# 계정 디렉터리에 두는 동기화 기록 파일
+SYNC_MANIFEST_NAME = '.manifest.json'
+
+# 새로 받은 사진이 이만큼 쌓일 때마다 동기화 기록을 저장(중단되어도 받은 사진을 다시 받지 않도록)
+MANIFEST_SAVE_EVERY = 50
+
+
+class SyncManifest:
+    """
+    계정 디렉터리 하나의 동기화 기록. 받은 사진(미디어 키 → 파일명, 크기)과 알고 있는 게시물 ID를 담습니다.
+    `complete`가 False이면(이전 실행에서 받지 못한 사진이 있으면) 다음 실행은 전체 스크래핑을 합니다.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.post_ids: List[str] = []
+        self.files: Dict[str, dict] = {}
+        self.complete = False
+        self.full_scraped_at: Optional[float] = None
+        self.synced_at: Optional[float] = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, SYNC_MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, directory: str) -> 'SyncManifest':
+        """기록 파일을 읽습니다. 없거나 읽을 수 없으면 빈 기록을 반환합니다(처음부터 다시 받음)."""
+        manifest = cls(directory)
+        try:
+            with open(manifest.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return manifest
+        except ValueError as e:
+            logger.warning(f"동기화 기록을 읽지 못해 무시합니다: {manifest.path} ({e})")
+            return manifest
+        manifest.post_ids = list(data.get('post_ids', []))
+        manifest.files = dict(data.get('files', {}))
+        manifest.complete = bool(data.get('complete', False))
+        manifest.full_scraped_at = data.get('full_scraped_at')
+        manifest.synced_at = data.get('synced_at')
+        return manifest
+
+    def has_file(self, key: str) -> bool:
+        """사진이 기록되어 있고 디스크의 파일 크기도 같은지 확인합니다."""
+        entry = self.files.get(key)
+        if entry is None:
+            return False
+        try:
+            return os.path.getsize(os.path.join(self.directory, entry['filename'])) == entry['size']
+        except OSError:
+            return False
+
+    def missing_files(self) -> int:
+        return sum(1 for key in self.files if not self.has_file(key))
+
+    def save(self) -> None:
+        """기록을 원자적으로(임시 파일 + os.replace) 씁니다."""
+        data = {
+            'post_ids': self.post_ids,
+            'files': self.files,
+            'complete': self.complete,
+            'full_scraped_at': self.full_scraped_at,
+            'synced_at': self.synced_at,
+        }
+        _write_atomic(self.path, [json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')])
+
+
+class AccountSync:
+    """계정 하나의 동기화 결과."""
+
+    def __init__(self, username: str):
+        self.username = username
+        self.status = 'pending'
+        self.scrape_mode: Optional[str] = None
+        self.found = 0
+        self.skipped = 0
+        self.download = DownloadResult()
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def summary(self) -> str:
+        if self.status == 'error':
+            return f"{self.username}: 실패 - {self.error}"
+        return (
+            f"{self.username}: {self.scrape_mode} 스크래핑, 사진 {self.found}개 중 새로 받음 {self.download.succeeded}개, "
+            f"건너뜀 {self.skipped}개, 실패 {self.download.failed}개, {self.download.bytes_downloaded / 1e6:.1f}MB, {self.seconds:.1f}초"
+        )
+
+
+class ProfileSyncer:
+    """
+    계정들을 `out_dir/<username>/`로 동기화합니다.
+
+    - 최대 `parallelism`개 계정을 동시에 처리하며, 브라우저 풀과 다운로더 세션(커넥션 풀)은 모든 계정이 공유합니다.
+    - 기록된 게시물이 있으면 증분 스크래핑(`known_post_ids`)을 하고, 처음이거나 이전 실행이 완료되지 않았거나
+      기록된 파일이 없어졌거나 마지막 전체 스크래핑 후 `full_refresh_after`초가 지났으면 전체 스크래핑을 합니다.
+    - 기록에 있고 디스크에도 있는 사진(미디어 키 기준)은 받지 않습니다. 새 사진은 임시 파일에 쓴 뒤 os.replace로 옮깁니다.
+    - 기록은 새 사진 `save_every`장마다, 그리고 계정 처리가 끝나거나 실패할 때 저장하므로 중단된 실행에서 받은 사진도 다시 받지 않습니다.
+
+    사용 예:
+    syncer = ProfileSyncer(scrape, downloader, 'out')
+    results = await syncer.sync_all(['user_a', 'user_b'], parallelism=4)
+    """
+
+    def __init__(
+        self,
+        scrape: Callable[[str, Optional[Set[str]]], Awaitable[ProfileScrapeResult]],
+        downloader: ImageDownloader,
+        out_dir: str,
+        full_refresh_after: float = 7 * 86400.0,
+        save_every: int = MANIFEST_SAVE_EVERY,
+    ):
+        self.scrape = scrape
+        self.downloader = downloader
+        self.out_dir = out_dir
+        self.full_refresh_after = full_refresh_after
+        self.save_every = save_every
+
+    async def sync_all(self, usernames: List[str], parallelism: int = 2) -> List[AccountSync]:
+        limit = asyncio.Semaphore(parallelism)
+
+        async def run(username: str) -> AccountSync:
+            async with limit:
+                return await self.sync(username)
+
+        return await asyncio.gather(*(run(username) for username in usernames))
+
+    async def sync(self, username: str) -> AccountSync:
+        """계정 하나를 동기화합니다. 오류는 예외 대신 결과(status='error')에 기록됩니다."""
+        account = AccountSync(username)
+        account.started_at = time.time()
+        try:
+            await self._sync(account)
+            account.status = 'ok'
+        except Exception as e:
+            account.status = 'error'
+            account.error = str(e) or type(e).__name__
+            logger.error(f"'{username}' 동기화 실패: {account.error}")
+        finally:
+            account.finished_at = time.time()
+        logger.info(account.summary())
+        return account
+
+    async def _sync(self, account: AccountSync) -> None:
+        directory = os.path.join(self.out_dir, normalize_username(account.username))
+        os.makedirs(directory, exist_ok=True)
+        manifest = SyncManifest.load(directory)
+
+        now = time.time()
+        incremental = (
+            manifest.complete
+            and manifest.post_ids
+            and manifest.full_scraped_at is not None
+            and now - manifest.full_scraped_at < self.full_refresh_after
+            and manifest.missing_files() == 0
+        )
+        account.scrape_mode = 'incremental' if incremental else 'full'
+        result = await self.scrape(account.username, set(manifest.post_ids) if incremental else None)
+        if not incremental:
+            manifest.full_scraped_at = now
+
+        names = FilenameAllocator()
+        for key, entry in manifest.files.items():
+            names.reserve(key, entry['filename'])
+        pending = []
+        for url in result.image_urls:
+            account.found += 1
+            if manifest.has_file(media_key(url)):
+                account.skipped += 1
+            else:
+                pending.append(url)
+
+        # 끝까지 받기 전에 저장되는 기록은 미완료로 남겨, 중단되면 다음 실행이 전체 스크래핑으로 나머지를 받게 함
+        manifest.complete = False
+        try:
+            if pending:
+                # 파일명을 미리 정해 두면 다운로더도 같은 이름을 사용(같은 미디어 키에는 항상 같은 이름)
+                urls_by_name = {names.assign(url): url for url in pending}
+                unsaved = 0
+                async for filename, data in self.downloader.iter_images(pending, account.download, names):
+                    size = await asyncio.to_thread(_write_image, os.path.join(directory, filename), data)
+                    url = urls_by_name[filename]
+                    manifest.files[media_key(url)] = {'filename': filename, 'size': size, 'url': url}
+                    unsaved += 1
+                    if unsaved >= self.save_every:
+                        await asyncio.to_thread(manifest.save)
+                        unsaved = 0
+
+            # 새 게시물을 앞에 두고 기존 게시물 기록 유지
+            new_post_ids = set(result.post_ids)
+            manifest.post_ids = result.post_ids + [post_id for post_id in manifest.post_ids if post_id not in new_post_ids]
+            manifest.complete = account.download.failed == 0
+            manifest.synced_at = time.time()
+        finally:
+            manifest.save()
+
+
+def _write_image(path: str, data: ImageData) -> int:
+    """이미지를 임시 파일에 쓴 뒤 원자적으로 옮기고 크기를 반환합니다. 스풀은 다 쓴 뒤 닫습니다."""
+    if isinstance(data, SpooledImage):
+        with data:
+            return _write_atomic(path, data.chunks())
+    return _write_atomic(path, [data])
+
+
+def _write_atomic(path: str, chunks) -> int:
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return size
+
+
+def read_usernames(path: str) -> List[str]:
+    """
+    계정 목록 파일을 읽습니다. 한 줄에 계정 하나이며 빈 줄과 '#' 주석은 무시합니다.
+    대소문자/@ 표기만 다른 중복은 하나만 남기고, 인스타그램 계정명 형식이 아닌 줄은 경고 후 건너뜁니다.
+    """
+    usernames = []
+    seen = set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            username = normalize_username(line)
+            if not is_valid_username(username):
+                logger.warning(f"유효하지 않은 계정명을 건너뜁니다: {line}")
+                continue
+            if username not in seen:
+                seen.add(username)
+                usernames.append(username)
+    return usernames
+
+
+def format_summary(results: List[AccountSync], elapsed: float) -> List[str]:
+    """계정별 결과와 전체 처리량 요약 줄 목록을 만듭니다."""
+    lines = [account.summary() for account in results]
+    succeeded = [account for account in results if account.status == 'ok']
+    downloaded = sum(account.download.succeeded for account in results)
+    total_bytes = sum(account.download.bytes_downloaded for account in results)
+    elapsed = max(elapsed, 1e-9)
+    lines.append(
+        f"계정 {len(results)}개(성공 {len(succeeded)}개, 실패 {len(results) - len(succeeded)}개), "
+        f"새 사진 {downloaded}개, 건너뜀 {sum(account.skipped for account in results)}개, "
+        f"다운로드 실패 {sum(account.download.failed for account in results)}개"
+    )
+    lines.append(
+        f"{elapsed:.1f}초, {total_bytes / 1e6:.1f}MB, {total_bytes / 1e6 / elapsed:.2f}MB/s, "
+        f"사진 {downloaded / elapsed:.2f}개/s, 계정 {len(results) / elapsed * 60:.1f}개/분"
+    )
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='계정 목록의 사진을 계정별 디렉터리로 동기화합니다.')
+    parser.add_argument('usernames_file', help='계정 목록 파일 (한 줄에 하나, # 주석 가능)')
+    parser.add_argument('--out', default='out', help='저장할 디렉터리 (기본: out)')
+    parser.add_argument('--parallelism', type=int, default=2, help='동시에 처리할 계정 수 (브라우저 풀 크기)')
+    parser.add_argument('--cookies', default=os.environ.get('COOKIE_FILE_PATHS', os.environ.get('COOKIE_FILE_PATH', 'instagram_cookies.json')),
+                        help='쿠키 파일 경로 (여러 계정은 쉼표 구분)')
+    parser.add_argument('--rate-per-minute', type=float, default=0, help='계정(쿠키)별 분당 스크래핑 수 제한 (0이면 제한 없음)')
+    parser.add_argument('--extraction', default='network', choices=['network', 'dom', 'html'])
+    parser.add_argument('--resolution', default='largest', help="사진 해상도: largest, smallest, max:N")
+    parser.add_argument('--full-refresh-days', type=float, default=7.0, help='이 기간이 지나면 증분 대신 전체 스크래핑')
+    parser.add_argument('--download-concurrency', type=int, default=32)
+    parser.add_argument('--base-url', default=os.environ.get('INSTAGRAM_BASE_URL', INSTAGRAM_URL))
+    parser.add_argument('-v', '--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+async def run(args) -> List[AccountSync]:
+    usernames = read_usernames(args.usernames_file)
+    base_url = args.base_url.rstrip('/')
+    sessions = SessionPool(
+        [path.strip() for path in args.cookies.split(',') if path.strip()],
+        rate_per_minute=args.rate_per_minute or None,
+        max_wait=None,
+    )
+    pool = BrowserPool(size=max(args.parallelism, 1), sessions=sessions)
+    scrape_options = {
+        'extraction': args.extraction,
+        'resource_policy': ResourceBlockPolicy(first_party_domains=FIRST_PARTY_DOMAINS + (urlsplit(base_url).hostname,)),
+        'base_url': base_url,
+        'resolution': ResolutionPolicy.parse(args.resolution),
+    }
+
+    async def scrape(username: str, known_post_ids: Optional[Set[str]]) -> ProfileScrapeResult:
+        return await scrape_profile(username, pool=pool, known_post_ids=known_post_ids, **scrape_options)
+
+    await pool.start(warm=False)
+    try:
+        async with ImageDownloader(max_concurrency=args.download_concurrency) as downloader:
+            syncer = ProfileSyncer(scrape, downloader, args.out, full_refresh_after=args.full_refresh_days * 86400)
+            return await syncer.sync_all(usernames, parallelism=args.parallelism)
+    finally:
+        await pool.close()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    started = time.perf_counter()
+    results = asyncio.run(run(args))
+    for line in format_summary(results, time.perf_counter() - started):
+        print(line)
+    return 0 if all(account.status == 'ok' for account in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
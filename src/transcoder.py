@@ -0,0 +1,273 @@
+import io
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple, Union
+try:
+    # 이미지 변환(IMAGE_TRANSCODE)에서만 필요한 선택적 의존성
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+from .image_cache import ImageCache
+from .metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# 출력 형식 → (Pillow 형식 이름, 파일 확장자)
+TRANSCODE_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+}
+
+
+class TranscodePreset:
+    """
+    다운로드한 이미지를 다시 압축하는 설정.
+
+    - `format`: 'jpeg' 또는 'webp'
+    - `max_size`: 긴 변의 최대 픽셀 수. 더 큰 이미지만 비율을 유지하며 줄입니다(None이면 크기 유지).
+    - `quality`: 압축 품질(1~100)
+    - `strip_metadata`: EXIF/XMP(촬영 정보, 위치 등)를 지웁니다. 회전 정보는 지우기 전에 픽셀에 반영하고, 색 프로파일은 유지합니다.
+    """
+
+    def __init__(self, format: str = 'jpeg', max_size: Optional[int] = None, quality: int = 80, strip_metadata: bool = True):
+        if format not in TRANSCODE_FORMATS:
+            raise ValueError(f"지원하지 않는 변환 형식입니다: {format}")
+        if max_size is not None and max_size <= 0:
+            raise ValueError("max_size는 양수여야 합니다.")
+        if not 1 <= quality <= 100:
+            raise ValueError("quality는 1~100 사이여야 합니다.")
+        self.format = format
+        self.max_size = max_size
+        self.quality = quality
+        self.strip_metadata = strip_metadata
+
+    @classmethod
+    def parse(cls, value: Union[str, 'TranscodePreset'], strip_metadata: bool = True) -> 'TranscodePreset':
+        """
+        'mobile', 'small' 같은 이름이나 '형식[:최대 크기[:품질]]' 문자열(예: 'webp:1080:75', 'jpeg::85')을 설정으로 변환합니다.
+        """
+        if isinstance(value, TranscodePreset):
+            return value
+        value = value.strip().lower()
+        if value in NAMED_PRESETS:
+            format, max_size, quality = NAMED_PRESETS[value]
+            return cls(format, max_size, quality, strip_metadata)
+        parts = value.split(':')
+        if len(parts) > 3:
+            raise ValueError(f"변환 설정 형식이 잘못되었습니다: {value}")
+        format = parts[0] or 'jpeg'
+        max_size = int(parts[1]) if len(parts) > 1 and parts[1] else None
+        quality = int(parts[2]) if len(parts) > 2 and parts[2] else 80
+        return cls(format, max_size, quality, strip_metadata)
+
+    @property
+    def extension(self) -> str:
+        return TRANSCODE_FORMATS[self.format][1]
+
+    @property
+    def key(self) -> str:
+        """변환 결과 캐시와 아카이브 지문에 사용하는 설정 식별자. 설정이 같으면 항상 같은 값입니다."""
+        return f"{self.format}-{self.max_size or 'full'}-q{self.quality}-{'strip' if self.strip_metadata else 'meta'}"
+
+    def rename(self, filename: str) -> str:
+        """변환된 이미지의 파일명(확장자를 출력 형식에 맞게 바꿈)."""
+        return os.path.splitext(filename)[0] + self.extension
+
+    def __repr__(self) -> str:
+        return f"TranscodePreset({self.key!r})"
+
+
+# 이름으로 고를 수 있는 설정: 이름 → (형식, 최대 크기, 품질)
+NAMED_PRESETS = {
+    'mobile': ('webp', 1080, 75),
+    'small': ('jpeg', 640, 70),
+}
+
+
+def transcode_image(data: bytes, preset: TranscodePreset) -> bytes:
+    """
+    이미지 한 장을 설정에 맞게 다시 압축합니다. CPU를 오래 쓰므로 이벤트 루프가 아닌 프로세스 풀에서 실행합니다.
+
+    Raises:
+        ImportError: Pillow가 설치되어 있지 않은 경우.
+        OSError: 이미지를 읽을 수 없는 경우(Pillow의 UnidentifiedImageError 포함).
+    """
+    if Image is None:
+        raise ImportError("이미지 변환에는 Pillow 패키지가 필요합니다.")
+    with Image.open(io.BytesIO(data)) as original:
+        # 회전(Orientation) 정보를 픽셀에 반영해야 EXIF를 지워도 방향이 유지됨
+        image = ImageOps.exif_transpose(original)
+        if preset.max_size and max(image.size) > preset.max_size:
+            image.thumbnail((preset.max_size, preset.max_size), Image.LANCZOS)
+        pillow_format = TRANSCODE_FORMATS[preset.format][0]
+        if pillow_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+        options = {'quality': preset.quality}
+        if original.info.get('icc_profile'):
+            options['icc_profile'] = original.info['icc_profile']
+        if not preset.strip_metadata and image.info.get('exif'):
+            options['exif'] = image.info['exif']
+        if pillow_format == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options['method'] = 4
+
+        output = io.BytesIO()
+        image.save(output, pillow_format, **options)
+        return output.getvalue()
+
+
+class ImageTranscoder:
+    """
+    다운로드한 이미지를 프로세스 풀에서 다시 압축(크기 축소, WebP/JPEG 변환, 메타데이터 제거)하는 선택적 후처리 단계.
+
+    - 변환은 `workers`개 프로세스의 ProcessPoolExecutor에서 실행되므로 여러 코어를 사용하고, 이벤트 루프를 막지 않습니다.
+    - 풀에 맡겼거나 기다리는 변환은 최대 `max_pending`개(기본: workers의 2배)입니다. 가득 차면 `transcode()`가 대기하고,
+      ImageDownloader는 다운로드 슬롯을 쥔 채 기다리므로 변환이 밀리면 다운로드도 그만큼 느려집니다(backpressure).
+    - `cache`가 주어지면 (원본 내용 해시, 설정)으로 변환 결과를 저장하여 같은 사진을 다시 변환하지 않습니다.
+    - 변환 결과가 원본보다 크거나 변환에 실패하면 원본을 그대로 사용합니다.
+    - 작업 프로세스가 죽어(메모리 부족 등) 풀을 쓸 수 없게 되면 풀을 새로 만들어 한 번 다시 시도합니다.
+
+    사용 예:
+    transcoder = ImageTranscoder(TranscodePreset.parse('webp:1080:75'), workers=4)
+    async with ImageDownloader(transcoder=transcoder) as downloader:
+        result = await downloader.download(image_urls)
+    transcoder.close()
+
+    Raises:
+        ImportError: Pillow가 설치되어 있지 않은 경우.
+    """
+
+    def __init__(
+        self,
+        preset: TranscodePreset,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        cache: Optional[ImageCache] = None,
+    ):
+        if Image is None:
+            raise ImportError("이미지 변환에는 Pillow 패키지가 필요합니다.")
+        self.preset = preset
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 2
+        self.cache = cache
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.transcoded = 0
+        self.kept_original = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.pool_restarts = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 브라우저/이벤트 루프 스레드를 물려받지 않도록 fork 대신 spawn
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    async def transcode(self, filename: str, data: bytes) -> Tuple[str, bytes]:
+        """이미지 한 장을 변환하여 (파일명, 내용)을 반환합니다. 원본을 유지하는 경우 받은 파일명과 내용을 그대로 반환합니다."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        self.bytes_in += len(data)
+        cache_key, cached = await asyncio.to_thread(self._cache_get, data)
+        if cached is not None:
+            self.cache_hits += 1
+            return self._choose(filename, data, cached)
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            async with self._slots:
+                output = await self._run(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            self.bytes_out += len(data)
+            logger.warning(f"이미지 변환 실패, 원본을 사용합니다: {filename}, 오류: {e}")
+            return filename, data
+        finally:
+            self.pending -= 1
+        observe_stage('transcode', time.perf_counter() - started, started)
+
+        # 원본보다 크면 빈 내용으로 기록하여 다음에도 변환하지 않고 원본을 사용
+        await asyncio.to_thread(self._cache_put, cache_key, output if len(output) < len(data) else b'')
+        return self._choose(filename, data, output)
+
+    async def _run(self, data: bytes) -> bytes:
+        loop = asyncio.get_running_loop()
+        executor = self._pool()
+        try:
+            return await loop.run_in_executor(executor, transcode_image, data, self.preset)
+        except BrokenProcessPool as e:
+            # 깨진 풀은 이후 모든 변환을 거부하므로 버리고(동시에 실패한 변환이 이미 새로 만든 풀은 유지) 새 풀에서 한 번 더 시도
+            if self._executor is executor:
+                self._executor = None
+                self.pool_restarts += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+                logger.warning(f"변환 프로세스 풀이 중단되어 다시 만듭니다: {e}")
+            return await loop.run_in_executor(self._pool(), transcode_image, data, self.preset)
+
+    def _choose(self, filename: str, data: bytes, output: bytes) -> Tuple[str, bytes]:
+        if not output or len(output) >= len(data):
+            self.kept_original += 1
+            self.bytes_out += len(data)
+            return filename, data
+        self.transcoded += 1
+        self.bytes_out += len(output)
+        return self.preset.rename(filename), output
+
+    def _cache_get(self, data: bytes) -> Tuple[Optional[str], Optional[bytes]]:
+        if self.cache is None:
+            return None, None
+        key = f"/{self.preset.key}/{hashlib.sha256(data).hexdigest()}"
+        try:
+            return key, self.cache.get(key)
+        except OSError as e:
+            logger.warning(f"변환 캐시 조회 실패: {key}, 오류: {e}")
+            return key, None
+
+    def _cache_put(self, key: Optional[str], output: bytes) -> None:
+        # 캐시 저장 실패(디스크 부족 등)는 변환 결과 사용을 막지 않음
+        if key is None:
+            return
+        try:
+            self.cache.put(key, output)
+        except OSError as e:
+            logger.warning(f"변환 캐시 저장 실패: {key}, 오류: {e}")
+
+    def close(self) -> None:
+        """프로세스 풀을 종료합니다. 대기 중인 변환은 취소되며, 다음 변환 요청 시 풀을 다시 만듭니다."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """변환/원본 유지/실패/캐시 적중/풀 재생성 수와 변환 전후 바이트 수를 반환합니다."""
+        return {
+            'preset': self.preset.key,
+            'workers': self.workers,
+            'pending': self.pending,
+            'transcoded': self.transcoded,
+            'kept_original': self.kept_original,
+            'failures': self.failures,
+            'cache_hits': self.cache_hits,
+            'pool_restarts': self.pool_restarts,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'saved_ratio': 1 - self.bytes_out / self.bytes_in if self.bytes_in else 0.0,
+        }
@@ -1,43 +1,65 @@
+import time
 import asyncio
-import aiohttp
 import logging
-from typing import List, Tuple
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
 import zipfile
 import io
+from .downloader import ImageDownloader, DownloadResult, ImageData
+from .spool import SpooledImage
+from .metrics import ZIP_BYTES, observe_stage
+from .zip_stream import ZipStreamWriter
 
 logger = logging.getLogger(__name__)
 
-async def download_images_as_bytes(image_urls: List[str]) -> List[Tuple[str, bytes]]:
+async def download_images_as_bytes(image_urls: List[str], downloader: Optional[ImageDownloader] = None) -> List[Tuple[str, bytes]]:
     """
     주어진 이미지 URL 목록에서 이미지들을 비동기적으로 다운로드하여,
     (파일명, 이미지 바이트) 형태의 튜플 리스트로 반환합니다.
+    `downloader`가 주어지면 해당 다운로더의 세션(커넥션 풀)을 재사용합니다.
     """
-    async with aiohttp.ClientSession() as session:
-        tasks = [_fetch_image(session, url) for url in image_urls]
-        results = await asyncio.gather(*tasks)
-        # 다운로드에 실패한 경우(None)를 제외하고 반환
-        return [res for res in results if res is not None]
+    async with _downloader_scope(downloader) as active:
+        result = await active.download(image_urls)
+        # 다운로드에 실패한 경우를 제외하고 반환 (스풀에 받은 이미지는 바이트로 읽어서 반환)
+        return [(filename, _as_bytes(data)) for filename, data in result.images]
 
-async def _fetch_image(session: aiohttp.ClientSession, url: str) -> Tuple[str, bytes] | None:
+def _as_bytes(data: ImageData) -> bytes:
+    if isinstance(data, SpooledImage):
+        with data:
+            return data.read()
+    return data
+
+async def iter_images_as_bytes(
+    image_urls: Union[List[str], AsyncIterable[str]],
+    downloader: Optional[ImageDownloader] = None,
+    result: Optional[DownloadResult] = None,
+) -> AsyncIterator[Tuple[str, ImageData]]:
     """
-    단일 이미지 URL에서 이미지를 다운로드하고 (파일명, 바이트) 튜플로 반환합니다.
-    실패 시 None을 반환합니다.
+    이미지들을 비동기적으로 다운로드하면서, 다운로드가 끝나는 순서대로
+    (파일명, 이미지 내용) 튜플을 하나씩 내보내는 비동기 제너레이터입니다.
+    다운로더에 메모리 한도가 설정되어 있으면 이미지 내용은 SpooledImage(한도를 넘으면 디스크에 보관)입니다.
+    실패한 이미지는 건너뛰며, `result`가 주어지면 성공/실패/처리 속도를 기록합니다.
+    `image_urls`가 비동기 이터러블(스크래핑 중인 URL 스트림)이면 URL이 도착하는 대로 다운로드를 시작합니다.
     """
-    try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                # URL의 마지막 부분을 파일명으로 사용
-                filename = url.split('/')[-1].split('?')[0]
-                image_bytes = await response.read()
-                logger.info(f"다운로드 성공: {filename}")
-                return (filename, image_bytes)
-            else:
-                logger.warning(f"다운로드 실패 (상태 코드: {response.status}): {url}")
-                return None
-        
-    except Exception as e:
-        logger.error(f"다운로드 중 오류 발생: {url}, 오류: {e}", exc_info=True)
-        return None
+    async with _downloader_scope(downloader) as active:
+        if hasattr(image_urls, '__aiter__'):
+            images = active.iter_images_stream(image_urls, result)
+        else:
+            images = active.iter_images(image_urls, result)
+        try:
+            async for image in images:
+                yield image
+        finally:
+            await images.aclose()
+
+@asynccontextmanager
+async def _downloader_scope(downloader: Optional[ImageDownloader]) -> AsyncIterator[ImageDownloader]:
+    """공유 다운로더가 주어지면 그대로 사용하고, 없으면 이번 호출에서만 쓰는 다운로더를 만듭니다."""
+    if downloader is not None:
+        yield downloader
+    else:
+        async with ImageDownloader() as temporary:
+            yield temporary
 
 class ZipCreationException(Exception):
     """ZIP 파일 생성 중 오류가 발생했을 때의 예외"""
@@ -59,4 +81,121 @@ def create_zip_in_memory(image_data: List[Tuple[str, bytes]]) -> bytes:
         return zip_buffer.getvalue()
     except Exception as e:
         logger.error(f"Failed to create ZIP file: {e}", exc_info=True)
-        raise ZipCreationException("ZIP 파일 생성 중 오류가 발생했습니다.")
\ No newline at end of file
+        raise ZipCreationException("ZIP 파일 생성 중 오류가 발생했습니다.")
+
+# astream_zip이 스레드에서 한 번에 만들어 오는 ZIP 조각의 최대 크기
+ZIP_THREAD_BATCH_BYTES = 1024 * 1024
+
+def _next_batch(iterator: Iterator[bytes], limit: int) -> List[bytes]:
+    batch = []
+    size = 0
+    for chunk in iterator:
+        batch.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return batch
+
+class _ZipTimer:
+    """ZIP 조각을 만드는 데 쓴 시간만 누적합니다(이미지를 기다리거나 조각을 전송하는 시간은 제외)."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def chunks(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        # 디스크에 스풀된 큰 이미지도 한 번에 메모리에 올리지 않도록 조각을 하나씩 꺼내며 시간을 잼
+        iterator = iter(chunks)
+        while True:
+            started = time.perf_counter()
+            chunk = next(iterator, None)
+            self.seconds += time.perf_counter() - started
+            if chunk is None:
+                return
+            self.bytes += len(chunk)
+            yield chunk
+
+    async def threaded_chunks(self, chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+        """
+        chunks()와 같지만 조각 생성(스풀 파일 읽기, CRC/압축)을 스레드에서 실행하여 이벤트 루프를 막지 않습니다.
+        스레드 전환을 줄이도록 한 번에 최대 ZIP_THREAD_BATCH_BYTES만큼 조각을 모아 옵니다.
+        """
+        iterator = iter(chunks)
+        while True:
+            started = time.perf_counter()
+            batch = await asyncio.to_thread(_next_batch, iterator, ZIP_THREAD_BATCH_BYTES)
+            self.seconds += time.perf_counter() - started
+            if not batch:
+                return
+            for chunk in batch:
+                self.bytes += len(chunk)
+                yield chunk
+
+    def observe(self) -> None:
+        observe_stage('zip', self.seconds)
+        ZIP_BYTES.inc(self.bytes)
+
+def release_image(image: Tuple[str, ImageData]) -> None:
+    """(파일명, 이미지 내용) 튜플의 스풀을 반납합니다. 스풀이 아니면 아무것도 하지 않습니다."""
+    data = image[1]
+    if isinstance(data, SpooledImage):
+        data.close()
+
+def stream_zip(image_data: Iterable[Tuple[str, ImageData]], close_images: bool = True) -> Iterator[bytes]:
+    """
+    (파일명, 이미지 내용) 튜플을 받는 대로 ZIP 조각을 내보내는 제너레이터입니다.
+    아카이브 전체를 메모리에 만들지 않으므로 최대 메모리 사용량은 이미지 한 장 수준입니다.
+    SpooledImage는 스풀(메모리 또는 디스크)에서 조각 단위로 읽고, ZIP 항목을 다 쓰면 바로 반납합니다.
+    다른 소비자와 공유하는 이미지(StreamFlight)는 `close_images=False`로 넘겨 공유하는 쪽에서 반납하게 합니다.
+    """
+    writer = ZipStreamWriter()
+    timer = _ZipTimer()
+    try:
+        for filename, data in image_data:
+            yield from timer.chunks(writer.add(filename, data))
+            if close_images:
+                release_image((filename, data))
+        yield from timer.chunks(writer.finish())
+        timer.observe()
+    except Exception as e:
+        logger.error(f"Failed to stream ZIP file: {e}", exc_info=True)
+        raise ZipCreationException("ZIP 파일 생성 중 오류가 발생했습니다.")
+
+async def astream_zip(image_data: AsyncIterable[Tuple[str, ImageData]], close_images: bool = True) -> AsyncIterator[bytes]:
+    """
+    stream_zip의 비동기 버전. 이미지가 도착하는 대로 ZIP 조각을 내보냅니다.
+    디스크에 스풀된 이미지 읽기와 CRC/압축은 스레드에서 실행하므로 큰 이미지도 이벤트 루프를 막지 않습니다.
+    """
+    writer = ZipStreamWriter()
+    timer = _ZipTimer()
+    try:
+        async for filename, data in image_data:
+            async for chunk in timer.threaded_chunks(writer.add(filename, data)):
+                yield chunk
+            if close_images:
+                release_image((filename, data))
+        async for chunk in timer.threaded_chunks(writer.finish()):
+            yield chunk
+        timer.observe()
+    except Exception as e:
+        logger.error(f"Failed to stream ZIP file: {e}", exc_info=True)
+        raise ZipCreationException("ZIP 파일 생성 중 오류가 발생했습니다.")
+
+async def write_zip(f: BinaryIO, image_data: AsyncIterable[Tuple[str, ImageData]]) -> int:
+    """
+    이미지가 도착하는 대로 ZIP 조각을 파일에 쓰고, 저장한 이미지 수를 반환합니다.
+    파일 쓰기(디스크에 스풀된 이미지 읽기 포함)는 스레드에서 실행하며, 다 쓴 스풀은 바로 반납합니다.
+    """
+    writer = ZipStreamWriter()
+    seconds = 0.0
+    count = 0
+    async for filename, data in image_data:
+        started = time.perf_counter()
+        await asyncio.to_thread(f.writelines, writer.add(filename, data))
+        seconds += time.perf_counter() - started
+        count += 1
+        release_image((filename, data))
+    started = time.perf_counter()
+    await asyncio.to_thread(f.writelines, writer.finish())
+    observe_stage('zip', seconds + time.perf_counter() - started)
+    return count
@@ -0,0 +1,111 @@
+# 웹 서버 없이 백그라운드 작업(POST /jobs)만 처리하는 워커 프로세스들. 저장소 루트에서 실행합니다.
+#
+#   JOB_STORE_PATH=/data/jobs.sqlite JOB_ARTIFACT_DIR=/data/jobs python -m src.worker --processes 4
+#
+# 프로세스마다 자기 이벤트 루프, 브라우저 풀, 다운로더 세션을 가지고 JOB_WORKERS개 작업을 동시에 처리하며,
+# 모든 프로세스(와 같은 JOB_STORE_PATH를 쓰는 웹 서버, 다른 컨테이너)는 SQLite 작업 저장소로 작업을 나눠 가집니다.
+# 웹 서버는 JOB_WORKERS=0으로 실행하면 작업을 등록/조회만 하고 처리는 워커에 맡깁니다.
+# 비정상 종료한 프로세스는 다시 시작하며, 그 프로세스가 처리하던 작업은 임대가 끝난 뒤 다른 프로세스가 이어받습니다.
+# 계정별 요청 제한(SESSION_RATE_PER_MINUTE)은 프로세스마다 나눠 적용되므로, 웹 서버와 함께 쓰면 웹 서버와 워커 모두에
+# 같은 SESSION_PROCESSES(웹 워커 수 + 작업 워커 프로세스 수)를 지정합니다. 지정하지 않으면 --processes에
+# 같은 환경의 WEB_CONCURRENCY를 더한 값을 사용합니다.
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# 자식 프로세스 상태를 확인하는 간격(초)
+SUPERVISE_INTERVAL = 1.0
+
+
+def _serve() -> None:
+    """워커 프로세스 하나: 앱의 브라우저 풀/다운로더/작업 관리자를 시작하고 SIGTERM(또는 SIGINT)까지 작업을 처리합니다."""
+    from . import app as web
+
+    async def serve() -> None:
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        web.use_event_loop(loop)
+        await web.startup()
+        logger.info(f"작업 워커 시작 (pid {os.getpid()}, 작업 동시 처리 {web.job_manager.workers}개)")
+        try:
+            await stop.wait()
+        finally:
+            await web.shutdown()
+            logger.info(f"작업 워커 종료 (pid {os.getpid()})")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(process)d - %(levelname)s - %(message)s')
+    asyncio.run(serve())
+
+
+def _start(context) -> multiprocessing.Process:
+    process = context.Process(target=_serve, name='job-worker')
+    process.start()
+    return process
+
+
+def supervise(processes: int) -> int:
+    """`processes`개의 워커 프로세스를 실행하고, 비정상 종료한 프로세스는 다시 시작합니다. SIGTERM/SIGINT를 받으면 모두 종료합니다."""
+    # 브라우저/이벤트 루프 상태를 물려받지 않도록 fork 대신 spawn
+    context = multiprocessing.get_context('spawn')
+    children: List[multiprocessing.Process] = [_start(context) for _ in range(processes)]
+    stopping = False
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while not stopping:
+        time.sleep(SUPERVISE_INTERVAL)
+        for i, child in enumerate(children):
+            if not child.is_alive() and not stopping:
+                logger.warning(f"작업 워커(pid {child.pid})가 종료 코드 {child.exitcode}로 끝나 다시 시작합니다.")
+                children[i] = _start(context)
+
+    for child in children:
+        if child.is_alive():
+            os.kill(child.pid, signal.SIGTERM)
+    for child in children:
+        child.join()
+    return 0
+
+
+def session_processes(processes: int) -> int:
+    """계정을 함께 쓰는 전체 프로세스 수: 이 워커 프로세스들과 같은 환경에 설정된 uvicorn 워커(WEB_CONCURRENCY)."""
+    return processes + int(os.environ.get('WEB_CONCURRENCY', '0'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='공유 작업 저장소(JOB_STORE_PATH)의 백그라운드 작업을 처리하는 워커 프로세스를 실행합니다.')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='워커 프로세스 수 (기본: CPU 코어 수)')
+    parser.add_argument('--store', default=os.environ.get('JOB_STORE_PATH'), help='SQLite 작업 저장소 경로 (기본: JOB_STORE_PATH)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(process)d - %(levelname)s - %(message)s')
+    if not args.store:
+        print('작업 저장소 경로가 필요합니다 (--store 또는 JOB_STORE_PATH).', file=sys.stderr)
+        return 2
+    processes = max(args.processes, 1)
+    # spawn으로 시작하는 자식 프로세스는 환경 변수를 물려받으므로 앱 설정(JOB_STORE_PATH, SESSION_PROCESSES)으로 전달
+    os.environ['JOB_STORE_PATH'] = args.store
+    os.environ.setdefault('SESSION_PROCESSES', str(session_processes(processes)))
+    return supervise(processes)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import os
+import time
+import zlib
+import struct
+import logging
+from typing import Iterable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 이미 압축된 포맷은 DEFLATE로 다시 압축해도 크기가 거의 줄지 않으므로 그대로 저장(ZIP_STORED)
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.webp', '.png', '.gif', '.heic', '.avif', '.mp4', '.mov', '.zip'}
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+_LOCAL_HEADER_SIG = 0x04034b50
+_DATA_DESCRIPTOR_SIG = 0x08074b50
+_CENTRAL_HEADER_SIG = 0x02014b50
+_ZIP64_END_SIG = 0x06064b50
+_ZIP64_LOCATOR_SIG = 0x07064b50
+_END_SIG = 0x06054b50
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_VERSION_DEFAULT = 20
+_VERSION_ZIP64 = 45
+_ZIP64_EXTRA_ID = 0x0001
+
+
+class _Entry:
+    def __init__(self, name: bytes, method: int, offset: int, dos_time: int, dos_date: int, zip64: bool):
+        self.name = name
+        self.method = method
+        self.offset = offset
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+        self.zip64 = zip64
+        self.crc = 0
+        self.compressed_size = 0
+        self.uncompressed_size = 0
+
+
+def _dos_datetime(timestamp: float) -> tuple:
+    t = time.localtime(timestamp)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = (max(t.tm_year, 1980) - 1980) << 9 | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def choose_compression(filename: str) -> int:
+    """파일 확장자를 보고 압축 방식(ZIP_STORED 또는 ZIP_DEFLATED)을 결정합니다."""
+    ext = os.path.splitext(filename)[1].lower()
+    return ZIP_STORED if ext in STORED_EXTENSIONS else ZIP_DEFLATED
+
+
+class ZipStreamWriter:
+    """
+    아카이브 전체를 메모리에 올리지 않고 ZIP 파일을 조각(bytes) 단위로 생성하는 스트리밍 writer.
+
+    각 엔트리는 로컬 헤더 → 데이터 → 데이터 디스크립터 순으로 즉시 출력되므로,
+    엔트리 크기와 CRC를 미리 알 필요가 없습니다. 마지막에 `finish()`로 중앙 디렉터리를 출력합니다.
+    크기/오프셋/엔트리 수가 ZIP 한계를 넘으면 ZIP64 레코드를 사용합니다.
+
+    사용 예:
+    writer = ZipStreamWriter()
+    for filename, data in images:
+        yield from writer.add(filename, data)
+    yield from writer.finish()
+    """
+
+    # 테스트에서 ZIP64 경로를 검증할 수 있도록 클래스 속성으로 둡니다.
+    ZIP64_LIMIT = 0xFFFFFFFF
+    ZIP64_COUNT_LIMIT = 0xFFFF
+
+    def __init__(self):
+        self._entries: List[_Entry] = []
+        self._offset = 0
+        self._finished = False
+
+    @property
+    def bytes_written(self) -> int:
+        return self._offset
+
+    def add(
+        self,
+        filename: str,
+        data: Union[bytes, Iterable[bytes]],
+        compress_type: Optional[int] = None,
+        size_hint: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """
+        엔트리 하나를 ZIP 조각으로 출력합니다.
+
+        Args:
+            filename (str): 아카이브 내부 파일명.
+            data: 파일 내용. bytes 또는 bytes 조각의 이터러블(len()을 지원하면 size_hint로 사용).
+            compress_type (int | None): ZIP_STORED/ZIP_DEFLATED. None이면 확장자로 결정합니다.
+            size_hint (int | None): 조각 이터러블의 예상 크기. ZIP64 로컬 헤더가 필요한지 판단할 때 사용합니다.
+        """
+        if self._finished:
+            raise ValueError("이미 종료된 ZIP 스트림에는 엔트리를 추가할 수 없습니다.")
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            size_hint = len(data)
+            chunks: Iterable[bytes] = (bytes(data),)
+        else:
+            chunks = data
+            # 크기를 아는 조각 이터러블(예: SpooledImage)은 그 크기를 size_hint로 사용
+            if size_hint is None and hasattr(data, '__len__'):
+                size_hint = len(data)
+
+        method = choose_compression(filename) if compress_type is None else compress_type
+        # 크기를 모르는 스트림은 ZIP64 여부를 사후에 바꿀 수 없으므로 보수적으로 ZIP64 디스크립터를 사용
+        zip64 = size_hint is None or size_hint >= self.ZIP64_LIMIT
+        dos_time, dos_date = _dos_datetime(time.time())
+        entry = _Entry(filename.encode('utf-8'), method, self._offset, dos_time, dos_date, zip64)
+
+        yield self._emit(self._local_header(entry))
+
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15) if method == ZIP_DEFLATED else None
+        crc = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+            crc = zlib.crc32(chunk, crc)
+            entry.uncompressed_size += len(chunk)
+            out = compressor.compress(chunk) if compressor else chunk
+            if out:
+                entry.compressed_size += len(out)
+                yield self._emit(out)
+        if compressor:
+            tail = compressor.flush()
+            if tail:
+                entry.compressed_size += len(tail)
+                yield self._emit(tail)
+        entry.crc = crc & 0xFFFFFFFF
+
+        if not entry.zip64 and max(entry.compressed_size, entry.uncompressed_size) >= self.ZIP64_LIMIT:
+            raise ValueError(f"'{filename}'의 크기가 size_hint보다 커서 ZIP64 없이 기록할 수 없습니다.")
+
+        self._entries.append(entry)
+        yield self._emit(self._data_descriptor(entry))
+
+    def finish(self) -> Iterator[bytes]:
+        """중앙 디렉터리와 종료 레코드(필요 시 ZIP64 포함)를 출력합니다."""
+        if self._finished:
+            return
+        self._finished = True
+
+        cd_offset = self._offset
+        for entry in self._entries:
+            yield self._emit(self._central_header(entry))
+        cd_size = self._offset - cd_offset
+        count = len(self._entries)
+
+        needs_zip64 = (
+            count >= self.ZIP64_COUNT_LIMIT
+            or cd_offset >= self.ZIP64_LIMIT
+            or cd_size >= self.ZIP64_LIMIT
+        )
+        if needs_zip64:
+            zip64_end_offset = self._offset
+            yield self._emit(struct.pack(
+                '<IQHHIIQQQQ', _ZIP64_END_SIG, 44, _VERSION_ZIP64, _VERSION_ZIP64,
+                0, 0, count, count, cd_size, cd_offset,
+            ))
+            yield self._emit(struct.pack('<IIQI', _ZIP64_LOCATOR_SIG, 0, zip64_end_offset, 1))
+
+        yield self._emit(struct.pack(
+            '<IHHHHIIH', _END_SIG, 0, 0,
+            min(count, 0xFFFF), min(count, 0xFFFF),
+            min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF), 0,
+        ))
+
+    def _emit(self, chunk: bytes) -> bytes:
+        self._offset += len(chunk)
+        return chunk
+
+    def _local_header(self, entry: _Entry) -> bytes:
+        if entry.zip64:
+            # 실제 크기는 데이터 디스크립터에 기록되므로 ZIP64 extra 필드의 값은 0으로 둡니다.
+            extra = struct.pack('<HHQQ', _ZIP64_EXTRA_ID, 16, 0, 0)
+            size_field = 0xFFFFFFFF
+            version = _VERSION_ZIP64
+        else:
+            extra = b''
+            size_field = 0
+            version = _VERSION_DEFAULT
+        return struct.pack(
+            '<IHHHHHIIIHH', _LOCAL_HEADER_SIG, version, _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8,
+            entry.method, entry.dos_time, entry.dos_date, 0, size_field, size_field,
+            len(entry.name), len(extra),
+        ) + entry.name + extra
+
+    def _data_descriptor(self, entry: _Entry) -> bytes:
+        if entry.zip64:
+            return struct.pack('<IIQQ', _DATA_DESCRIPTOR_SIG, entry.crc, entry.compressed_size, entry.uncompressed_size)
+        return struct.pack('<IIII', _DATA_DESCRIPTOR_SIG, entry.crc, entry.compressed_size, entry.uncompressed_size)
+
+    def _central_header(self, entry: _Entry) -> bytes:
+        extra_values = []
+        uncompressed_size = entry.uncompressed_size
+        compressed_size = entry.compressed_size
+        offset = entry.offset
+        if uncompressed_size >= self.ZIP64_LIMIT:
+            extra_values.append(uncompressed_size)
+            uncompressed_size = 0xFFFFFFFF
+        if compressed_size >= self.ZIP64_LIMIT:
+            extra_values.append(compressed_size)
+            compressed_size = 0xFFFFFFFF
+        if offset >= self.ZIP64_LIMIT:
+            extra_values.append(offset)
+            offset = 0xFFFFFFFF
+
+        extra = b''
+        if extra_values:
+            extra = struct.pack(f'<HH{len(extra_values)}Q', _ZIP64_EXTRA_ID, 8 * len(extra_values), *extra_values)
+        version = _VERSION_ZIP64 if (extra_values or entry.zip64) else _VERSION_DEFAULT
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII', _CENTRAL_HEADER_SIG, version, version,
+            _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8, entry.method, entry.dos_time, entry.dos_date,
+            entry.crc, compressed_size, uncompressed_size,
+            len(entry.name), len(extra), 0, 0, 0, 0, offset,
+        ) + entry.name + extra
@@ -1,3 +1,6 @@
+import json
+import io
+import zipfile
 import pytest
 from unittest.mock import patch
 from flask import Flask
@@ -5,6 +8,10 @@ from flask import Flask
 from src.app import app
 from src.scraper import ProfileNotFoundException, ProfileIsPrivateException, ScrapeTimeoutException
 
+async def _fake_urls(urls):
+    for url in urls:
+        yield url
+
 @pytest.fixture
 def client():
     """Create and configure a new app instance for each test."""
@@ -18,23 +25,23 @@ def test_index_get(client):
     assert response.status_code == 200
     assert b'Instagram Feed Photo Downloader' in response.data
 
-@pytest.mark.parametrize("username", [None, '', 'user name', 123])
+@pytest.mark.parametrize("username", [None, '', 'user name', ' @Foo ', 123])
 def test_download_invalid_username(client, username):
     """Test the download route with invalid usernames."""
     response = client.post('/download', json={'username': username})
     assert response.status_code == 400
     assert response.json['error'] == '유효하지 않은 계정명입니다.'
 
-@patch('src.app.scrape_profile_page')
+@patch('src.app.iter_profile_page')
 def test_download_no_images_found(mock_scrape, client):
     """Test download when no images are found for a user."""
-    mock_scrape.return_value = []
+    mock_scrape.return_value = _fake_urls([])
 
     response = client.post('/download', json={'username': 'testuser'})
     assert response.status_code == 404
     assert response.json['error'] == '다운로드할 이미지를 찾을 수 없습니다.'
 
-@patch('src.app.scrape_profile_page')
+@patch('src.app.iter_profile_page')
 def test_download_profile_not_found(mock_scrape, client):
     """Test download when the profile is not found."""
     mock_scrape.side_effect = ProfileNotFoundException()
@@ -43,7 +50,7 @@ def test_download_profile_not_found(mock_scrape, client):
     assert response.status_code == 404
     assert response.json['error'] == "'nonexistentuser' 계정을 찾을 수 없습니다."
 
-@patch('src.app.scrape_profile_page')
+@patch('src.app.iter_profile_page')
 def test_download_profile_is_private(mock_scrape, client):
     """Test download when the profile is private."""
     mock_scrape.side_effect = ProfileIsPrivateException()
@@ -52,7 +59,7 @@ def test_download_profile_is_private(mock_scrape, client):
     assert response.status_code == 403
     assert response.json['error'] == "'privateuser' 계정은 비공개이거나 게시물이 없습니다."
 
-@patch('src.app.scrape_profile_page')
+@patch('src.app.iter_profile_page')
 def test_download_scrape_timeout(mock_scrape, client):
     """Test download when scraping times out."""
     mock_scrape.side_effect = ScrapeTimeoutException()
@@ -61,16 +68,22 @@ def test_download_scrape_timeout(mock_scrape, client):
     assert response.status_code == 408
     assert response.json['error'] == '인스타그램에서 응답이 없어 시간 초과되었습니다. 잠시 후 다시 시도해주세요.'
 
-@patch('src.app.create_zip_in_memory')
-@patch('src.app.download_images_as_bytes')
-@patch('src.app.scrape_profile_page')
-def test_download_success(mock_scrape, mock_download, mock_zip, client):
-    """Test the successful download and zipping of images."""
-    # Setup mocks
-    mock_scrape.return_value = ['http://example.com/img1.jpg']
-    mock_download.return_value = [('img1.jpg', b'imagedata')]
+def _fake_download(items):
+    """Fake iter_images_as_bytes that drains the URL stream and yields the given images."""
+    async def download(image_urls, downloader=None):
+        async for _ in image_urls:
+            pass
+        for item in items:
+            yield item
+    return download
 
-    mock_zip.return_value = b'zipdata'
+@patch('src.app.iter_images_as_bytes')
+@patch('src.app.iter_profile_page')
+def test_download_success(mock_scrape, mock_download, client):
+    """Test the successful download and streaming zip of images."""
+    # Setup mocks
+    mock_scrape.return_value = _fake_urls(['http://example.com/img1.jpg', 'http://example.com/img2.jpg'])
+    mock_download.side_effect = _fake_download([('img1.jpg', b'imagedata1'), ('img2.jpg', b'imagedata2')])
 
     # Make request
     response = client.post('/download', json={'username': 'testuser'})
@@ -79,13 +92,207 @@ def test_download_success(mock_scrape, mock_download, mock_zip, client):
     assert response.status_code == 200
     assert response.mimetype == 'application/zip'
     assert response.headers['Content-Disposition'] == 'attachment;filename=testuser_instagram_photos.zip'
-    assert response.data == b'zipdata'
+    assert response.is_streamed
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zip_file:
+        assert zip_file.read('img1.jpg') == b'imagedata1'
+        assert zip_file.read('img2.jpg') == b'imagedata2'
+
+@patch('src.app.iter_images_as_bytes')
+@patch('src.app.iter_profile_page')
+def test_download_all_images_failed(mock_scrape, mock_download, client):
+    """Test download when every image download fails."""
+    mock_scrape.return_value = _fake_urls(['http://example.com/img1.jpg'])
+    mock_download.side_effect = _fake_download([])
+
+    response = client.post('/download', json={'username': 'testuser'})
+    assert response.status_code == 500
+    assert response.json['error'] == '이미지를 다운로드하는 데 실패했습니다.'
     
-@patch('src.app.scrape_profile_page')
+@patch('src.app.iter_profile_page')
 def test_download_unknown_error(mock_scrape, client):
     """Test download when an unknown error occurs."""
     mock_scrape.side_effect = Exception("Unknown error")
 
     response = client.post('/download', json={'username': 'erroruser'})
     assert response.status_code == 500
-    assert response.json['error'] == '알 수 없는 오류가 발생했습니다. 서버 로그를 확인하세요.'
\ No newline at end of file
+    assert response.json['error'] == '알 수 없는 오류가 발생했습니다. 서버 로그를 확인하세요.'
+def test_create_job_invalid_username(client):
+    """Test the jobs route with an invalid username."""
+    response = client.post('/jobs', json={'username': 'user name'})
+    assert response.status_code == 400
+    assert response.json['error'] == '유효하지 않은 계정명입니다.'
+
+def test_job_status_unknown_job(client):
+    """Test job status for an unknown or expired job."""
+    response = client.get('/jobs/doesnotexist')
+    assert response.status_code == 404
+
+@patch('src.app.job_manager')
+def test_job_result_not_ready(mock_manager, client):
+    """Test fetching the result of a job that is still running."""
+    from src.jobs import Job
+    job = Job('testuser', owner='127.0.0.1')
+    job.stage = 'downloading'
+    mock_manager.get.return_value = job
+
+    response = client.get(f'/jobs/{job.id}/result')
+    assert response.status_code == 409
+    assert response.json['stage'] == 'downloading'
+
+@patch('src.app.job_manager')
+def test_job_result_serves_archive(mock_manager, client, tmp_path):
+    """Test downloading the archive of a finished job."""
+    from src.jobs import Job
+    job = Job('testuser', owner='127.0.0.1')
+    job.stage = 'done'
+    job.artifact_path = str(tmp_path / f'{job.id}.zip')
+    with zipfile.ZipFile(job.artifact_path, 'w') as zf:
+        zf.writestr('img1.jpg', b'imagedata1')
+    mock_manager.get.return_value = job
+
+    response = client.get(f'/jobs/{job.id}/result')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    assert 'testuser_instagram_photos.zip' in response.headers['Content-Disposition']
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zip_file:
+        assert zip_file.read('img1.jpg') == b'imagedata1'
+    response.close()
+
+def test_metrics_endpoint(client):
+    """Test the Prometheus metrics endpoint."""
+    client.get('/')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE ig_stage_duration_seconds histogram' in text
+    assert 'ig_requests_total{endpoint="index",status="200"}' in text
+    assert 'ig_component_stat{component="profile_cache",stat="coalesced"}' in text
+
+@patch('src.app.server_timing_enabled', True)
+@patch('src.app.iter_images_as_bytes')
+@patch('src.app.iter_profile_page')
+def test_download_server_timing_header(mock_scrape, mock_download, client):
+    """Test the optional Server-Timing summary on /download."""
+    mock_scrape.return_value = _fake_urls(['http://example.com/img1.jpg'])
+    mock_download.side_effect = _fake_download([('img1.jpg', b'imagedata1')])
+
+    response = client.post('/download', json={'username': 'timinguser'})
+    assert response.status_code == 200
+    assert 'first_image;dur=' in response.headers['Server-Timing']
+    assert 'total;dur=' in response.headers['Server-Timing']
+    response.close()
+
+@pytest.mark.asyncio
+async def test_open_profile_download_records_join_on_joiner_trace():
+    """Test that a request joining an in-flight download records its wait on its own trace."""
+    import asyncio
+    from src import app as app_module
+    from src.metrics import Trace
+    release = asyncio.Event()
+
+    async def slow_images(username):
+        await release.wait()
+        yield 'img1.jpg', b'imagedata1'
+
+    leader_trace, joiner_trace = Trace(), Trace()
+    with patch.object(app_module, '_profile_images', side_effect=slow_images), \
+            patch.object(app_module, 'download_flight', app_module.StreamFlight()):
+        leader = asyncio.ensure_future(app_module.open_profile_download('joinuser', leader_trace))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(app_module.open_profile_download('joinuser', joiner_trace))
+        await asyncio.sleep(0.01)
+        release.set()
+        streams = await asyncio.gather(leader, joiner)
+        assert [[item async for item in stream] for stream in streams] == [[('img1.jpg', b'imagedata1')]] * 2
+
+    assert 'first_image' in leader_trace.totals and 'join' not in leader_trace.totals
+    assert joiner_trace.counts == {'join': 1}
+    assert joiner_trace.totals['join'] >= 0.01
+    assert joiner_trace.server_timing().startswith('join;dur=')
+
+@patch('src.app.iter_profile_page')
+def test_batch_download(mock_scrape, client):
+    """Test the batch endpoint: one folder per user and a manifest with per-user errors."""
+    from src import app as app_module
+
+    def fake_scrape(username, **kwargs):
+        if username == 'missing':
+            raise ProfileNotFoundException()
+        return _fake_urls([f'http://example.com/{username}.jpg'])
+
+    class FakeDownloader:
+        async def iter_images_stream(self, urls, result=None):
+            async for url in urls:
+                name = url.rsplit('/', 1)[-1]
+                yield name, name.encode()
+
+    mock_scrape.side_effect = fake_scrape
+    with patch.object(app_module.batch_downloader, 'downloader', FakeDownloader()):
+        response = client.post('/batch', json={'usernames': ['alice', 'missing']})
+        assert response.status_code == 200
+        assert response.headers['Content-Disposition'] == 'attachment;filename=instagram_photos_batch.zip'
+        data = response.data
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.read('alice/alice.jpg') == b'alice.jpg'
+        manifest = json.loads(zip_file.read('manifest.json'))
+    assert [entry['status'] for entry in manifest['profiles']] == ['ok', 'error']
+    assert manifest['profiles'][1]['error_status'] == 404
+
+def test_batch_download_invalid_request(client):
+    """Test the batch endpoint input validation."""
+    assert client.post('/batch', json={}).status_code == 400
+    response = client.post('/batch', json={'usernames': ['ok', 'user name']})
+    assert response.status_code == 400
+    assert response.json['error'] == '유효하지 않은 계정명입니다: user name'
+
+def test_archive_route_supports_etag_and_range(client, tmp_path):
+    """Test the persisted archive route: build once, then 304 on If-None-Match and 206 on Range."""
+    from src import app as app_module
+    from src.artifact_store import ArtifactStore
+    from src.scraper import ProfileScrapeResult
+
+    urls = ['http://example.com/img1.jpg', 'http://example.com/img2.jpg']
+    scrapes = 0
+
+    async def fake_scrape(username):
+        nonlocal scrapes
+        scrapes += 1
+        return ProfileScrapeResult(username, ['C1'], urls, {'C1': urls})
+
+    class FakeDownloader:
+        async def iter_images(self, image_urls, result=None):
+            for url in image_urls:
+                result.succeeded += 1
+                name = url.rsplit('/', 1)[-1]
+                yield name, name.encode()
+
+    with patch('src.app.artifact_store', ArtifactStore(str(tmp_path))), \
+            patch('src.app.scrape_profile_result', side_effect=fake_scrape), \
+            patch.object(app_module, 'image_downloader', FakeDownloader()):
+        response = client.get('/archives/archiveuser')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert 'Last-Modified' in response.headers
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        data = response.data
+        response.close()
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+            assert zip_file.read('img2.jpg') == b'img2.jpg'
+
+        response = client.get('/archives/archiveuser', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        response.close()
+
+        response = client.get('/archives/archiveuser', headers={'Range': 'bytes=10-', 'If-Range': etag})
+        assert response.status_code == 206
+        assert response.data == data[10:]
+        response.close()
+
+    assert scrapes == 3
+
+def test_archive_route_invalid_username(client):
+    """Test the archive route with an invalid username."""
+    response = client.get('/archives/user%20name')
+    assert response.status_code == 400
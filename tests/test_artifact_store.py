@@ -0,0 +1,151 @@
+import os
+import time
+import asyncio
+import pytest
+
+from src.artifact_store import ArtifactStore, archive_fingerprint, _safe_dirname
+
+def test_fingerprint_ignores_order_signatures_and_size_variants():
+    """
+    지문이 URL 순서, 서명 쿼리, 해상도 변형과 무관하고 게시물이 바뀌면 달라지는지 테스트합니다.
+    """
+    urls = [
+        "https://scontent.cdninstagram.com/v/t51/1_2_3_n.jpg?stp=dst-jpg_s1080x1080&oh=aaa",
+        "https://scontent.cdninstagram.com/v/t51/4_5_6_n.jpg?oh=bbb",
+    ]
+    resigned = [
+        "https://scontent-b.cdninstagram.com/v/t51/4_5_6_n.jpg?oh=ccc",
+        "https://scontent-b.cdninstagram.com/v/t51/1_2_3_n.jpg?stp=dst-jpg_s640x640&oh=ddd",
+    ]
+
+    assert archive_fingerprint(urls) == archive_fingerprint(resigned)
+    assert archive_fingerprint(urls) != archive_fingerprint(urls[:1])
+    assert archive_fingerprint(urls) != archive_fingerprint(urls, variant='smallest')
+
+@pytest.mark.asyncio
+async def test_get_or_build_builds_once_and_reuses(tmp_path):
+    """
+    같은 키로 동시에 요청해도 한 번만 만들고, 이후에는 저장된 파일을 돌려주는지 테스트합니다.
+    """
+    store = ArtifactStore(str(tmp_path))
+    builds = 0
+
+    async def build(f):
+        nonlocal builds
+        builds += 1
+        await asyncio.sleep(0.01)
+        f.write(b'zipdata')
+
+    artifacts = await asyncio.gather(*(store.get_or_build('Test_User', 'fp1', build) for _ in range(3)))
+    again = await store.get_or_build('test_user', 'fp1', build)
+
+    assert builds == 1
+    assert {a.path for a in artifacts} == {again.path}
+    assert again.etag == 'fp1'
+    assert again.size == len(b'zipdata')
+    with open(again.path, 'rb') as f:
+        assert f.read() == b'zipdata'
+    assert store.stats()['builds'] == 1
+    assert [p.name for p in (tmp_path / 'test_user').iterdir()] == ['fp1.zip']
+
+@pytest.mark.asyncio
+async def test_get_or_build_stores_under_actual_fingerprint(tmp_path):
+    """
+    build가 실제 내용의 지문을 돌려주면 그 지문으로 저장되고, 별칭이 살아 있는 동안은 예상 지문으로도 다시 만들지 않는지 테스트합니다.
+    """
+    store = ArtifactStore(str(tmp_path), alias_ttl=60)
+    builds = 0
+
+    async def partial(f):
+        nonlocal builds
+        builds += 1
+        f.write(b'partial')
+        return 'fp_partial'
+
+    artifact = await store.get_or_build('test_user', 'fp_full', partial)
+    again = await store.get_or_build('test_user', 'fp_full', partial)
+
+    assert artifact.etag == 'fp_partial'
+    assert builds == 1
+    assert again.path == artifact.path and again.etag == 'fp_partial'
+    assert store.get('test_user', 'fp_partial').path == artifact.path
+    assert store.stats()['alias_hits'] == 1
+
+    # 별칭이 만료되면 예상 지문으로 다시 만들고, 정리 시 별칭 파일도 지움
+    alias = tmp_path / 'test_user' / 'fp_full.alias'
+    os.utime(alias, (time.time() - 120, time.time() - 120))
+    assert store.get('test_user', 'fp_full') is None
+    store.evict()
+    assert not alias.exists()
+    await store.get_or_build('test_user', 'fp_full', partial)
+    assert builds == 2
+
+@pytest.mark.asyncio
+async def test_failed_build_leaves_nothing_behind(tmp_path):
+    """
+    build가 실패하면 임시 파일이 남지 않고 예외가 전달되는지 테스트합니다.
+    """
+    store = ArtifactStore(str(tmp_path))
+
+    async def build(f):
+        f.write(b'half')
+        raise RuntimeError("download failed")
+
+    with pytest.raises(RuntimeError):
+        await store.get_or_build('test_user', 'fp1', build)
+
+    assert list((tmp_path / 'test_user').iterdir()) == []
+    assert store.get('test_user', 'fp1') is None
+
+def test_evict_removes_expired_and_oldest_over_budget(tmp_path):
+    """
+    만료된 아카이브와, 용량을 넘는 만큼의 오래된 아카이브가 삭제되는지 테스트합니다.
+    """
+    store = ArtifactStore(str(tmp_path), max_bytes=25, ttl=100)
+    now = time.time()
+    for name, age in [('old', 50), ('mid', 20), ('new', 10), ('expired', 200)]:
+        path = tmp_path / 'user' / f'{name}.zip'
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b'x' * 10)
+        os.utime(path, (now - age, now - age))
+
+    assert store.evict(now) == 2
+    assert sorted(p.name for p in (tmp_path / 'user').iterdir()) == ['mid.zip', 'new.zip']
+    assert store.stats()['evictions'] == 2
+
+@pytest.mark.parametrize("username", ['../etc', '..', 'a/b', ''])
+def test_safe_dirname_prevents_path_traversal(username):
+    """
+    계정명에 경로 문자가 있으면 해시된 디렉터리 이름을 사용하는지 테스트합니다.
+    """
+    name = _safe_dirname(username)
+    assert name.startswith('_')
+    assert '/' not in name and '.' not in name
+
+@pytest.mark.asyncio
+async def test_get_or_build_does_filesystem_work_off_the_event_loop(tmp_path):
+    """
+    저장(os.replace)과 정리(os.walk)가 이벤트 루프 스레드가 아닌 스레드에서 실행되는지 테스트합니다.
+    """
+    import threading
+    from unittest.mock import patch
+    store = ArtifactStore(str(tmp_path))
+    threads = []
+    original_replace, original_walk = os.replace, os.walk
+
+    def replace(*args):
+        threads.append(threading.current_thread())
+        return original_replace(*args)
+
+    def walk(*args):
+        threads.append(threading.current_thread())
+        return original_walk(*args)
+
+    async def build(f):
+        f.write(b'zipdata')
+
+    with patch('src.artifact_store.os.replace', replace), patch('src.artifact_store.os.walk', walk):
+        await store.get_or_build('test_user', 'fp1', build)
+
+    assert len(threads) == 2
+    assert threading.current_thread() not in threads
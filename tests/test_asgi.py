@@ -0,0 +1,187 @@
+import io
+import json
+import zipfile
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.asgi import application
+from src.scraper import ProfileNotFoundException
+
+async def _call(method, path, body=b'', headers=()):
+    """ASGI 앱을 직접 호출하고 (상태 코드, 헤더, 본문)을 반환하는 테스트 헬퍼."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'scheme': 'http', 'query_string': b'', 'headers': [(b'content-type', b'application/json'), *headers],
+        'client': ('127.0.0.1', 1234), 'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    start = next(m for m in sent if m['type'] == 'http.response.start')
+    body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+    return start['status'], dict(start['headers']), body
+
+async def _fake_urls(urls):
+    for url in urls:
+        yield url
+
+def _fake_download(items):
+    async def download(image_urls, downloader=None):
+        async for _ in image_urls:
+            pass
+        for item in items:
+            yield item
+    return download
+
+@pytest.mark.asyncio
+async def test_asgi_download_invalid_username():
+    """
+    ASGI /download 핸들러가 잘못된 계정명에 400을 반환하는지 테스트합니다.
+    """
+    status, _, body = await _call('POST', '/download', json.dumps({'username': 'user name'}).encode())
+
+    assert status == 400
+    assert json.loads(body)['error'] == '유효하지 않은 계정명입니다.'
+
+@pytest.mark.asyncio
+@patch('src.app.iter_images_as_bytes')
+@patch('src.app.iter_profile_page')
+async def test_asgi_download_streams_zip(mock_scrape, mock_download):
+    """
+    ASGI /download 핸들러가 이벤트 루프에서 직접 ZIP을 스트리밍하는지 테스트합니다.
+    """
+    mock_scrape.return_value = _fake_urls(['http://example.com/img1.jpg'])
+    mock_download.side_effect = _fake_download([('img1.jpg', b'imagedata1')])
+
+    status, headers, body = await _call('POST', '/download', json.dumps({'username': 'testuser'}).encode())
+
+    assert status == 200
+    assert headers[b'content-type'] == b'application/zip'
+    assert headers[b'content-disposition'] == b'attachment;filename=testuser_instagram_photos.zip'
+    with zipfile.ZipFile(io.BytesIO(body)) as zip_file:
+        assert zip_file.read('img1.jpg') == b'imagedata1'
+
+@pytest.mark.asyncio
+async def test_asgi_download_serves_stored_archive(tmp_path):
+    """
+    저장된 아카이브가 있으면 스크래핑 없이 파일을 ETag/Content-Length와 함께 보내는지 테스트합니다.
+    """
+    from src.artifact_store import Artifact
+    path = tmp_path / 'fp1.zip'
+    path.write_bytes(b'storedzip' * 100000)
+
+    with patch('src.app.stored_archive', return_value=Artifact('testuser', 'fp1', str(path))), \
+            patch('src.app.iter_profile_page') as mock_scrape:
+        status, headers, body = await _call('POST', '/download', json.dumps({'username': 'testuser'}).encode())
+
+    assert status == 200
+    assert headers[b'etag'] == b'"fp1"'
+    assert headers[b'content-length'] == str(len(body)).encode()
+    assert body == path.read_bytes()
+    mock_scrape.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_asgi_archive_handles_conditional_and_range_requests(tmp_path):
+    """
+    ASGI GET /archives/<username> 핸들러가 루프에서 아카이브를 만들고, 304/206/416과 If-Range 불일치를 처리하는지 테스트합니다.
+    """
+    from src.artifact_store import Artifact
+    path = tmp_path / 'fp1.zip'
+    path.write_bytes(bytes(range(256)) * 4000)
+    data = path.read_bytes()
+    build_archive = AsyncMock(return_value=Artifact('testuser', 'fp1', str(path)))
+
+    with patch('src.app.build_archive', build_archive):
+        status, headers, body = await _call('GET', '/archives/testuser')
+        assert status == 200 and body == data
+        assert headers[b'etag'] == b'"fp1"'
+        assert headers[b'accept-ranges'] == b'bytes'
+
+        status, _, body = await _call('GET', '/archives/testuser', headers=[(b'if-none-match', b'"fp1"')])
+        assert status == 304 and body == b''
+
+        status, _, _ = await _call('GET', '/archives/testuser', headers=[(b'if-modified-since', headers[b'last-modified'])])
+        assert status == 304
+
+        status, range_headers, body = await _call(
+            'GET', '/archives/testuser', headers=[(b'range', b'bytes=300000-'), (b'if-range', b'"fp1"')])
+        assert status == 206 and body == data[300000:]
+        assert range_headers[b'content-range'] == f'bytes 300000-{len(data) - 1}/{len(data)}'.encode()
+
+        status, _, body = await _call('GET', '/archives/testuser', headers=[(b'range', b'bytes=10-'), (b'if-range', b'"old"')])
+        assert status == 200 and body == data
+
+        status, range_headers, _ = await _call('GET', '/archives/testuser', headers=[(b'range', b'bytes=99999999-')])
+        assert status == 416
+        assert range_headers[b'content-range'] == f'bytes */{len(data)}'.encode()
+
+    build_archive.assert_awaited_with('testuser')
+
+@pytest.mark.asyncio
+async def test_asgi_archive_maps_errors():
+    """
+    ASGI 아카이브 핸들러가 잘못된 계정명에 400을, 생성 오류에 해당 상태 코드를 반환하는지 테스트합니다.
+    """
+    from src.app import DownloadError
+    status, _, body = await _call('GET', '/archives/user name')
+    assert status == 400
+
+    with patch('src.app.build_archive', AsyncMock(side_effect=DownloadError(404, 'not found'))):
+        status, _, body = await _call('GET', '/archives/nobody')
+    assert status == 404
+    assert json.loads(body)['error'] == 'not found'
+
+@pytest.mark.asyncio
+@patch('src.app.iter_profile_page')
+async def test_asgi_download_maps_scrape_errors(mock_scrape):
+    """
+    스크래핑 예외가 Flask 라우트와 같은 상태 코드/메시지로 변환되는지 테스트합니다.
+    """
+    mock_scrape.side_effect = ProfileNotFoundException()
+
+    status, _, body = await _call('POST', '/download', json.dumps({'username': 'nobody'}).encode())
+
+    assert status == 404
+    assert json.loads(body)['error'] == "'nobody' 계정을 찾을 수 없습니다."
+
+@pytest.mark.asyncio
+async def test_asgi_delegates_other_routes_to_flask():
+    """
+    /download 이외의 라우트는 Flask 앱이 처리하는지 테스트합니다.
+    """
+    status, _, body = await _call('GET', '/')
+
+    assert status == 200
+    assert b'Instagram Feed Photo Downloader' in body
+
+@pytest.mark.asyncio
+@patch('src.app.shutdown', new_callable=AsyncMock)
+@patch('src.app.startup', new_callable=AsyncMock)
+@patch('src.app.use_event_loop')
+async def test_asgi_lifespan_registers_server_loop(mock_use_event_loop, mock_startup, mock_shutdown):
+    """
+    lifespan 시작 시 서버의 이벤트 루프를 공용 루프로 등록하고, 종료 시 자원을 정리하는지 테스트합니다.
+    """
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    await application({'type': 'lifespan'}, receive, send)
+
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    mock_use_event_loop.assert_called_once()
+    mock_startup.assert_awaited_once()
+    mock_shutdown.assert_awaited_once()
@@ -0,0 +1,76 @@
+import json
+import asyncio
+import pytest
+
+from src.batch import BatchDownloader, MANIFEST_NAME, unique_usernames
+from src.scraper import ProfileNotFoundException, ScrapeTimeoutException
+
+class FakeDownloader:
+    """iter_images_stream만 흉내 내는 다운로더. URL마다 파일명으로 된 이미지를 돌려줍니다."""
+
+    async def iter_images_stream(self, urls, result=None):
+        try:
+            async for url in urls:
+                result.succeeded += 1
+                name = url.rsplit('/', 1)[-1]
+                yield name, name.encode()
+        finally:
+            await urls.aclose()
+
+def _batch(errors=None, active=None, **kwargs):
+    errors = errors or {}
+
+    async def iter_image_urls(username):
+        if active is not None:
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+        try:
+            await asyncio.sleep(0.01)
+            if username in errors:
+                raise errors[username]
+            for i in range(2):
+                yield f"https://scontent/{username}_{i}.jpg"
+        finally:
+            if active is not None:
+                active['now'] -= 1
+
+    def describe_error(e, username):
+        if isinstance(e, ProfileNotFoundException):
+            return 404, f"'{username}' 계정을 찾을 수 없습니다."
+        return 408, '시간 초과'
+
+    return BatchDownloader(iter_image_urls, FakeDownloader(), describe_error, **kwargs)
+
+@pytest.mark.asyncio
+async def test_batch_puts_each_profile_in_its_own_folder_and_writes_manifest():
+    """
+    계정별 폴더로 이미지를 내보내고, 실패한 계정은 배치를 중단하지 않고 manifest에 기록하는지 테스트합니다.
+    """
+    batch = _batch(errors={'missing': ProfileNotFoundException(), 'slow': ScrapeTimeoutException()})
+
+    items = [item async for item in batch.iter_images(['alice', 'missing', 'bob', 'slow'])]
+
+    names = [name for name, _ in items]
+    assert sorted(names[:-1]) == ['alice/alice_0.jpg', 'alice/alice_1.jpg', 'bob/bob_0.jpg', 'bob/bob_1.jpg']
+    assert names[-1] == MANIFEST_NAME
+    manifest = json.loads(items[-1][1])
+    assert manifest['succeeded'] == 2
+    assert manifest['failed'] == 2
+    profiles = {entry['username']: entry for entry in manifest['profiles']}
+    assert profiles['alice']['status'] == 'ok' and profiles['alice']['images'] == 2
+    assert profiles['missing']['error_status'] == 404
+    assert profiles['slow']['error_status'] == 408
+    assert batch.stats() == {'active': 0, 'batches': 1, 'profiles_succeeded': 2, 'profiles_failed': 2}
+
+@pytest.mark.asyncio
+async def test_batch_bounds_parallel_scrapes():
+    active = {'now': 0, 'max': 0}
+    batch = _batch(active=active, parallelism=2)
+
+    items = [item async for item in batch.iter_images([f'user{i}' for i in range(6)])]
+
+    assert len(items) == 6 * 2 + 1
+    assert active['max'] == 2
+
+def test_unique_usernames_ignores_case_and_at_sign():
+    assert unique_usernames(['Alice', '@alice', 'bob', 'BOB']) == ['Alice', 'bob']
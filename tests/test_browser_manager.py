@@ -1,6 +1,8 @@
+import asyncio
 import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
 from playwright.async_api import async_playwright
-from src.browser_manager import get_authenticated_page, CookieFileNotFoundException
+from src.browser_manager import get_authenticated_page, apply_resource_policy, BrowserPool, ResourceBlockPolicy, CookieFileNotFoundException
 
 @pytest.mark.asyncio
 async def test_get_authenticated_page_raises_error_if_cookie_file_not_found(tmp_path):
@@ -28,4 +30,228 @@ async def test_get_authenticated_page_with_valid_cookie_succeeds(tmp_path):
     async with async_playwright() as p:
         async with get_authenticated_page(p, cookie_file_path=str(dummy_cookie_file)) as page:
             assert page is not None
-            assert "chromium" in page.context.browser.browser_type.name
\ No newline at end of file
+            assert "chromium" in page.context.browser.browser_type.name
+
+def _mock_playwright_manager():
+    """브라우저 실행 없이 BrowserPool을 테스트하기 위한 가짜 async_playwright() 객체를 만듭니다."""
+    def new_browser(*args, **kwargs):
+        browser = MagicMock()
+        browser.is_connected.return_value = True
+        browser.close = AsyncMock()
+        context = MagicMock()
+        context.new_page = AsyncMock(side_effect=lambda: AsyncMock())
+        browser.new_context = AsyncMock(return_value=context)
+        return browser
+
+    playwright = MagicMock()
+    playwright.chromium.launch = AsyncMock(side_effect=new_browser)
+    manager = MagicMock()
+    manager.start = AsyncMock(return_value=playwright)
+    manager.__aexit__ = AsyncMock()
+    return manager, playwright
+
+@pytest.fixture
+def dummy_cookie_file(tmp_path):
+    cookie_file = tmp_path / "dummy_cookie.json"
+    cookie_file.write_text("{}")
+    return str(cookie_file)
+
+@pytest.mark.asyncio
+async def test_browser_pool_reuses_warm_browsers(dummy_cookie_file):
+    """
+    풀을 warm 상태로 시작하면 이후 체크아웃에서는 브라우저를 새로 실행하지 않는지 테스트합니다.
+    """
+    manager, playwright = _mock_playwright_manager()
+    with patch('src.browser_manager.async_playwright', return_value=manager):
+        pool = BrowserPool(size=2, cookie_file_path=dummy_cookie_file, idle_timeout=0)
+        await pool.start(warm=True)
+        assert playwright.chromium.launch.call_count == 2
+
+        for _ in range(5):
+            async with pool.page() as page:
+                assert page is not None
+
+        assert playwright.chromium.launch.call_count == 2
+        assert sum(pool.stats()['uses']) == 5
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_browser_pool_recycles_after_max_uses(dummy_cookie_file):
+    """
+    max_uses회 사용된 브라우저는 종료 후 다시 실행되는지 테스트합니다.
+    """
+    manager, playwright = _mock_playwright_manager()
+    with patch('src.browser_manager.async_playwright', return_value=manager):
+        pool = BrowserPool(size=1, cookie_file_path=dummy_cookie_file, max_uses=2, idle_timeout=0)
+        await pool.start()
+
+        for _ in range(3):
+            async with pool.page():
+                pass
+
+        assert playwright.chromium.launch.call_count == 2
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_browser_pool_replaces_disconnected_browser(dummy_cookie_file):
+    """
+    연결이 끊긴 브라우저는 헬스 체크에서 걸러져 재시작되는지 테스트합니다.
+    """
+    manager, playwright = _mock_playwright_manager()
+    with patch('src.browser_manager.async_playwright', return_value=manager):
+        pool = BrowserPool(size=1, cookie_file_path=dummy_cookie_file, idle_timeout=0)
+        await pool.start()
+        pool._slots[0].browser.is_connected.return_value = False
+
+        async with pool.page():
+            pass
+
+        assert playwright.chromium.launch.call_count == 2
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_browser_pool_evicts_idle_browsers(dummy_cookie_file):
+    """
+    idle_timeout이 지난 유휴 브라우저는 종료되고, 다음 체크아웃 때 다시 실행되는지 테스트합니다.
+    """
+    manager, playwright = _mock_playwright_manager()
+    with patch('src.browser_manager.async_playwright', return_value=manager):
+        pool = BrowserPool(size=2, cookie_file_path=dummy_cookie_file, idle_timeout=60)
+        await pool.start()
+        for slot in pool._slots:
+            slot.last_used -= 120
+
+        assert await pool.evict_idle() == 2
+        assert pool.stats()['open'] == 0
+
+        async with pool.page():
+            pass
+        assert pool.stats()['open'] == 1
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_browser_pool_requires_cookie_file(tmp_path):
+    """
+    쿠키 파일이 없으면 풀 시작 시 CookieFileNotFoundException을 발생시키는지 테스트합니다.
+    """
+    pool = BrowserPool(size=1, cookie_file_path=str(tmp_path / "missing.json"))
+    with pytest.raises(CookieFileNotFoundException):
+        await pool.start()
+
+@pytest.mark.parametrize("resource_type, url, expected", [
+    ("image", "https://scontent-icn2-1.cdninstagram.com/v/a.jpg", True),
+    ("media", "https://scontent.cdninstagram.com/v/a.mp4", True),
+    ("font", "https://static.cdninstagram.com/font.woff2", True),
+    ("xhr", "https://www.instagram.com/graphql/query", False),
+    ("script", "https://static.cdninstagram.com/rsrc.php/app.js", False),
+    ("script", "https://www.googletagmanager.com/gtag.js", True),
+    ("image", "data:image/png;base64,AAAA", False),
+])
+def test_resource_block_policy(resource_type, url, expected):
+    """
+    이미지/미디어/폰트와 3rd-party 요청은 차단하고, 그리드에 필요한 1st-party 요청은 허용하는지 테스트합니다.
+    """
+    assert ResourceBlockPolicy().should_block(resource_type, url) is expected
+
+@pytest.mark.asyncio
+async def test_apply_resource_policy_counts_blocked_requests():
+    """
+    route 핸들러가 정책에 따라 abort/continue를 호출하고, 차단/허용 수와 수신 바이트를 기록하는지 테스트합니다.
+    """
+    page = MagicMock()
+    page.route = AsyncMock()
+    usage = await apply_resource_policy(page, ResourceBlockPolicy())
+    handler = page.route.call_args.args[1]
+
+    image_route = MagicMock()
+    image_route.request.resource_type = "image"
+    image_route.request.url = "https://scontent.cdninstagram.com/a.jpg"
+    image_route.abort = AsyncMock()
+    xhr_route = MagicMock()
+    xhr_route.request.resource_type = "xhr"
+    xhr_route.request.url = "https://www.instagram.com/graphql/query"
+    xhr_route.continue_ = AsyncMock()
+
+    await handler(image_route)
+    await handler(xhr_route)
+    usage.record_response(MagicMock(headers={'content-length': '1234'}))
+
+    image_route.abort.assert_awaited_once()
+    xhr_route.continue_.assert_awaited_once()
+    assert usage.as_dict() == {'allowed': 1, 'blocked': 1, 'blocked_by_type': {'image': 1}, 'bytes_received': 1234}
+
+@pytest.mark.asyncio
+async def test_browser_pool_cleans_up_when_warm_start_fails(dummy_cookie_file):
+    """
+    warm 시작 중 브라우저 실행이 실패하면 Playwright를 정리하고 예외를 전달하는지 테스트합니다.
+    """
+    manager, playwright = _mock_playwright_manager()
+    playwright.chromium.launch.side_effect = RuntimeError("executable missing")
+    with patch('src.browser_manager.async_playwright', return_value=manager):
+        pool = BrowserPool(size=2, cookie_file_path=dummy_cookie_file, idle_timeout=0)
+        with pytest.raises(RuntimeError):
+            await pool.start(warm=True)
+
+    assert not pool.started
+    manager.__aexit__.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_browser_pool_spreads_pages_over_sessions(tmp_path):
+    """
+    여러 쿠키 파일을 주면 세션별 컨텍스트에서 페이지를 열고, 차단된 세션은 쿨다운 후 컨텍스트를 다시 만드는지 테스트합니다.
+    """
+    from src.session_pool import RateLimitedException, SessionPool
+    paths = []
+    for name in ("a", "b"):
+        path = tmp_path / f"{name}.json"
+        path.write_text("{}")
+        paths.append(str(path))
+
+    manager, playwright = _mock_playwright_manager()
+    with patch('src.browser_manager.async_playwright', return_value=manager):
+        sessions = SessionPool(paths, cooldown=60)
+        pool = BrowserPool(size=1, sessions=sessions, idle_timeout=0)
+        await pool.start()
+        browser = pool._slots[0].browser
+        assert sorted(pool._slots[0].contexts) == ["a", "b"]
+
+        with pytest.raises(RateLimitedException):
+            async with pool.page():
+                raise RateLimitedException("429")
+        assert len(pool._slots[0].contexts) == 1
+
+        async with pool.page():
+            pass
+
+        stats = sessions.stats()
+        assert stats['available'] == 1
+        assert sum(stats['uses'].values()) == 2
+        assert browser.new_context.await_count == 2
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_browser_pool_takes_browser_before_session(dummy_cookie_file):
+    """
+    브라우저를 기다리는 동안에는 세션을 배정받지 않아(토큰, 사용 시간) 대기 시간이 세션 사용으로 집계되지 않는지 테스트합니다.
+    """
+    from src.session_pool import SessionPool
+    manager, _ = _mock_playwright_manager()
+    with patch('src.browser_manager.async_playwright', return_value=manager):
+        sessions = SessionPool([dummy_cookie_file], rate_per_minute=6000, burst=1)
+        pool = BrowserPool(size=1, sessions=sessions, idle_timeout=0)
+        await pool.start()
+
+        async def second_page():
+            async with pool.page():
+                pass
+
+        async with pool.page():
+            waiting = asyncio.ensure_future(second_page())
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+            assert sum(sessions.stats()['uses'].values()) == 1
+            assert sum(sessions.stats()['in_use'].values()) == 1
+        await waiting
+
+        assert sum(sessions.stats()['uses'].values()) == 2
+        await pool.close()
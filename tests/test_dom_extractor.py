@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from src.dom_extractor import DomMediaCollector
+
+def test_collector_accumulates_deltas_without_duplicates():
+    """
+    여러 번 받은 변경분을 순서대로 누적하고, 같은 게시물은 다시 추가하지 않는지 테스트합니다.
+    """
+    collector = DomMediaCollector()
+
+    assert collector.add_delta({'posts': [
+        {'id': 'C3', 'images': [{'src': 'https://scontent/c3.jpg', 'srcset': 'https://scontent/c3_640.jpg 640w'}]},
+    ], 'images': []}) == 1
+    assert collector.add_delta({'posts': [
+        {'id': 'C3', 'images': [{'src': 'https://scontent/c3.jpg', 'srcset': ''}]},
+        {'id': 'C2', 'images': [{'src': 'https://scontent/c2.jpg', 'srcset': ''}]},
+    ], 'images': []}) == 1
+
+    assert collector.post_ids == ['C3', 'C2']
+    # srcset에 크기가 있는 후보가 있으면 크기를 모르는 src보다 우선(기본 정책: 가장 큰 해상도)
+    assert collector.image_urls == ['https://scontent/c3_640.jpg', 'https://scontent/c2.jpg']
+
+def test_collector_falls_back_to_loose_images():
+    """
+    게시물 링크를 찾지 못한 경우 페이지의 CDN 이미지 전체를 반환하는지 테스트합니다.
+    """
+    collector = DomMediaCollector()
+    collector.add_delta({'posts': [], 'images': [{'src': 'https://scontent/a.jpg'}, {'src': 'https://scontent/a.jpg'}]})
+
+    assert collector.image_urls == ['https://scontent/a.jpg']
+
+def test_collector_ignores_malformed_delta():
+    collector = DomMediaCollector()
+    assert collector.add_delta(None) == 0
+    assert collector.add_delta({'count': 1}) == 0
+
+@pytest.mark.asyncio
+async def test_collector_collect_calls_page_evaluate():
+    """
+    collect()가 page.evaluate 결과를 누적하는지 테스트합니다.
+    """
+    page = AsyncMock()
+    page.evaluate.return_value = {'posts': [{'id': 'C1', 'images': [{'src': 'https://scontent/c1.jpg'}]}], 'images': []}
+    collector = DomMediaCollector()
+
+    assert await collector.collect(page) == 1
+    assert collector.calls == 1
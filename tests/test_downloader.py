@@ -0,0 +1,260 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.downloader import ImageDownloader, parse_retry_after, filename_from_url
+from src.image_cache import ImageCache
+
+@pytest.fixture
+async def cdn_server():
+    """
+    테스트용 가짜 CDN 서버. 경로별로 정상 응답, 429, 404를 흉내 내고 동시 요청 수를 기록합니다.
+    """
+    state = {'active': 0, 'max_active': 0, 'throttled': 0}
+
+    async def image(request):
+        state['active'] += 1
+        state['max_active'] = max(state['max_active'], state['active'])
+        try:
+            await asyncio.sleep(0.01)
+            return web.Response(body=b'img-' + request.match_info['name'].encode())
+        finally:
+            state['active'] -= 1
+
+    async def throttled(request):
+        if state['throttled'] == 0:
+            state['throttled'] += 1
+            return web.Response(status=429, headers={'Retry-After': '0'})
+        return web.Response(body=b'after-throttle')
+
+    async def missing(request):
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_get('/img/{name}', image)
+    app.router.add_get('/throttled.jpg', throttled)
+    app.router.add_get('/missing.jpg', missing)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, state
+    await server.close()
+
+@pytest.mark.asyncio
+async def test_downloader_respects_per_host_concurrency(cdn_server):
+    """
+    호스트별 동시 요청 수 제한을 넘지 않는지 테스트합니다.
+    """
+    server, state = cdn_server
+    urls = [str(server.make_url(f'/img/{i}.jpg')) for i in range(20)]
+
+    async with ImageDownloader(max_concurrency=10, per_host_concurrency=3) as downloader:
+        result = await downloader.download(urls)
+
+    assert result.succeeded == 20
+    assert result.failed == 0
+    assert state['max_active'] <= 3
+    assert result.bytes_downloaded == sum(len(f'img-{i}.jpg') for i in range(20))
+    assert result.bytes_per_second > 0
+
+@pytest.mark.asyncio
+async def test_downloader_retries_after_429(cdn_server):
+    """
+    429 응답을 받으면 Retry-After를 존중하여 재시도하고 성공하는지 테스트합니다.
+    """
+    server, state = cdn_server
+
+    async with ImageDownloader(backoff_base=0.01) as downloader:
+        result = await downloader.download([str(server.make_url('/throttled.jpg'))])
+
+    assert result.images == [('throttled.jpg', b'after-throttle')]
+    assert result.retries == 1
+
+@pytest.mark.asyncio
+async def test_downloader_reports_non_retryable_failures(cdn_server):
+    """
+    404처럼 재시도할 필요가 없는 오류는 즉시 실패로 기록되는지 테스트합니다.
+    """
+    server, _ = cdn_server
+    url = str(server.make_url('/missing.jpg'))
+
+    async with ImageDownloader(backoff_base=0.01) as downloader:
+        result = await downloader.download([url])
+
+    assert result.images == []
+    assert result.retries == 0
+    assert result.failures == [(url, 'HTTP 404')]
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("3", 3.0),
+    ("not-a-date", None),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+def test_filename_from_url():
+    assert filename_from_url("https://scontent.cdn.com/v/t51/abc_n.jpg?oh=1&oe=2") == "abc_n.jpg"
+
+@pytest.mark.asyncio
+async def test_downloader_serves_cached_images_without_network(cdn_server, tmp_path):
+    """
+    캐시에 있는 이미지는 서명이 달라도 네트워크 요청 없이 반환되는지 테스트합니다.
+    """
+    server, state = cdn_server
+    cache = ImageCache(str(tmp_path))
+    url = str(server.make_url('/img/1.jpg'))
+
+    async with ImageDownloader(cache=cache) as downloader:
+        first = await downloader.download([url + '?oh=a'])
+        second = await downloader.download([url + '?oh=b'])
+
+    assert first.cache_hits == 0
+    assert second.cache_hits == 1
+    assert second.images == first.images
+    assert second.bytes_downloaded == 0
+    assert cache.stats()['hits'] == 1
+
+@pytest.mark.asyncio
+async def test_iter_images_stream_downloads_while_urls_arrive(cdn_server):
+    """
+    URL 스트림이 끝나기 전에 이미 도착한 URL의 이미지를 내보내는지(파이프라인) 테스트합니다.
+    """
+    server, state = cdn_server
+    more_urls = asyncio.Event()
+
+    async def urls():
+        yield str(server.make_url('/img/first.jpg'))
+        await more_urls.wait()
+        yield str(server.make_url('/img/second.jpg'))
+        yield str(server.make_url('/img/second.jpg'))
+
+    async with ImageDownloader() as downloader:
+        images = downloader.iter_images_stream(urls())
+        assert await images.__anext__() == ('first.jpg', b'img-first.jpg')
+        more_urls.set()
+        assert [image async for image in images] == [('second.jpg', b'img-second.jpg')]
+
+@pytest.mark.asyncio
+async def test_iter_images_stream_applies_backpressure(cdn_server):
+    """
+    소비되지 않은 다운로드가 max_pending개에 도달하면 URL 스트림을 더 읽지 않는지 테스트합니다.
+    """
+    server, state = cdn_server
+    pulled = 0
+
+    async def urls():
+        nonlocal pulled
+        for i in range(20):
+            pulled += 1
+            yield str(server.make_url(f'/img/{i}.jpg'))
+
+    async with ImageDownloader() as downloader:
+        images = downloader.iter_images_stream(urls(), max_pending=3)
+        await images.__anext__()
+        await asyncio.sleep(0.1)
+        # 소비한 1개 + 대기 3개 + 세마포어를 기다리며 멈춘 1개
+        assert pulled <= 5
+        remaining = [image async for image in images]
+
+    assert len(remaining) == 19
+    assert pulled == 20
+
+@pytest.mark.asyncio
+async def test_downloader_spools_images_over_request_budget(cdn_server, tmp_path):
+    """
+    메모리 한도가 설정되면 이미지를 SpooledImage로 받고, 요청 한도를 넘은 이미지는 디스크로 넘기는지 테스트합니다.
+    """
+    from src.spool import MemoryBudget, SpooledImage
+    server, _ = cdn_server
+    urls = [str(server.make_url(f'/img/{i}.jpg')) for i in range(6)]
+    process_budget = MemoryBudget(1024 ** 2)
+
+    async with ImageDownloader(memory_budget=process_budget, request_memory_limit=20, spool_dir=str(tmp_path)) as downloader:
+        images = [image async for image in downloader.iter_images(urls)]
+
+    assert all(isinstance(data, SpooledImage) for _, data in images)
+    assert sorted(data.read() for _, data in images) == sorted(f'img-{i}.jpg'.encode() for i in range(6))
+    # 이미지 하나는 9바이트이므로 20바이트 한도 안에는 2개까지만 메모리에 남음
+    assert sum(not data.spilled for _, data in images) == 2
+    assert process_budget.stats()['spills'] == 4
+
+    del images
+    assert process_budget.in_use == 0
+
+@pytest.mark.asyncio
+async def test_downloader_skips_media_variants_and_renames_colliding_filenames(cdn_server):
+    """
+    서명/해상도만 다른 같은 사진은 한 번만 받고, 파일명이 겹치는 서로 다른 사진은 다른 이름을 받는지 테스트합니다.
+    """
+    server, _ = cdn_server
+    urls = [
+        str(server.make_url('/img/1.jpg')) + '?oh=a',
+        str(server.make_url('/img/1.jpg')) + '?oh=b',
+        str(server.make_url('/img/s640x640/1.jpg')),
+        str(server.make_url('/img/throttled.jpg')),
+        str(server.make_url('/throttled.jpg')),
+    ]
+
+    async with ImageDownloader(backoff_base=0.01) as downloader:
+        result = await downloader.download(urls)
+
+    images = dict(result.images)
+    assert result.succeeded == 3
+    assert images['1.jpg'] == b'img-1.jpg'
+    assert images['throttled.jpg'] == b'img-throttled.jpg'
+    renamed = [name for name in images if name.startswith('throttled_')]
+    assert len(renamed) == 1 and images[renamed[0]] == b'after-throttle'
+
+class FakeTranscoder:
+    """transcode만 흉내 내는 변환기. 내용을 대문자로 바꾸고 확장자를 .webp로 바꿉니다."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def transcode(self, filename, data):
+        self.calls += 1
+        return filename.rsplit('.', 1)[0] + '.webp', data.upper()
+
+@pytest.mark.asyncio
+async def test_downloader_transcodes_images_and_caches_originals(cdn_server, tmp_path):
+    """
+    변환기가 주어지면 받은 이미지와 캐시된 이미지 모두 변환해서 내보내고, 캐시에는 원본을 저장하는지 테스트합니다.
+    """
+    from src.spool import MemoryBudget, SpooledImage
+    server, _ = cdn_server
+    cache = ImageCache(str(tmp_path / "cache"))
+    transcoder = FakeTranscoder()
+    url = str(server.make_url('/img/1.jpg'))
+
+    async with ImageDownloader(cache=cache, transcoder=transcoder) as downloader:
+        first = await downloader.download([url])
+        second = await downloader.download([url])
+    async with ImageDownloader(memory_budget=MemoryBudget(1024), spool_dir=str(tmp_path), transcoder=transcoder) as downloader:
+        spooled = await downloader.download([url])
+
+    assert first.images == second.images == [("1.webp", b"IMG-1.JPG")]
+    assert second.cache_hits == 1
+    assert cache.get(url) == b"img-1.jpg"
+    assert transcoder.calls == 3
+    (name, data), = spooled.images
+    assert name == "1.webp" and isinstance(data, SpooledImage)
+    assert data.read() == b"IMG-1.JPG"
+
+@pytest.mark.asyncio
+async def test_downloader_keeps_transcoded_filenames_unique(cdn_server):
+    """
+    변환으로 확장자가 같아진 파일(a.jpg, a.png → a.webp)이 아카이브 안에서 서로 다른 이름을 갖는지 테스트합니다.
+    """
+    server, _ = cdn_server
+    urls = [str(server.make_url('/img/a.jpg')), str(server.make_url('/img/a.png'))]
+
+    async with ImageDownloader(transcoder=FakeTranscoder()) as downloader:
+        result = await downloader.download(urls)
+
+    names = sorted(name for name, _ in result.images)
+    assert len(set(names)) == 2
+    assert "a.webp" in names
+    assert all(name.endswith(".webp") for name in names)
+    assert sorted(data for _, data in result.images) == [b"IMG-A.JPG", b"IMG-A.PNG"]
@@ -0,0 +1,105 @@
+import os
+import time
+from src.image_cache import ImageCache, canonical_asset_key
+
+def test_canonical_asset_key_ignores_signature_and_host():
+    """
+    서명 쿼리(oh/oe)와 CDN 엣지 호스트가 달라도 같은 키가 되는지 테스트합니다.
+    """
+    a = "https://scontent-icn2-1.cdninstagram.com/v/t51/123_n.jpg?oh=aaa&oe=111"
+    b = "https://scontent-nrt1-2.cdninstagram.com/v/t51/123_n.jpg?oh=bbb&oe=222"
+    assert canonical_asset_key(a) == canonical_asset_key(b) == "/v/t51/123_n.jpg"
+
+def test_canonical_asset_key_keeps_transform_params():
+    """
+    엣지/추적 파라미터(_nc_*, ccb)는 무시하고, 크기/자르기 변환(stp)이 다르면 다른 키가 되는지 테스트합니다.
+    """
+    full = "https://scontent-icn2-1.cdninstagram.com/v/t51/123_n.jpg?stp=dst-jpg_e35&_nc_ht=a&_nc_cat=1&ccb=7-5&oh=aaa&oe=111"
+    same = "https://scontent-nrt1-2.cdninstagram.com/v/t51/123_n.jpg?_nc_ohc=x&stp=dst-jpg_e35&oh=bbb&oe=222"
+    thumbnail = "https://scontent-icn2-1.cdninstagram.com/v/t51/123_n.jpg?stp=dst-jpg_e35_s640x640&oh=ccc&oe=333"
+
+    assert canonical_asset_key(full) == canonical_asset_key(same) == "/v/t51/123_n.jpg?stp=dst-jpg_e35"
+    assert canonical_asset_key(thumbnail) != canonical_asset_key(full)
+
+def test_image_cache_hit_and_miss(tmp_path):
+    """
+    저장한 이미지는 서명이 다른 URL로도 조회되고, 적중/미스 카운터가 갱신되는지 테스트합니다.
+    """
+    cache = ImageCache(str(tmp_path))
+
+    assert cache.get("https://cdn/a.jpg?oh=1") is None
+    cache.put("https://cdn/a.jpg?oh=1", b"image-a")
+
+    assert cache.get("https://cdn/a.jpg?oh=2") == b"image-a"
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['bytes_saved'] == len(b"image-a")
+
+def test_image_cache_deduplicates_identical_content(tmp_path):
+    """
+    같은 내용은 키가 달라도 blob이 하나만 저장되는지 테스트합니다.
+    """
+    cache = ImageCache(str(tmp_path))
+    cache.put("https://cdn/a.jpg", b"same")
+    cache.put("https://cdn/b.jpg", b"same")
+
+    assert cache.stats()['stores'] == 1
+    assert cache.stats()['total_bytes'] == len(b"same")
+
+def test_image_cache_evicts_least_recently_used(tmp_path):
+    """
+    용량을 넘으면 가장 오래 사용되지 않은 항목부터 삭제되는지 테스트합니다.
+    """
+    cache = ImageCache(str(tmp_path), max_bytes=25)
+    cache.put("https://cdn/old.jpg", b"o" * 10)
+    cache.put("https://cdn/recent.jpg", b"r" * 10)
+
+    # old.jpg를 과거에 사용한 것처럼 mtime을 조정하고 recent.jpg는 방금 조회
+    old_blob = cache._blob_path(cache.put("https://cdn/old.jpg", b"o" * 10))
+    past = time.time() - 3600
+    os.utime(old_blob, (past, past))
+    assert cache.get("https://cdn/recent.jpg") == b"r" * 10
+
+    cache.put("https://cdn/new.jpg", b"n" * 10)
+
+    assert cache.get("https://cdn/old.jpg") is None
+    assert cache.get("https://cdn/recent.jpg") == b"r" * 10
+    assert cache.get("https://cdn/new.jpg") == b"n" * 10
+    assert cache.stats()['evictions'] == 1
+    # 삭제된 blob을 가리키던 키 파일도 정리됨
+    assert not os.path.exists(cache._key_path("https://cdn/old.jpg"))
+    assert os.path.exists(cache._key_path("https://cdn/recent.jpg"))
+
+def test_image_cache_discards_corrupted_blob(tmp_path):
+    """
+    내용이 손상된 blob은 미스로 처리되는지 테스트합니다.
+    """
+    cache = ImageCache(str(tmp_path))
+    digest = cache.put("https://cdn/a.jpg", b"image-a")
+    with open(cache._blob_path(digest), 'wb') as f:
+        f.write(b"garbage")
+
+    assert cache.get("https://cdn/a.jpg") is None
+
+def test_image_cache_is_shared_between_instances(tmp_path):
+    """
+    같은 디렉터리를 사용하는 다른 인스턴스(다른 워커 프로세스)와 캐시를 공유하는지 테스트합니다.
+    """
+    ImageCache(str(tmp_path)).put("https://cdn/a.jpg", b"image-a")
+    other = ImageCache(str(tmp_path))
+
+    assert other.get("https://cdn/a.jpg?oe=9") == b"image-a"
+    assert other.stats()['total_bytes'] == len(b"image-a")
+
+def test_image_cache_put_accepts_chunks(tmp_path):
+    """
+    조각 이터러블로 저장해도 bytes로 저장한 것과 같은 blob이 되는지 테스트합니다.
+    """
+    cache = ImageCache(str(tmp_path))
+    digest = cache.put("https://cdn/a.jpg", iter([b"ima", b"ge-a"]))
+
+    assert digest == cache.put("https://cdn/b.jpg", b"image-a")
+    assert cache.get("https://cdn/a.jpg") == b"image-a"
+    assert cache.stats()['stores'] == 1
+    assert not [name for name in os.listdir(cache._blobs_dir) if name.startswith('.tmp-')]
@@ -0,0 +1,188 @@
+import time
+import asyncio
+import zipfile
+import pytest
+
+from src.job_store import SharedJobManager, SqliteJobStore
+from src.jobs import Job, JobQueueFullException, STAGE_DONE, STAGE_FAILED, STAGE_QUEUED, STAGE_SCRAPING
+from src.scraper import ProfileScrapeResult
+
+class FakeDownloader:
+    """iter_images만 흉내 내는 다운로더. URL마다 10바이트짜리 이미지를 돌려줍니다."""
+
+    async def iter_images(self, urls, result=None):
+        for url in urls:
+            result.succeeded += 1
+            result.bytes_downloaded += 10
+            yield url.rsplit('/', 1)[-1], b'x' * 10
+
+def _manager(store, tmp_path, scrape=None, **kwargs):
+    async def default_scrape(username):
+        await asyncio.sleep(0.05)
+        return ProfileScrapeResult(username, ["C1"], [f"https://scontent/{username}.jpg"], {})
+    return SharedJobManager(
+        store,
+        scrape=scrape or default_scrape,
+        downloader=FakeDownloader(),
+        describe_error=lambda e, username: (500, str(e)),
+        artifact_dir=str(tmp_path / "artifacts"),
+        poll_interval=0.01,
+        **kwargs,
+    )
+
+async def _wait_finished(manager, job_id):
+    for _ in range(300):
+        job = manager.get(job_id)
+        if job is not None and job.stage in (STAGE_DONE, STAGE_FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("작업이 끝나지 않았습니다.")
+
+def test_submit_coalesces_same_username_and_limits_owner(tmp_path):
+    """
+    같은 계정의 끝나지 않은 작업에 합류하고, 사용자별 대기 작업 수를 제한하는지 테스트합니다.
+    """
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite"))
+
+    first, created = store.submit("Test_User", "client-a", max_pending_per_owner=2)
+    again, created_again = store.submit("test_user", "client-b", max_pending_per_owner=2)
+    store.submit("other", "client-a", max_pending_per_owner=2)
+
+    assert created and not created_again
+    assert again.id == first.id
+    with pytest.raises(JobQueueFullException):
+        store.submit("third", "client-a", max_pending_per_owner=2)
+
+def test_claim_is_fair_across_owners(tmp_path):
+    """
+    처리 중인 작업이 적은 사용자의 작업을 먼저 가져가는지 테스트합니다.
+    """
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite"))
+    store.submit("a1", "client-a", 10)
+    store.submit("a2", "client-a", 10)
+    store.submit("b1", "client-b", 10)
+
+    claimed = [store.claim("worker", lease=60, max_attempts=3).username for _ in range(3)]
+
+    assert claimed == ["a1", "b1", "a2"]
+    assert store.claim("worker", lease=60, max_attempts=3) is None
+
+def test_expired_lease_is_reclaimed_then_failed_after_max_attempts(tmp_path):
+    """
+    임대가 끝난 작업은 다른 워커가 다시 가져가고, max_attempts번을 넘기면 실패로 기록되는지 테스트합니다.
+    """
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite"))
+    stored, _ = store.submit("test_user", "client-a", 10)
+    now = time.time()
+
+    assert store.claim("dead-worker", lease=10, max_attempts=2, now=now).id == stored.id
+    assert store.claim("other-worker", lease=10, max_attempts=2, now=now + 5) is None
+    reclaimed = store.claim("other-worker", lease=10, max_attempts=2, now=now + 11)
+    assert reclaimed.id == stored.id and reclaimed.attempts == 2
+
+    # 죽은 워커의 하트비트는 더 이상 반영되지 않음
+    job = Job("test_user", "client-a")
+    job.id = stored.id
+    job.stage = STAGE_SCRAPING
+    assert not store.heartbeat(job, "dead-worker", lease=10)
+
+    assert store.claim("third-worker", lease=10, max_attempts=2, now=now + 30) is None
+    failed = store.get(stored.id)
+    assert failed.stage == STAGE_FAILED
+    assert failed.error[0] == 500
+
+def test_release_puts_job_back_in_queue(tmp_path):
+    """
+    종료하는 워커가 되돌린 작업은 재시도 횟수를 쓰지 않고 대기열로 돌아가는지 테스트합니다.
+    """
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite"))
+    stored, _ = store.submit("test_user", "client-a", 10)
+    store.claim("worker", lease=60, max_attempts=3)
+
+    store.release(stored.id, "worker")
+
+    job = store.get(stored.id)
+    assert job.stage == STAGE_QUEUED and job.attempts == 0
+
+@pytest.mark.asyncio
+async def test_two_managers_share_jobs(tmp_path):
+    """
+    같은 저장소를 쓰는 두 관리자(두 프로세스에 해당)가 작업을 나눠 처리하고, 어느 쪽에서든 결과를 조회할 수 있는지 테스트합니다.
+    """
+    store_path = str(tmp_path / "jobs.sqlite")
+    first = _manager(SqliteJobStore(store_path), tmp_path, workers=1)
+    second = _manager(SqliteJobStore(store_path), tmp_path, workers=1)
+    try:
+        await second.start()
+        jobs = [await first.submit(f"user{i}", owner=f"client-{i}") for i in range(4)]
+        finished = [await _wait_finished(second, job.id) for job in jobs]
+    finally:
+        await first.close()
+        await second.close()
+
+    assert [job.stage for job in finished] == [STAGE_DONE] * 4
+    assert first.claimed > 0 and second.claimed > 0
+    assert finished[0].to_dict()['images_done'] == 1
+    with zipfile.ZipFile(finished[0].artifact_path) as zf:
+        assert zf.namelist() == ["user0.jpg"]
+    assert second.stats()['stages'] == {STAGE_DONE: 4}
+
+@pytest.mark.asyncio
+async def test_failed_job_error_is_shared(tmp_path):
+    """
+    작업 오류가 저장소에 기록되어 다른 프로세스에서도 같은 오류를 보는지 테스트합니다.
+    """
+    async def scrape(username):
+        raise RuntimeError("boom")
+
+    store_path = str(tmp_path / "jobs.sqlite")
+    manager = _manager(SqliteJobStore(store_path), tmp_path, scrape=scrape, workers=1)
+    try:
+        job = await manager.submit("test_user", owner="client-a")
+        await _wait_finished(manager, job.id)
+    finally:
+        await manager.close()
+
+    stored = SqliteJobStore(store_path).get(job.id)
+    assert stored.stage == STAGE_FAILED
+    assert stored.error == (500, "boom")
+    assert stored.to_dict()['error'] == "boom"
+
+@pytest.mark.asyncio
+async def test_lost_lease_cancels_run_and_keeps_new_owner_artifact(tmp_path):
+    """
+    임대를 잃은 워커는 실행 중인 작업을 취소하고, 이어받은 워커의 ZIP 파일을 건드리지 않는지 테스트합니다.
+    """
+    scrape_cancelled = asyncio.Event()
+
+    async def scrape(username):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            scrape_cancelled.set()
+            raise
+
+    store_path = str(tmp_path / "jobs.sqlite")
+    manager = _manager(SqliteJobStore(store_path), tmp_path, scrape=scrape, workers=1, lease=0.3)
+    other = SqliteJobStore(store_path)
+    try:
+        job = await manager.submit("test_user", owner="client-a")
+        while manager.get(job.id).stage != STAGE_SCRAPING:
+            await asyncio.sleep(0.01)
+        # 다른 워커가 임대가 끝난 작업을 이어받아 자기 ZIP을 만들어 둠
+        assert other.claim("other-worker", lease=60, max_attempts=3, now=time.time() + 1).id == job.id
+        winner_artifact = tmp_path / "artifacts" / f"{job.id}-other-worker-2.zip"
+        winner_artifact.write_bytes(b"zip")
+
+        await asyncio.wait_for(scrape_cancelled.wait(), 2)
+        for _ in range(100):
+            if manager.lost_leases:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await manager.close()
+
+    assert manager.lost_leases == 1
+    assert winner_artifact.read_bytes() == b"zip"
+    assert [path.name for path in (tmp_path / "artifacts").iterdir()] == [winner_artifact.name]
+    assert other.get(job.id).stage == STAGE_SCRAPING
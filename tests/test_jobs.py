@@ -0,0 +1,140 @@
+import asyncio
+import zipfile
+import pytest
+
+from src.jobs import JobManager, JobQueueFullException, STAGE_DONE, STAGE_FAILED
+from src.scraper import ProfileScrapeResult, ProfileNotFoundException
+
+def _result(post_ids):
+    return ProfileScrapeResult(
+        "test_user",
+        list(post_ids),
+        [f"https://scontent/{post_id}.jpg" for post_id in post_ids],
+        {post_id: [f"https://scontent/{post_id}.jpg"] for post_id in post_ids},
+    )
+
+class FakeDownloader:
+    """iter_images만 흉내 내는 다운로더. URL마다 10바이트짜리 이미지를 돌려줍니다."""
+
+    async def iter_images(self, urls, result=None):
+        for url in urls:
+            result.succeeded += 1
+            result.bytes_downloaded += 10
+            yield url.rsplit('/', 1)[-1], b'x' * 10
+
+def _manager(tmp_path, scrape=None, **kwargs):
+    async def default_scrape(username):
+        return _result(["C1", "C2"])
+    return JobManager(
+        scrape=scrape or default_scrape,
+        downloader=FakeDownloader(),
+        describe_error=lambda e, username: (404, f"'{username}' 계정을 찾을 수 없습니다."),
+        artifact_dir=str(tmp_path),
+        **kwargs,
+    )
+
+async def _wait_finished(job):
+    for _ in range(100):
+        if job.finished_at is not None:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("작업이 끝나지 않았습니다.")
+
+@pytest.mark.asyncio
+async def test_job_runs_to_completion_and_writes_archive(tmp_path):
+    """
+    작업이 스크래핑 → 다운로드를 거쳐 ZIP 파일을 만들고 진행률을 기록하는지 테스트합니다.
+    """
+    manager = _manager(tmp_path)
+    try:
+        job = await manager.submit("test_user", owner="client-a")
+        await _wait_finished(job)
+    finally:
+        await manager.close()
+
+    assert job.stage == STAGE_DONE
+    assert job.to_dict()['posts_found'] == 2
+    assert job.to_dict()['images_done'] == 2
+    assert job.to_dict()['bytes_downloaded'] == 20
+    with zipfile.ZipFile(job.artifact_path) as zf:
+        assert sorted(zf.namelist()) == ["C1.jpg", "C2.jpg"]
+
+@pytest.mark.asyncio
+async def test_job_failure_is_reported(tmp_path):
+    """
+    스크래핑 중 예외가 나면 describe_error로 변환한 오류가 작업에 기록되는지 테스트합니다.
+    """
+    async def scrape(username):
+        raise ProfileNotFoundException()
+
+    manager = _manager(tmp_path, scrape=scrape)
+    try:
+        job = await manager.submit("ghost", owner="client-a")
+        await _wait_finished(job)
+    finally:
+        await manager.close()
+
+    assert job.stage == STAGE_FAILED
+    assert job.error == (404, "'ghost' 계정을 찾을 수 없습니다.")
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_jobs_are_scheduled_round_robin_across_owners(tmp_path):
+    """
+    한 요청자가 작업을 여러 개 올려도 다른 요청자의 작업이 번갈아 처리되는지 테스트합니다.
+    """
+    manager = _manager(tmp_path, workers=0)
+    try:
+        a1 = await manager.submit("a1", owner="client-a")
+        a2 = await manager.submit("a2", owner="client-a")
+        a3 = await manager.submit("a3", owner="client-a")
+        b1 = await manager.submit("b1", owner="client-b")
+
+        order = [await manager._next_job() for _ in range(4)]
+    finally:
+        await manager.close()
+
+    assert order == [a1, b1, a2, a3]
+
+@pytest.mark.asyncio
+async def test_submit_rejects_when_owner_queue_is_full(tmp_path):
+    manager = _manager(tmp_path, workers=0, max_pending_per_owner=1)
+    try:
+        await manager.submit("a1", owner="client-a")
+        with pytest.raises(JobQueueFullException):
+            await manager.submit("a2", owner="client-a")
+        await manager.submit("b1", owner="client-b")
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_expire_removes_finished_jobs_and_artifacts(tmp_path):
+    """
+    TTL이 지난 완료 작업은 작업 정보와 ZIP 파일이 함께 삭제되는지 테스트합니다.
+    """
+    manager = _manager(tmp_path, artifact_ttl=60)
+    try:
+        job = await manager.submit("test_user", owner="client-a")
+        await _wait_finished(job)
+    finally:
+        await manager.close()
+
+    assert manager.expire(now=job.finished_at + 30) == 0
+    assert manager.expire(now=job.finished_at + 60) == 1
+    assert manager.get(job.id) is None
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_submit_coalesces_active_job_for_same_username(tmp_path):
+    """
+    같은 계정의 작업이 끝나지 않았으면 새 작업 대신 진행 중인 작업을 돌려주는지 테스트합니다.
+    """
+    manager = _manager(tmp_path, workers=0)
+    try:
+        first = await manager.submit("Test_User", owner="client-a")
+        second = await manager.submit("test_user", owner="client-b")
+    finally:
+        await manager.close()
+
+    assert second is first
+    assert manager.stats()['coalesced'] == 1
@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.media_harvester import NetworkMediaHarvester
+
+V1_FEED = {
+    "items": [
+        {
+            "code": "CAROUSEL1",
+            "pk": "100",
+            "user": {"username": "test_user"},
+            "carousel_media": [
+                {"pk": "101", "image_versions2": {"candidates": [
+                    {"url": "https://scontent/101_small.jpg", "width": 320},
+                    {"url": "https://scontent/101_large.jpg", "width": 1080},
+                ]}},
+                {"pk": "102", "image_versions2": {"candidates": [
+                    {"url": "https://scontent/102_large.jpg", "width": 1080},
+                ]}},
+            ],
+        },
+        {
+            "code": "SINGLE1",
+            "pk": "200",
+            "user": {"username": "test_user"},
+            "image_versions2": {"candidates": [{"url": "https://scontent/200.jpg", "width": 1080}]},
+        },
+        {
+            "code": "OTHER1",
+            "user": {"username": "someone_else"},
+            "image_versions2": {"candidates": [{"url": "https://scontent/other.jpg", "width": 1080}]},
+        },
+    ]
+}
+
+GRAPHQL_FEED = {
+    "data": {"user": {"edge_owner_to_timeline_media": {"edges": [
+        {"node": {
+            "shortcode": "GQL1",
+            "owner": {"username": "test_user"},
+            "display_url": "https://scontent/gql1_display.jpg",
+            "display_resources": [
+                {"src": "https://scontent/gql1_640.jpg", "config_width": 640},
+                {"src": "https://scontent/gql1_1080.jpg", "config_width": 1080},
+            ],
+        }},
+    ]}}}
+}
+
+def test_harvester_collects_best_resolution_and_carousel_children():
+    """
+    API v1 피드에서 캐러셀 하위 이미지와 가장 큰 해상도의 URL을 수집하고, 다른 계정의 미디어는 제외하는지 테스트합니다.
+    """
+    harvester = NetworkMediaHarvester("Test_User")
+
+    assert harvester.feed(V1_FEED) == 2
+    assert harvester.post_ids == ["CAROUSEL1", "SINGLE1"]
+    assert harvester.post_images["CAROUSEL1"] == ["https://scontent/101_large.jpg", "https://scontent/102_large.jpg"]
+    assert harvester.media_ids == {"101", "102", "200"}
+
+def test_harvester_supports_graphql_shape_and_deduplicates():
+    """
+    GraphQL 형식도 처리하며, 같은 게시물이 다시 들어와도 중복 수집하지 않는지 테스트합니다.
+    """
+    harvester = NetworkMediaHarvester("test_user")
+
+    harvester.feed(GRAPHQL_FEED)
+    assert harvester.feed(GRAPHQL_FEED) == 0
+    assert harvester.image_urls == ["https://scontent/gql1_1080.jpg"]
+
+@pytest.mark.asyncio
+async def test_harvester_consumes_only_feed_responses():
+    """
+    피드/GraphQL 응답만 파싱하고, drain()이 처리 완료를 기다리는지 테스트합니다.
+    """
+    harvester = NetworkMediaHarvester("test_user")
+    page = MagicMock()
+    harvester.attach(page)
+    handler = page.on.call_args.args[1]
+
+    feed_response = MagicMock(url="https://www.instagram.com/graphql/query", headers={'content-type': 'application/json'})
+    feed_response.json = AsyncMock(return_value=GRAPHQL_FEED)
+    image_response = MagicMock(url="https://scontent/abc.jpg", headers={'content-type': 'image/jpeg'})
+    image_response.json = AsyncMock()
+
+    handler(feed_response)
+    handler(image_response)
+    await harvester.drain()
+
+    assert harvester.post_ids == ["GQL1"]
+    assert harvester.responses_parsed == 1
+    image_response.json.assert_not_called()
+
+def test_harvester_applies_resolution_policy():
+    """
+    해상도 정책(가장 작은 해상도, N픽셀 이하)에 따라 후보 URL을 고르는지 테스트합니다.
+    """
+    smallest = NetworkMediaHarvester("test_user", resolution="smallest")
+    smallest.feed(GRAPHQL_FEED)
+    assert smallest.image_urls == ["https://scontent/gql1_640.jpg"]
+
+    bounded = NetworkMediaHarvester("test_user", resolution="max:800")
+    bounded.feed(V1_FEED)
+    assert bounded.post_images["CAROUSEL1"] == ["https://scontent/101_small.jpg", "https://scontent/102_large.jpg"]
@@ -0,0 +1,72 @@
+import pytest
+
+from src.media_urls import (
+    FilenameAllocator, ResolutionPolicy, media_key, parse_srcset, select_media_urls, url_size_hint,
+)
+
+IG_640 = "https://scontent-icn2-1.cdninstagram.com/v/t51.29350-15/448843412_1183541279364416_5328061683010123306_n.jpg?stp=dst-jpg_e35_s640x640_sh0.08&oh=aaa&oe=111"
+IG_1080 = "https://scontent-nrt1-2.cdninstagram.com/v/t51.29350-15/448843412_1183541279364416_5328061683010123306_n.jpg?stp=dst-jpg_e35_p1080x1080&oh=bbb&oe=222"
+IG_OLD_150 = "https://scontent.cdninstagram.com/vp/abc/s150x150/e35/448843412_1183541279364416_5328061683010123306_n.jpg"
+
+def test_media_key_groups_size_signature_and_host_variants():
+    """
+    해상도, 서명(oh/oe), CDN 엣지 호스트, 예전 형식의 크기 세그먼트만 다른 URL이 같은 미디어 키가 되는지 테스트합니다.
+    """
+    assert media_key(IG_640) == media_key(IG_1080) == media_key(IG_OLD_150)
+    assert media_key("https://cdn/a/photo.jpg") != media_key("https://cdn/b/photo.jpg")
+    assert media_key("https://cdn/a/s640x640/photo.jpg") == media_key("https://cdn/a/photo.jpg")
+
+def test_url_size_hint_and_parse_srcset():
+    assert url_size_hint(IG_640) == 640
+    assert url_size_hint(IG_1080) == 1080
+    assert url_size_hint(IG_OLD_150) == 150
+    assert url_size_hint("https://cdn/photo.jpg") is None
+    assert parse_srcset("https://cdn/a.jpg 640w, https://cdn/b.jpg 1080w,https://cdn/c.jpg 2x") == [
+        ("https://cdn/a.jpg", 640), ("https://cdn/b.jpg", 1080), ("https://cdn/c.jpg", None),
+    ]
+
+@pytest.mark.parametrize("policy, expected", [
+    ("largest", "https://cdn/1080.jpg"),
+    ("smallest", "https://cdn/320.jpg"),
+    ("max:700", "https://cdn/640.jpg"),
+    ("1080", "https://cdn/1080.jpg"),
+    ("max:100", "https://cdn/320.jpg"),
+])
+def test_resolution_policy_choose_image(policy, expected):
+    srcset = "https://cdn/320.jpg 320w, https://cdn/640.jpg 640w, https://cdn/1080.jpg 1080w"
+    assert ResolutionPolicy.parse(policy).choose_image("https://cdn/fallback.jpg", srcset) == expected
+
+def test_resolution_policy_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        ResolutionPolicy.parse("huge")
+
+def test_select_media_urls_keeps_one_url_per_media():
+    assert select_media_urls([IG_640, "https://cdn/other.jpg", IG_1080, IG_OLD_150]) == [IG_1080, "https://cdn/other.jpg"]
+    assert select_media_urls([IG_640, IG_1080, IG_OLD_150], "smallest") == [IG_OLD_150]
+
+def test_filename_allocator_is_collision_free_and_deterministic():
+    """
+    마지막 경로가 같은 서로 다른 미디어에는 해시 접미사를 붙이고, 같은 미디어에는 항상 같은 이름을 주는지 테스트합니다.
+    """
+    names = FilenameAllocator()
+    first = names.assign("https://cdn/a/photo.jpg")
+    second = names.assign("https://cdn/b/photo.jpg")
+
+    assert first == "photo.jpg"
+    assert second.startswith("photo_") and second.endswith(".jpg") and second != first
+    assert names.assign("https://cdn/b/s640x640/photo.jpg?oh=x") == second
+    assert FilenameAllocator().assign(IG_640) == "448843412_1183541279364416_5328061683010123306_n.jpg"
+
+def test_filename_allocator_rename_avoids_other_media_names():
+    """
+    변환 등으로 파일명을 바꿀 때 다른 미디어가 쓰는 이름과 겹치면 해시 접미사를 붙이는지 테스트합니다.
+    """
+    names = FilenameAllocator()
+    names.assign("https://cdn/a.jpg")
+    names.assign("https://cdn/a.png")
+
+    assert names.rename("https://cdn/a.jpg", "a.webp") == "a.webp"
+    assert names.rename("https://cdn/a.jpg", "a.webp") == "a.webp"
+    renamed = names.rename("https://cdn/a.png", "a.webp")
+    assert renamed.startswith("a_") and renamed.endswith(".webp")
+    assert names.assign("https://cdn/a.png") == renamed
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+
+from src.metrics import MetricsRegistry, Trace, current_trace, span, STAGE_SECONDS
+
+def test_registry_renders_prometheus_text_format():
+    """
+    카운터/게이지/히스토그램이 Prometheus 텍스트 형식으로 출력되는지 테스트합니다.
+    """
+    registry = MetricsRegistry()
+    requests = registry.counter('test_requests_total', '요청 수', ['status'])
+    pool = registry.gauge('test_pool_open', '열린 브라우저 수')
+    latency = registry.histogram('test_latency_seconds', '지연 시간', buckets=(0.1, 1.0))
+
+    requests.inc(status='200')
+    requests.inc(2, status='200')
+    pool.set(3)
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = registry.render()
+    assert '# TYPE test_requests_total counter' in text
+    assert 'test_requests_total{status="200"} 3' in text
+    assert 'test_pool_open 3' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count 2' in text
+
+def test_counter_rejects_unknown_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter('test_total', '테스트', ['endpoint'])
+    with pytest.raises(ValueError):
+        counter.inc(status='200')
+
+@pytest.mark.asyncio
+async def test_span_records_into_histogram_and_current_trace():
+    """
+    span 구간이 단계 히스토그램과, 하위 태스크를 포함한 현재 요청의 Trace에 기록되는지 테스트합니다.
+    """
+    trace = Trace()
+    current_trace.set(trace)
+    before = STAGE_SECONDS.count(stage='goto')
+
+    with span('goto'):
+        await asyncio.sleep(0.01)
+
+    async def child():
+        with span('download'):
+            pass
+    await asyncio.gather(child(), child())
+
+    assert STAGE_SECONDS.count(stage='goto') == before + 1
+    assert trace.totals['goto'] >= 0.01
+    assert trace.counts['download'] == 2
+    header = trace.server_timing()
+    assert header.startswith('goto;dur=')
+    assert 'download;dur=' in header and 'desc="x2"' in header
+    assert 'total;dur=' in header
+
+def test_trace_keeps_bounded_spans():
+    """
+    Trace가 처음 max_spans개 구간만 시작 시각과 함께 보관하고, 나머지는 합계/횟수에만 반영하는지 테스트합니다.
+    """
+    trace = Trace(max_spans=2)
+    trace.add('goto', 0.5, trace.started + 0.1)
+    trace.add('download', 0.2, trace.started + 0.7)
+    trace.add('download', 0.3, trace.started + 0.9)
+
+    assert trace.span_list() == [
+        {'stage': 'goto', 'start': 0.1, 'seconds': 0.5},
+        {'stage': 'download', 'start': 0.7, 'seconds': 0.2},
+    ]
+    assert trace.dropped_spans == 1
+    assert trace.counts['download'] == 2
+    assert trace.totals['download'] == pytest.approx(0.5)
@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from src.profile_cache import ProfileCache, is_valid_username, merge_scrape_results, normalize_username
+from src.scraper import ProfileScrapeResult
+
+def _result(post_ids):
+    return ProfileScrapeResult(
+        "test_user",
+        list(post_ids),
+        [f"https://scontent/{post_id}.jpg" for post_id in post_ids],
+        {post_id: [f"https://scontent/{post_id}.jpg"] for post_id in post_ids},
+    )
+
+def test_normalize_username():
+    assert normalize_username(" @Test_User ") == "test_user"
+
+def test_merge_scrape_results_puts_new_posts_first():
+    """
+    증분 결과의 새 게시물이 기존 게시물 앞에 중복 없이 병합되는지 테스트합니다.
+    """
+    merged = merge_scrape_results(_result(["C3", "C2"]), _result(["C2", "C1"]))
+
+    assert merged.post_ids == ["C3", "C2", "C1"]
+    assert merged.image_urls == [
+        "https://scontent/C3.jpg",
+        "https://scontent/C2.jpg",
+        "https://scontent/C1.jpg",
+    ]
+
+@pytest.mark.asyncio
+@patch('src.profile_cache.scrape_profile')
+async def test_profile_cache_returns_fresh_entry_without_scraping(mock_scrape):
+    """
+    TTL 이내의 재요청은 스크래핑 없이 캐시된 결과를 반환하는지 테스트합니다.
+    """
+    mock_scrape.return_value = _result(["C1"])
+    cache = ProfileCache(ttl=600)
+
+    first = await cache.get_or_scrape("Test_User")
+    second = await cache.get_or_scrape("test_user")
+
+    assert second is first
+    assert mock_scrape.call_count == 1
+    assert cache.stats()['hits'] == 1
+
+@pytest.mark.asyncio
+@patch('src.profile_cache.scrape_profile')
+async def test_profile_cache_stale_entry_triggers_incremental_scrape(mock_scrape):
+    """
+    TTL이 지난 결과는 알려진 게시물 ID를 넘겨 증분 스크래핑하고 결과를 병합하는지 테스트합니다.
+    """
+    mock_scrape.side_effect = [_result(["C2", "C1"]), _result(["C3", "C2"])]
+    cache = ProfileCache(ttl=0)
+
+    await cache.get_or_scrape("test_user")
+    result = await cache.get_or_scrape("test_user")
+
+    assert result.post_ids == ["C3", "C2", "C1"]
+    assert mock_scrape.call_args.kwargs['known_post_ids'] == {"C2", "C1"}
+    assert cache.stats()['incremental_scrapes'] == 1
+
+@pytest.mark.asyncio
+@patch('src.profile_cache.scrape_profile')
+async def test_profile_cache_full_refresh_after_limit(mock_scrape):
+    """
+    마지막 전체 스크래핑이 너무 오래되면 증분 대신 전체 스크래핑을 하는지 테스트합니다.
+    """
+    mock_scrape.side_effect = [_result(["C2", "C1"]), _result(["C2"])]
+    cache = ProfileCache(ttl=0, full_refresh_after=0)
+
+    await cache.get_or_scrape("test_user")
+    result = await cache.get_or_scrape("test_user")
+
+    assert result.post_ids == ["C2"]
+    assert 'known_post_ids' not in mock_scrape.call_args.kwargs
+    assert cache.stats()['full_scrapes'] == 2
+
+@pytest.mark.asyncio
+@patch('src.profile_cache.scrape_profile')
+async def test_profile_cache_coalesces_concurrent_scrapes(mock_scrape):
+    """
+    같은 계정(대소문자만 다른 경우 포함)을 동시에 요청하면 스크래핑이 한 번만 실행되는지 테스트합니다.
+    """
+    async def slow_scrape(username, **kwargs):
+        await asyncio.sleep(0.01)
+        return _result(["C1"])
+    mock_scrape.side_effect = slow_scrape
+    cache = ProfileCache(ttl=600)
+
+    results = await asyncio.gather(cache.get_or_scrape("Test_User"), cache.get_or_scrape("test_user"))
+
+    assert results[0] is results[1]
+    assert mock_scrape.call_count == 1
+    assert cache.stats()['coalesced'] == 1
+
+@pytest.mark.asyncio
+@patch('src.profile_cache.iter_profile_image_urls')
+async def test_profile_cache_streams_full_scrape_and_stores_result(mock_iter):
+    """
+    캐시가 없으면 파이프라인 스크래핑 결과를 그대로 내보내고, 끝나면 캐시에 저장하여 다음 요청은 캐시에서 받는지 테스트합니다.
+    """
+    async def fake_iter(username, pool=None, on_result=None, **kwargs):
+        yield "https://scontent/C1.jpg"
+        on_result(_result(["C1"]))
+    mock_iter.side_effect = fake_iter
+    cache = ProfileCache(ttl=600)
+
+    first = [url async for url in cache.iter_image_urls("test_user")]
+    second = [url async for url in cache.iter_image_urls("Test_User")]
+
+    assert first == second == ["https://scontent/C1.jpg"]
+    assert mock_iter.call_count == 1
+    assert cache.stats()['full_scrapes'] == 1
+    assert cache.stats()['hits'] == 1
+
+@pytest.mark.parametrize("username, expected", [
+    ("test_user", True), ("test.user", True), ("a" * 30, True),
+    ("@test_user", False), ("Test_User", False), (" test_user", False), ("a" * 31, False), ("user name", False), ("../etc", False), ("", False), (None, False), (123, False),
+])
+def test_is_valid_username(username, expected):
+    """
+    정규화된 계정명 형식을 그대로(고치지 않고) 검사하는지 테스트합니다.
+    """
+    assert is_valid_username(username) is expected
@@ -3,6 +3,8 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from playwright.async_api import TimeoutError
 from src.scraper import (
     scrape_profile_page,
+    scrape_profile,
+    iter_profile_image_urls,
     ProfileNotFoundException,
     ProfileIsPrivateException,
     ScrapeTimeoutException,
@@ -33,8 +35,11 @@ async def test_scrape_profile_page_success(mock_get_authenticated_page):
     mock_post_locator.count.return_value = 1
 
     mock_page = AsyncMock()
+    mock_page.on = MagicMock() # page.on은 동기 메서드
     mock_page.locator = MagicMock(side_effect=[mock_not_found_locator, mock_post_locator])
-    mock_page.evaluate.side_effect = [1000, None, 1000] # 스크롤이 끝까지 내려간 것처럼 시뮬레이션
+    # 스크롤 후 새 게시물이 나타나지 않아 끝까지 내려간 것처럼 시뮬레이션
+    mock_page.evaluate.return_value = {'count': 1, 'height': 1000}
+    mock_page.wait_for_function.side_effect = [None, TimeoutError("no new posts"), TimeoutError("no new posts"), TimeoutError("no new posts")]
     mock_page.content.return_value = mock_html_content
 
     mock_get_authenticated_page.return_value.__aenter__.return_value = mock_page
@@ -60,6 +65,7 @@ async def test_scrape_profile_page_not_found(mock_get_authenticated_page):
 
     # Page 모의 객체 설정
     mock_page = AsyncMock()
+    mock_page.on = MagicMock() # page.on은 동기 메서드
     # page.locator는 동기 메서드이므로 MagicMock으로 덮어써서 Locator 모의 객체를 반환하게 함
     mock_page.locator = MagicMock(return_value=mock_not_found_locator)
     
@@ -77,6 +83,7 @@ async def test_scrape_profile_page_is_private(mock_get_authenticated_page):
     """
     # Page 모의 객체 설정
     mock_page = AsyncMock()
+    mock_page.on = MagicMock() # page.on은 동기 메서드
 
     # '계정 없음' 로케이터는 보이지 않음
     mock_not_found_locator = AsyncMock()
@@ -106,6 +113,7 @@ async def test_scrape_profile_page_timeout(mock_get_authenticated_page):
     def raise_timeout(*args, **kwargs):
         raise TimeoutError("Page load timed out")
     mock_page = AsyncMock()
+    mock_page.on = MagicMock() # page.on은 동기 메서드
     mock_page.goto.side_effect = raise_timeout
 
     # get_authenticated_page의 컨텍스트 매니저가 이 mock_page를 반환하도록 설정
@@ -115,4 +123,242 @@ async def test_scrape_profile_page_timeout(mock_get_authenticated_page):
     # ScrapeTimeoutException이 발생하는지 확인
     with pytest.raises(ScrapeTimeoutException, match="'timeout_user' 계정을 스크래핑하는 중 타임아웃이 발생했습니다."):
         await scrape_profile_page("timeout_user")
-    
\ No newline at end of file
+    
+@pytest.mark.asyncio
+@patch('src.scraper.get_authenticated_page')
+async def test_scrape_profile_stops_at_known_post(mock_get_authenticated_page):
+    """
+    알려진 게시물이 화면에 있으면 스크롤하지 않고 새 게시물만 수집하는지 테스트합니다.
+    """
+    mock_html_content = """
+    <html><body>
+        <a href="/test_user/p/NEW1/"><img src="https://scontent.cdn.instagram.com/new1.jpg"></a>
+        <a href="/test_user/p/OLD1/"><img src="https://scontent.cdn.instagram.com/old1.jpg"></a>
+    </body></html>
+    """
+    mock_not_found_locator = AsyncMock()
+    mock_not_found_locator.is_visible.return_value = False
+    mock_post_locator = AsyncMock()
+    mock_post_locator.count.return_value = 2
+
+    mock_page = AsyncMock()
+    mock_page.on = MagicMock() # page.on은 동기 메서드
+    mock_page.locator = MagicMock(side_effect=[mock_not_found_locator, mock_post_locator])
+    mock_page.evaluate.side_effect = [{'count': 2, 'height': 1000}, True] # 상태 조회 후 알려진 게시물 발견
+    mock_page.content.return_value = mock_html_content
+    mock_get_authenticated_page.return_value.__aenter__.return_value = mock_page
+
+    result = await scrape_profile("test_user", known_post_ids={"OLD1"}, extraction='html')
+
+    assert result.post_ids == ["NEW1", "OLD1"]
+    assert result.post_images["NEW1"] == ["https://scontent.cdn.instagram.com/new1.jpg"]
+    # scrollTo가 한 번도 호출되지 않아야 함
+    assert all("scrollTo" not in str(call.args[0]) for call in mock_page.evaluate.call_args_list)
+
+@pytest.mark.asyncio
+@patch('src.scraper.get_authenticated_page')
+async def test_scrape_profile_uses_network_harvest(mock_get_authenticated_page):
+    """
+    피드 JSON 응답에서 미디어를 수집한 경우 HTML 파싱을 하지 않는지 테스트합니다.
+    """
+    mock_not_found_locator = AsyncMock()
+    mock_not_found_locator.is_visible.return_value = False
+    mock_post_locator = AsyncMock()
+    mock_post_locator.count.return_value = 1
+
+    mock_page = AsyncMock()
+    mock_page.on = MagicMock() # page.on은 동기 메서드
+    mock_page.locator = MagicMock(side_effect=[mock_not_found_locator, mock_post_locator])
+    mock_page.evaluate.return_value = {'count': 1, 'height': 1000}
+    mock_page.wait_for_function.side_effect = [None, TimeoutError("no new posts"), TimeoutError("no new posts"), TimeoutError("no new posts")]
+    mock_get_authenticated_page.return_value.__aenter__.return_value = mock_page
+
+    async def fake_goto(*args, **kwargs):
+        # goto 중에 피드 응답이 도착한 것처럼 핸들러에 직접 데이터를 전달
+        harvester = mock_page.on.call_args.args[1].__self__
+        harvester.feed({'items': [{'code': 'C1', 'user': {'username': 'test_user'},
+                                   'image_versions2': {'candidates': [{'url': 'https://scontent/c1.jpg', 'width': 1080}]}}]})
+    mock_page.goto.side_effect = fake_goto
+
+    result = await scrape_profile("test_user")
+
+    assert result.post_ids == ["C1"]
+    assert result.image_urls == ["https://scontent/c1.jpg"]
+    mock_page.content.assert_not_called()
+
+@pytest.mark.asyncio
+@patch('src.scraper.get_authenticated_page')
+async def test_scrape_profile_dom_extraction_without_html_parse(mock_get_authenticated_page):
+    """
+    DOM 증분 추출 모드에서는 스크롤 단계마다 받은 변경분을 누적하고 page.content()를 호출하지 않는지 테스트합니다.
+    """
+    mock_not_found_locator = AsyncMock()
+    mock_not_found_locator.is_visible.return_value = False
+    mock_post_locator = AsyncMock()
+    mock_post_locator.count.return_value = 1
+
+    deltas = iter([
+        {'posts': [{'id': 'C2', 'images': [{'src': 'https://scontent/c2.jpg', 'srcset': ''}]}], 'images': []},
+        {'posts': [{'id': 'C1', 'images': [{'src': 'https://scontent/c1.jpg', 'srcset': ''}]}], 'images': []},
+    ])
+
+    async def fake_evaluate(script, arg=None):
+        if '__igExtracted' in script:
+            return next(deltas, {'posts': [], 'images': []})
+        return {'count': 1, 'height': 1000}
+
+    mock_page = AsyncMock()
+    mock_page.on = MagicMock() # page.on은 동기 메서드
+    mock_page.locator = MagicMock(side_effect=[mock_not_found_locator, mock_post_locator])
+    mock_page.evaluate.side_effect = fake_evaluate
+    mock_page.wait_for_function.side_effect = [None, None, TimeoutError("no new posts"), TimeoutError("no new posts"), TimeoutError("no new posts")]
+    mock_get_authenticated_page.return_value.__aenter__.return_value = mock_page
+
+    result = await scrape_profile("test_user", extraction='dom')
+
+    assert result.post_ids == ["C2", "C1"]
+    assert result.image_urls == ["https://scontent/c2.jpg", "https://scontent/c1.jpg"]
+    mock_page.content.assert_not_called()
+
+def _dom_page(deltas):
+    mock_not_found_locator = AsyncMock()
+    mock_not_found_locator.is_visible.return_value = False
+    mock_post_locator = AsyncMock()
+    mock_post_locator.count.return_value = 1
+    deltas = iter(deltas)
+
+    async def fake_evaluate(script, arg=None):
+        if '__igExtracted' in script:
+            return next(deltas, {'posts': [], 'images': []})
+        return {'count': 1, 'height': 1000}
+
+    mock_page = AsyncMock()
+    mock_page.on = MagicMock() # page.on은 동기 메서드
+    mock_page.locator = MagicMock(side_effect=[mock_not_found_locator, mock_post_locator])
+    mock_page.evaluate.side_effect = fake_evaluate
+    mock_page.wait_for_function.side_effect = [None, None, TimeoutError("no new posts"), TimeoutError("no new posts"), TimeoutError("no new posts")]
+    return mock_page
+
+def _feed_item(code, *urls):
+    if len(urls) == 1:
+        return {'code': code, 'user': {'username': 'test_user'},
+                'image_versions2': {'candidates': [{'url': urls[0], 'width': 1080}]}}
+    return {'code': code, 'user': {'username': 'test_user'}, 'carousel_media': [
+        {'image_versions2': {'candidates': [{'url': url, 'width': 1080}]}} for url in urls
+    ]}
+
+def _network_page(deltas, feed_items):
+    mock_page = _dom_page(deltas)
+
+    async def fake_goto(*args, **kwargs):
+        # goto 중에 피드 응답이 도착한 것처럼 핸들러에 직접 데이터를 전달
+        harvester = mock_page.on.call_args.args[1].__self__
+        harvester.feed({'items': feed_items})
+    mock_page.goto.side_effect = fake_goto
+    return mock_page
+
+@pytest.mark.asyncio
+@patch('src.scraper.get_authenticated_page')
+async def test_scrape_profile_network_mode_keeps_server_rendered_posts(mock_get_authenticated_page):
+    """
+    피드 응답에 없고 HTML로만 그려진 게시물(첫 화면)도 네트워크 수집 결과에 화면 순서대로 포함되는지 테스트합니다.
+    """
+    mock_get_authenticated_page.return_value.__aenter__.return_value = _network_page(
+        [{'posts': [
+            {'id': 'C4', 'images': [{'src': 'https://scontent/c4.jpg', 'srcset': ''}]},
+            {'id': 'C3', 'images': [{'src': 'https://scontent/c3_s640.jpg', 'srcset': ''}]},
+            {'id': 'C2', 'images': [{'src': 'https://scontent/c2_s640.jpg', 'srcset': ''}]},
+        ], 'images': []}],
+        [_feed_item('C2', 'https://scontent/c2.jpg'), _feed_item('C1', 'https://scontent/c1.jpg')],
+    )
+
+    result = await scrape_profile("test_user")
+
+    assert result.post_ids == ["C4", "C3", "C2", "C1"]
+    assert result.image_urls == [
+        "https://scontent/c4.jpg", "https://scontent/c3_s640.jpg", "https://scontent/c2.jpg", "https://scontent/c1.jpg",
+    ]
+
+@pytest.mark.asyncio
+@patch('src.scraper.get_authenticated_page')
+async def test_scrape_profile_reports_media_per_scroll_step(mock_get_authenticated_page):
+    """
+    on_media 콜백이 스크롤 단계마다 새로 발견한 이미지 URL만 한 번씩 받는지 테스트합니다.
+    """
+    mock_get_authenticated_page.return_value.__aenter__.return_value = _dom_page([
+        {'posts': [{'id': 'C3', 'images': [{'src': 'https://scontent/c3.jpg', 'srcset': ''}]}], 'images': []},
+        {'posts': [{'id': 'C2', 'images': [{'src': 'https://scontent/c2.jpg', 'srcset': ''}]}], 'images': []},
+        {'posts': [{'id': 'C1', 'images': [{'src': 'https://scontent/c1.jpg', 'srcset': ''}]}], 'images': []},
+    ])
+    batches = []
+
+    async def on_media(urls):
+        batches.append(urls)
+
+    await scrape_profile("test_user", extraction='dom', on_media=on_media)
+
+    assert batches == [["https://scontent/c3.jpg"], ["https://scontent/c2.jpg"], ["https://scontent/c1.jpg"]]
+
+@pytest.mark.asyncio
+@patch('src.scraper.get_authenticated_page')
+async def test_scrape_profile_emits_carousel_slides_after_dom_emitted_post(mock_get_authenticated_page):
+    """
+    DOM 추출로 먼저 보낸 게시물이라도, 나중에 피드 응답에서 나온 같은 게시물의 나머지 캐러셀 사진은 보내는지 테스트합니다.
+    """
+    mock_page = _dom_page([
+        {'posts': [{'id': 'C2', 'images': [{'src': 'https://scontent/c2a.jpg', 'srcset': ''}]}], 'images': []},
+        {'posts': [], 'images': []},
+    ])
+    dom_evaluate = mock_page.evaluate.side_effect
+    collects = 0
+
+    async def fake_evaluate(script, arg=None):
+        nonlocal collects
+        if '__igExtracted' in script:
+            collects += 1
+            if collects == 2:
+                # DOM 결과를 보낸 다음 단계에서야 피드 응답이 도착
+                harvester = mock_page.on.call_args.args[1].__self__
+                harvester.feed({'items': [_feed_item('C2', 'https://scontent/c2a.jpg', 'https://scontent/c2b.jpg')]})
+        return await dom_evaluate(script, arg)
+    mock_page.evaluate.side_effect = fake_evaluate
+    mock_get_authenticated_page.return_value.__aenter__.return_value = mock_page
+    batches = []
+
+    async def on_media(urls):
+        batches.append(urls)
+
+    result = await scrape_profile("test_user", on_media=on_media)
+
+    assert batches == [["https://scontent/c2a.jpg"], ["https://scontent/c2b.jpg"]]
+    assert result.image_urls == ["https://scontent/c2a.jpg", "https://scontent/c2b.jpg"]
+
+@pytest.mark.asyncio
+@patch('src.scraper.get_authenticated_page')
+async def test_iter_profile_image_urls_streams_urls_and_result(mock_get_authenticated_page):
+    """
+    파이프라인 제너레이터가 발견 순서대로 URL을 내보내고 최종 결과를 on_result로 넘기는지 테스트합니다.
+    """
+    mock_get_authenticated_page.return_value.__aenter__.return_value = _dom_page([
+        {'posts': [{'id': 'C2', 'images': [{'src': 'https://scontent/c2.jpg', 'srcset': ''}]}], 'images': []},
+        {'posts': [{'id': 'C1', 'images': [{'src': 'https://scontent/c1.jpg', 'srcset': ''}]}], 'images': []},
+    ])
+    results = []
+
+    urls = [url async for url in iter_profile_image_urls("test_user", queue_size=1, on_result=results.append, extraction='dom')]
+
+    assert urls == ["https://scontent/c2.jpg", "https://scontent/c1.jpg"]
+    assert results[0].post_ids == ["C2", "C1"]
+
+@pytest.mark.asyncio
+@patch('src.scraper.get_authenticated_page')
+async def test_iter_profile_image_urls_propagates_scrape_errors(mock_get_authenticated_page):
+    mock_not_found_locator = AsyncMock()
+    mock_not_found_locator.is_visible.return_value = True
+    mock_page = AsyncMock()
+    mock_page.on = MagicMock()
+    mock_page.locator = MagicMock(return_value=mock_not_found_locator)
+    mock_get_authenticated_page.return_value.__aenter__.return_value = mock_page
+
+    with pytest.raises(ProfileNotFoundException):
+        [url async for url in iter_profile_image_urls("ghost")]
@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import AsyncMock
+from playwright.async_api import TimeoutError
+
+from src.scroll_engine import ScrollEngine
+
+class FakeFeedPage:
+    """
+    무한 스크롤 피드를 흉내 내는 가짜 페이지. 스크롤할 때마다 `batch`개의 게시물이 로드되며,
+    `total`개를 모두 로드하면 더 이상 새 게시물이 나타나지 않습니다.
+    """
+
+    def __init__(self, total, batch=12):
+        self.total = total
+        self.batch = batch
+        self.loaded = min(batch, total)
+        self.scrolls = 0
+        self.wait_for_function = AsyncMock(side_effect=self._wait_for_progress)
+
+    async def evaluate(self, script, arg=None):
+        if 'scrollTo' in script:
+            self.scrolls += 1
+            return None
+        if 'known.includes' in script:
+            return False
+        if 'scrollBy' in script:
+            return None
+        return {'count': self.loaded, 'height': self.loaded * 100}
+
+    async def _wait_for_progress(self, script, arg=None, polling=None, timeout=None):
+        if self.loaded >= self.total:
+            raise TimeoutError("no progress")
+        self.loaded = min(self.loaded + self.batch, self.total)
+
+@pytest.mark.asyncio
+async def test_scroll_engine_scrolls_until_end_of_feed():
+    """
+    새 게시물이 더 이상 나타나지 않을 때까지 스크롤하고, 정체 재시도 후 종료하는지 테스트합니다.
+    """
+    page = FakeFeedPage(total=50)
+    stats = await ScrollEngine(stall_retries=2).run(page)
+
+    assert stats.posts_seen == 50
+    assert stats.stop_reason == 'end_of_feed'
+    assert stats.stalls == 3
+    # 12개씩 로드: 12 → 24 → 36 → 48 → 50 (4회) + 정체 3회
+    assert stats.steps == 7
+
+@pytest.mark.asyncio
+async def test_scroll_engine_respects_max_posts():
+    """
+    max_posts 예산에 도달하면 스크롤을 멈추는지 테스트합니다.
+    """
+    page = FakeFeedPage(total=1000)
+    stats = await ScrollEngine(max_posts=30).run(page)
+
+    assert stats.stop_reason == 'max_posts'
+    assert 30 <= stats.posts_seen < 1000
+
+@pytest.mark.asyncio
+async def test_scroll_engine_respects_max_duration():
+    """
+    max_duration 예산이 0이면 스크롤 없이 즉시 종료하는지 테스트합니다.
+    """
+    page = FakeFeedPage(total=1000)
+    stats = await ScrollEngine(max_duration=0).run(page)
+
+    assert stats.stop_reason == 'max_duration'
+    assert page.scrolls == 0
+
+@pytest.mark.asyncio
+async def test_scroll_engine_increases_timeout_on_stall():
+    """
+    정체가 발생하면 다음 대기 시간을 두 배로 늘리는지 테스트합니다.
+    """
+    page = FakeFeedPage(total=12)
+    await ScrollEngine(initial_timeout=1.0, max_timeout=10.0, stall_retries=2).run(page)
+
+    timeouts = [call.kwargs['timeout'] for call in page.wait_for_function.call_args_list]
+    assert timeouts == [1000.0, 2000.0, 4000.0]
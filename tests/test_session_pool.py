@@ -0,0 +1,115 @@
+import json
+import asyncio
+import pytest
+
+from src.session_pool import (
+    NoSessionAvailableException,
+    RateLimitedException,
+    SessionPool,
+    TokenBucket,
+)
+
+def _cookie_files(tmp_path, *names):
+    paths = []
+    for name in names:
+        path = tmp_path / f"{name}.json"
+        path.write_text('{"cookies": [], "origins": []}')
+        paths.append(str(path))
+    return paths
+
+def test_token_bucket_refills_over_time():
+    """
+    토큰 버킷이 burst만큼 쓴 뒤에는 비고, rate에 따라 다시 채워지는지 테스트합니다.
+    """
+    bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+
+    assert bucket.take(now=0.0)
+    assert bucket.take(now=0.0)
+    assert not bucket.take(now=0.0)
+    assert bucket.wait_time(now=0.0) == pytest.approx(0.5)
+    assert bucket.take(now=0.5)
+    assert bucket.tokens(now=100.0) == 2
+
+@pytest.mark.asyncio
+async def test_acquire_picks_least_loaded_session(tmp_path):
+    """
+    사용 중인 페이지가 가장 적은 세션이 먼저 배정되는지 테스트합니다.
+    """
+    pool = SessionPool(_cookie_files(tmp_path, "a", "b"))
+
+    first = await pool.acquire()
+    second = await pool.acquire()
+    assert {first.name, second.name} == {"a", "b"}
+
+    await pool.release(first)
+    third = await pool.acquire()
+    assert third is first
+    assert pool.stats()['in_use'] == {"a": 1, "b": 1}
+
+@pytest.mark.asyncio
+async def test_blocked_session_cools_down(tmp_path):
+    """
+    요청 제한 예외로 끝난 세션은 쿨다운 동안 배정되지 않는지 테스트합니다.
+    """
+    pool = SessionPool(_cookie_files(tmp_path, "a", "b"), cooldown=60)
+
+    with pytest.raises(RateLimitedException):
+        async with pool.session() as session:
+            blocked = session.name
+            raise RateLimitedException("429")
+
+    for _ in range(3):
+        async with pool.session() as session:
+            assert session.name != blocked
+    stats = pool.stats()
+    assert stats['available'] == 1
+    assert stats['blocked'][blocked] == 1
+    assert stats['cooldown_seconds'][blocked] > 0
+
+@pytest.mark.asyncio
+async def test_rate_limit_waits_then_gives_up(tmp_path):
+    """
+    토큰이 없으면 채워질 때까지 기다리고, max_wait 안에 채워지지 않으면 예외를 내는지 테스트합니다.
+    """
+    pool = SessionPool(_cookie_files(tmp_path, "a"), rate_per_minute=600, burst=1, max_wait=1.0)
+    await pool.release(await pool.acquire())
+
+    # 0.1초 뒤 토큰이 채워짐
+    session = await pool.acquire()
+    await pool.release(session)
+    assert pool.stats()['waits'] == 1
+
+    slow = SessionPool(_cookie_files(tmp_path, "b"), rate_per_minute=1, burst=1, max_wait=0.1)
+    await slow.release(await slow.acquire())
+    with pytest.raises(NoSessionAvailableException):
+        await slow.acquire()
+
+@pytest.mark.asyncio
+async def test_max_concurrent_waits_for_release(tmp_path):
+    """
+    세션당 동시 사용 수 제한에 걸리면 다른 페이지가 반납될 때까지 기다리는지 테스트합니다.
+    """
+    pool = SessionPool(_cookie_files(tmp_path, "a"), max_concurrent=1)
+    first = await pool.acquire()
+    waiter = asyncio.ensure_future(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    await pool.release(first)
+    assert await asyncio.wait_for(waiter, 1) is first
+
+@pytest.mark.asyncio
+async def test_save_storage_state_writes_atomically(tmp_path):
+    """
+    갱신된 쿠키가 원래 파일에 쓰이고 임시 파일이 남지 않는지 테스트합니다.
+    """
+    pool = SessionPool(_cookie_files(tmp_path, "a"), save_interval=0)
+    session = pool.sessions[0]
+    assert pool.save_due(session)
+
+    await pool.save_storage_state(session, {"cookies": [{"name": "sessionid", "value": "new"}], "origins": []})
+
+    with open(session.storage_state_path) as f:
+        assert json.load(f)["cookies"][0]["value"] == "new"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.json"]
+    assert pool.stats()['saves'] == 1
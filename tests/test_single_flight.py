@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+
+from src.single_flight import SharedStream, SingleFlight, StreamFlight
+
+@pytest.mark.asyncio
+async def test_single_flight_runs_concurrent_calls_once():
+    """
+    같은 키로 동시에 들어온 호출이 한 번만 실행되고 결과를 함께 받는지 테스트합니다.
+    """
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("user", work) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 4}
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_errors_and_forgets_key():
+    """
+    실패한 호출의 예외는 합류한 호출에도 전달되고, 이후 호출은 새로 실행되는지 테스트합니다.
+    """
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(flight.do("user", fail), flight.do("user", fail), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def succeed():
+        return "ok"
+
+    assert await flight.do("user", succeed) == "ok"
+    assert flight.leaders == 2
+
+@pytest.mark.asyncio
+async def test_single_flight_leader_cancellation_does_not_affect_followers():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    leader = asyncio.ensure_future(flight.do("user", work))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("user", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "result"
+
+async def _images(items, started=None, delay=0.01):
+    if started is not None:
+        started.append(True)
+    for item in items:
+        await asyncio.sleep(delay)
+        yield item
+
+async def _collect(stream):
+    return [item async for item in stream]
+
+@pytest.mark.asyncio
+async def test_stream_flight_shares_stream_joined_before_first_item():
+    """
+    첫 이미지가 나오기 전에 합류한 요청은 같은 스트림에서 모든 이미지를 받고, 원본은 한 번만 읽히는지 테스트합니다.
+    """
+    flight = StreamFlight()
+    started = []
+    items = [("img1.jpg", b"1"), ("img2.jpg", b"2"), ("img3.jpg", b"3")]
+
+    first = flight.subscribe("user", lambda: _images(items, started))
+    second = flight.subscribe("user", lambda: _images(items, started))
+
+    assert await asyncio.gather(_collect(first), _collect(second)) == [items, items]
+    assert started == [True]
+    assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 1}
+
+@pytest.mark.asyncio
+async def test_stream_flight_late_subscriber_starts_own_stream():
+    """
+    이미지가 나온 뒤에 들어온 요청은 다시 보내 줄 수 없으므로 새 스트림을 시작하는지 테스트합니다.
+    """
+    flight = StreamFlight()
+    started = []
+    items = [("img1.jpg", b"1"), ("img2.jpg", b"2"), ("img3.jpg", b"3")]
+
+    first = flight.subscribe("user", lambda: _images(items, started))
+    assert await first.__anext__() == items[0]
+    second = flight.subscribe("user", lambda: _images(items, started))
+
+    assert await _collect(second) == items
+    assert await _collect(first) == items[1:]
+    assert started == [True, True]
+    assert flight.stats() == {'in_flight': 0, 'leaders': 2, 'coalesced': 0}
+
+@pytest.mark.asyncio
+async def test_shared_stream_releases_consumed_items_and_bounds_buffer():
+    """
+    모든 소비자가 받아 간 항목은 바로 반납하고, 느린 소비자가 있으면 원본 읽기를 멈추는지 테스트합니다.
+    """
+    released = []
+    items = [(f"img{i}.jpg", bytes([i])) for i in range(10)]
+    stream = SharedStream(_images(items, delay=0), release=released.append, max_buffered=2)
+    fast, slow = stream.subscribe(), stream.subscribe()
+
+    assert [await fast.__anext__(), await fast.__anext__()] == items[:2]
+    pending = asyncio.ensure_future(fast.__anext__())
+    await asyncio.sleep(0.02)
+    # 느린 소비자가 아무것도 받지 않았으므로 원본은 버퍼 한도까지만 읽고, 빠른 소비자도 기다림
+    assert not pending.done()
+    assert stream.buffered == 2 and released == []
+
+    assert await slow.__anext__() == items[0]
+    assert await slow.__anext__() == items[1]
+    # 두 소비자 모두 첫 항목 처리를 끝냄(다음 항목을 요청함)
+    assert released == [items[0]]
+    assert await pending == items[2]
+
+    rest = await asyncio.gather(_collect(fast), _collect(slow))
+    assert rest == [items[3:], items[2:]]
+    assert released == items
+
+@pytest.mark.asyncio
+async def test_stream_flight_cancels_source_when_all_subscribers_leave():
+    flight = StreamFlight()
+    items = [("img1.jpg", b"1"), ("img2.jpg", b"2")]
+
+    stream = flight.subscribe("user", lambda: _images(items))
+    assert await stream.__anext__() == items[0]
+    await stream.aclose()
+
+    # 취소된 스트림에는 합류하지 않고 새로 시작
+    assert await _collect(flight.subscribe("user", lambda: _images(items))) == items
+    assert flight.leaders == 2
@@ -0,0 +1,76 @@
+import gc
+from src.spool import MemoryBudget, SpooledImage
+from src.zip_stream import ZipStreamWriter
+
+def test_memory_budget_reserves_against_parent():
+    """
+    요청 한도와 프로세스 전체 한도를 모두 만족할 때만 예약되는지 테스트합니다.
+    """
+    process = MemoryBudget(10)
+    first = MemoryBudget(8, parent=process)
+    second = MemoryBudget(8, parent=process)
+
+    assert first.try_reserve(6)
+    assert not first.try_reserve(3)   # 요청 한도 초과
+    assert not second.try_reserve(5)  # 프로세스 한도 초과
+    assert second.try_reserve(4)
+    assert process.stats()['in_use'] == 10
+
+    first.release(6)
+    assert process.stats()['in_use'] == 4
+    assert process.stats()['peak'] == 10
+
+def test_spooled_image_stays_in_memory_within_budget():
+    budget = MemoryBudget(100)
+    image = SpooledImage(budget)
+    image.write(b'abc')
+    image.write(b'def')
+
+    assert not image.spilled
+    assert len(image) == 6
+    assert image.read() == b'abcdef'
+    assert budget.in_use == 6
+
+    image.close()
+    assert budget.in_use == 0
+
+def test_spooled_image_spills_to_disk_over_budget(tmp_path):
+    """
+    한도를 넘으면 받아 둔 조각까지 디스크로 옮기고 메모리 예약을 반납하며, 여러 번 처음부터 읽을 수 있는지 테스트합니다.
+    """
+    process = MemoryBudget(1024)
+    budget = MemoryBudget(8, parent=process)
+    image = SpooledImage(budget, spool_dir=str(tmp_path))
+    image.write(b'12345')
+    image.write(b'67890')
+    image.write(b'abc')
+
+    assert image.spilled
+    assert budget.in_use == 0
+    assert process.stats()['spills'] == 1
+    assert list(image.chunks(chunk_size=4)) == [b'1234', b'5678', b'90ab', b'c']
+    assert image.read() == b'1234567890abc'
+    image.close()
+
+def test_spooled_image_released_when_garbage_collected():
+    budget = MemoryBudget(100)
+    image = SpooledImage(budget)
+    image.write(b'data')
+    assert budget.in_use == 4
+
+    del image
+    gc.collect()
+    assert budget.in_use == 0
+
+def test_zip_writer_reads_spooled_image():
+    """
+    SpooledImage를 그대로 넘기면 크기를 size_hint로 사용해 ZIP64 없이 기록하는지 테스트합니다.
+    """
+    image = SpooledImage(MemoryBudget(4))
+    image.write(b'x' * 10)
+    writer = ZipStreamWriter()
+
+    archive = b''.join(writer.add('a.jpg', image)) + b''.join(writer.finish())
+
+    assert b'x' * 10 in archive
+    assert writer._entries[0].zip64 is False
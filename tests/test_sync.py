@@ -0,0 +1,135 @@
+import json
+import pytest
+
+from src.scraper import ProfileNotFoundException, ProfileScrapeResult
+from src.sync import ProfileSyncer, SYNC_MANIFEST_NAME, format_summary, read_usernames
+
+class FakeDownloader:
+    """iter_images만 흉내 내는 다운로더. URL마다 파일명으로 된 이미지를 돌려주고 받은 URL을 기록합니다."""
+
+    def __init__(self):
+        self.fetched = []
+
+    async def iter_images(self, urls, result=None, names=None):
+        for url in urls:
+            self.fetched.append(url)
+            data = url.rsplit('/', 1)[-1].encode()
+            result.succeeded += 1
+            result.bytes_downloaded += len(data)
+            yield names.assign(url), data
+
+class FakeProfile:
+    """최신 게시물이 앞에 오는 계정. 알고 있는 게시물이 나오면 거기서 멈추는 증분 스크래핑을 흉내 냅니다."""
+
+    def __init__(self, post_ids):
+        self.post_ids = list(post_ids)
+        self.calls = []
+
+    async def scrape(self, username, known_post_ids=None):
+        if username == 'missing':
+            raise ProfileNotFoundException(f"'{username}' 계정을 찾을 수 없습니다.")
+        self.calls.append(known_post_ids)
+        post_ids = []
+        for post_id in self.post_ids:
+            post_ids.append(post_id)
+            if known_post_ids and post_id in known_post_ids:
+                break
+        post_images = {post_id: [f"https://scontent/v/{post_id}.jpg?oh=sig"] for post_id in post_ids}
+        return ProfileScrapeResult(username, post_ids, [url for urls in post_images.values() for url in urls], post_images)
+
+@pytest.mark.asyncio
+async def test_sync_writes_files_and_skips_them_on_rerun(tmp_path):
+    """
+    처음에는 전체 스크래핑으로 모든 사진을 받고, 다시 실행하면 증분 스크래핑만 하고 아무것도 받지 않는지 테스트합니다.
+    """
+    profile = FakeProfile(["C2", "C1"])
+    downloader = FakeDownloader()
+    syncer = ProfileSyncer(profile.scrape, downloader, str(tmp_path))
+
+    first = await syncer.sync("Test_User")
+    assert first.status == 'ok' and first.scrape_mode == 'full'
+    assert (tmp_path / "test_user" / "C1.jpg").read_bytes() == b"C1.jpg?oh=sig"
+    assert len(downloader.fetched) == 2
+
+    second = await syncer.sync("test_user")
+    assert second.scrape_mode == 'incremental'
+    assert profile.calls[-1] == {"C1", "C2"}
+    assert second.skipped == 1
+    assert len(downloader.fetched) == 2
+
+    # 새 게시물만 받음
+    profile.post_ids.insert(0, "C3")
+    third = await syncer.sync("test_user")
+    assert third.download.succeeded == 1
+    assert downloader.fetched[-1] == "https://scontent/v/C3.jpg?oh=sig"
+    manifest = json.loads((tmp_path / "test_user" / SYNC_MANIFEST_NAME).read_text())
+    assert manifest['post_ids'] == ["C3", "C2", "C1"]
+    assert manifest['complete'] is True
+
+@pytest.mark.asyncio
+async def test_sync_redownloads_missing_files_with_full_scrape(tmp_path):
+    """
+    기록된 파일이 지워졌으면 전체 스크래핑을 하고 그 파일만 다시 받는지 테스트합니다.
+    """
+    profile = FakeProfile(["C2", "C1"])
+    downloader = FakeDownloader()
+    syncer = ProfileSyncer(profile.scrape, downloader, str(tmp_path))
+    await syncer.sync("test_user")
+    (tmp_path / "test_user" / "C1.jpg").unlink()
+
+    account = await syncer.sync("test_user")
+
+    assert account.scrape_mode == 'full'
+    assert account.skipped == 1
+    assert downloader.fetched[-1] == "https://scontent/v/C1.jpg?oh=sig"
+    assert (tmp_path / "test_user" / "C1.jpg").exists()
+
+@pytest.mark.asyncio
+async def test_sync_all_reports_errors_per_account(tmp_path):
+    """
+    한 계정의 오류가 다른 계정의 동기화를 막지 않고 결과 요약에 기록되는지 테스트합니다.
+    """
+    syncer = ProfileSyncer(FakeProfile(["C1"]).scrape, FakeDownloader(), str(tmp_path))
+
+    results = await syncer.sync_all(["alice", "missing"], parallelism=2)
+
+    assert [account.status for account in results] == ['ok', 'error']
+    summary = format_summary(results, elapsed=2.0)
+    assert "missing: 실패 - 'missing' 계정을 찾을 수 없습니다." in summary
+    assert summary[-2].startswith("계정 2개(성공 1개, 실패 1개), 새 사진 1개")
+
+@pytest.mark.asyncio
+async def test_sync_saves_manifest_when_interrupted(tmp_path):
+    """
+    다운로드 도중 실패해도 그때까지 받은 사진이 기록되어, 다음 실행은 나머지 사진만 받는지 테스트합니다.
+    """
+    class FailingDownloader(FakeDownloader):
+        async def iter_images(self, urls, result=None, names=None):
+            async for item in super().iter_images(urls, result, names):
+                yield item
+                if len(self.fetched) == 3:
+                    raise RuntimeError("connection reset")
+
+    profile = FakeProfile(["C5", "C4", "C3", "C2", "C1"])
+    failing = FailingDownloader()
+    account = await ProfileSyncer(profile.scrape, failing, str(tmp_path), save_every=2).sync("test_user")
+
+    assert account.status == 'error'
+    manifest = json.loads((tmp_path / "test_user" / SYNC_MANIFEST_NAME).read_text())
+    assert len(manifest['files']) == 3
+    assert manifest['complete'] is False
+
+    downloader = FakeDownloader()
+    retry = await ProfileSyncer(profile.scrape, downloader, str(tmp_path)).sync("test_user")
+    assert retry.scrape_mode == 'full'
+    assert retry.skipped == 3
+    assert sorted(downloader.fetched) == ["https://scontent/v/C1.jpg?oh=sig", "https://scontent/v/C2.jpg?oh=sig"]
+
+def test_read_usernames_skips_comments_duplicates_and_invalid(tmp_path):
+    """
+    계정 목록 파일에서 주석, 빈 줄, 중복, 잘못된 계정명을 걸러내는지 테스트합니다.
+    """
+    path = tmp_path / "usernames.txt"
+    path.write_text("# nightly\nalice\n@Alice\n\nbob  # friend\n../etc\n")
+
+    assert read_usernames(str(path)) == ["alice", "bob"]
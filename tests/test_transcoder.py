@@ -0,0 +1,101 @@
+import io
+import pytest
+
+from src.image_cache import ImageCache
+from src.transcoder import ImageTranscoder, TranscodePreset, transcode_image
+
+def _jpeg(size=(2000, 1500), exif=True):
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.new('RGB', size, (200, 120, 40))
+    output = io.BytesIO()
+    options = {'quality': 100}
+    if exif:
+        metadata = Image.Exif()
+        metadata[0x010F] = "TestCamera"  # Make
+        options['exif'] = metadata.tobytes()
+    image.save(output, 'JPEG', **options)
+    return output.getvalue()
+
+@pytest.mark.parametrize("value, key", [
+    ("mobile", "webp-1080-q75-strip"),
+    ("small", "jpeg-640-q70-strip"),
+    ("webp:1080:60", "webp-1080-q60-strip"),
+    ("jpeg::85", "jpeg-full-q85-strip"),
+    ("webp", "webp-full-q80-strip"),
+])
+def test_transcode_preset_parse(value, key):
+    assert TranscodePreset.parse(value).key == key
+
+def test_transcode_preset_rejects_invalid_values():
+    for value in ("gif", "webp:0", "jpeg:100:101", "webp:1:2:3"):
+        with pytest.raises(ValueError):
+            TranscodePreset.parse(value)
+
+def test_transcode_preset_rename_and_metadata_option():
+    preset = TranscodePreset.parse("webp:1080", strip_metadata=False)
+
+    assert preset.rename("12345_n.jpg") == "12345_n.webp"
+    assert preset.key == "webp-1080-q80-meta"
+
+def test_transcode_image_resizes_and_strips_metadata():
+    """
+    긴 변을 최대 크기로 줄이고, 형식을 바꾸며, EXIF를 지우는지 테스트합니다.
+    """
+    Image = pytest.importorskip("PIL.Image")
+    source = _jpeg()
+
+    output = transcode_image(source, TranscodePreset.parse("webp:1080:75"))
+
+    with Image.open(io.BytesIO(output)) as image:
+        assert image.format == 'WEBP'
+        assert image.size == (1080, 810)
+        assert 'exif' not in image.info
+    assert len(output) < len(source)
+
+@pytest.mark.asyncio
+async def test_transcoder_caches_results_by_source_and_preset(tmp_path):
+    """
+    같은 원본과 설정의 변환 결과는 캐시에서 가져오고, 변환할 수 없는 이미지는 원본을 그대로 쓰는지 테스트합니다.
+    """
+    pytest.importorskip("PIL")
+    transcoder = ImageTranscoder(TranscodePreset.parse("small"), workers=1, cache=ImageCache(str(tmp_path)))
+    source = _jpeg()
+    try:
+        first = await transcoder.transcode("1.png", source)
+        second = await transcoder.transcode("1.png", source)
+        broken = await transcoder.transcode("3.jpg", b'not an image')
+    finally:
+        transcoder.close()
+
+    assert first[0] == "1.jpg" and first == second
+    assert broken == ("3.jpg", b'not an image')
+    stats = transcoder.stats()
+    assert stats['cache_hits'] == 1
+    assert stats['failures'] == 1
+    assert stats['saved_ratio'] > 0
+
+@pytest.mark.asyncio
+async def test_transcoder_recreates_broken_pool(tmp_path):
+    """
+    작업 프로세스가 죽어 풀이 깨지면 새 풀을 만들어 다시 시도하고, 이후 변환도 계속되는지 테스트합니다.
+    """
+    pytest.importorskip("PIL")
+    transcoder = ImageTranscoder(TranscodePreset.parse("small"), workers=1)
+    source = _jpeg()
+    try:
+        first = await transcoder.transcode("1.jpg", source)
+        broken_pool = transcoder._executor
+        for process in list(broken_pool._processes.values()):
+            process.kill()
+            process.join()
+        second = await transcoder.transcode("2.jpg", source)
+        third = await transcoder.transcode("3.jpg", source)
+    finally:
+        transcoder.close()
+
+    assert transcoder._executor is None
+    assert second[1] == third[1] == first[1]
+    stats = transcoder.stats()
+    assert stats['pool_restarts'] == 1
+    assert stats['failures'] == 0
+    assert stats['transcoded'] == 3
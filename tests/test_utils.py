@@ -3,10 +3,10 @@ import zipfile
 import io
 from unittest.mock import patch, MagicMock, AsyncMock
 
-from src.utils import download_images_as_bytes, create_zip_in_memory
+from src.utils import download_images_as_bytes, iter_images_as_bytes, create_zip_in_memory, stream_zip
 
 @pytest.mark.asyncio
-@patch('src.utils.aiohttp.ClientSession')
+@patch('src.downloader.aiohttp.ClientSession')
 async def test_download_images_as_bytes_success(mock_ClientSession):
 
     """
@@ -39,7 +39,7 @@ async def test_download_images_as_bytes_success(mock_ClientSession):
     assert data == fake_image_bytes
 
 @pytest.mark.asyncio
-@patch('src.utils.aiohttp.ClientSession')
+@patch('src.downloader.aiohttp.ClientSession')
 async def test_download_images_as_bytes_error(mock_ClientSession):
     """
     이미지 다운로드 시 서버가 404 오류를 반환하는 경우를 테스트합니다.
@@ -97,4 +97,102 @@ def test_create_zip_in_memory_with_empty_list():
     # 생성된 ZIP 파일이 유효한지, 그리고 비어있는지 확인
     zip_buffer = io.BytesIO(zip_bytes)
     with zipfile.ZipFile(zip_buffer, 'r') as zip_file:
-        assert zip_file.namelist() == []
\ No newline at end of file
+        assert zip_file.namelist() == []
+
+@pytest.mark.asyncio
+@patch('src.downloader.aiohttp.ClientSession')
+async def test_iter_images_as_bytes_yields_downloaded_images(mock_ClientSession):
+    """
+    비동기 제너레이터가 다운로드에 성공한 이미지만 내보내는지 테스트합니다.
+    """
+    mock_session_instance = mock_ClientSession.return_value
+    mock_session_instance.__aenter__.return_value = mock_session_instance
+
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.read.return_value = b'fake_image_data'
+    mock_session_instance.get.return_value.__aenter__.return_value = mock_response
+
+    results = [item async for item in iter_images_as_bytes(["http://fake.com/image1.jpg"])]
+
+    assert results == [("image1.jpg", b'fake_image_data')]
+
+def test_stream_zip_success():
+    """
+    스트리밍 ZIP 제너레이터가 유효한 ZIP 파일을 만드는지 테스트합니다.
+    """
+    image_data = [
+        ("image1.jpg", b"dummy_data_1"),
+        ("image2.png", b"dummy_data_2"),
+    ]
+
+    zip_bytes = b"".join(stream_zip(iter(image_data)))
+
+    with zipfile.ZipFile(io.BytesIO(zip_bytes), 'r') as zip_file:
+        assert set(zip_file.namelist()) == {"image1.jpg", "image2.png"}
+        assert zip_file.read("image2.png") == b"dummy_data_2"
+
+@pytest.mark.asyncio
+async def test_astream_zip_releases_spools_after_each_entry(tmp_path):
+    """
+    ZIP 항목을 다 쓴 스풀은 바로 반납하고, 공유 이미지(close_images=False)는 그대로 두는지 테스트합니다.
+    """
+    from src.spool import MemoryBudget, SpooledImage
+    from src.utils import astream_zip
+    budget = MemoryBudget(1024)
+
+    def spooled(data):
+        image = SpooledImage(budget, str(tmp_path))
+        image.write(data)
+        return image
+
+    images = [("image1.jpg", spooled(b"1" * 100)), ("image2.jpg", spooled(b"2" * 100))]
+
+    async def source():
+        for image in images:
+            yield image
+
+    chunks = astream_zip(source())
+    await chunks.__anext__()
+    # 첫 이미지의 ZIP 조각을 다 내보내기 전이므로 아직 반납하지 않음
+    assert budget.in_use == 200
+    zip_bytes = b"".join([chunk async for chunk in chunks])
+    assert budget.in_use == 0
+    assert zip_bytes
+
+    shared = [("image3.jpg", spooled(b"3" * 100))]
+
+    async def shared_source():
+        for image in shared:
+            yield image
+
+    assert [chunk async for chunk in astream_zip(shared_source(), close_images=False)]
+    assert budget.in_use == 100
+
+@pytest.mark.asyncio
+async def test_astream_zip_reads_spools_off_the_event_loop(tmp_path):
+    """
+    디스크에 스풀된 이미지 읽기와 CRC/압축이 이벤트 루프 스레드가 아닌 스레드에서 실행되는지 테스트합니다.
+    """
+    import threading
+    from src.spool import MemoryBudget, SpooledImage
+    from src.utils import astream_zip
+    image = SpooledImage(MemoryBudget(10), str(tmp_path))
+    image.write(b"x" * 300000)
+    read_threads = set()
+    original_chunks = SpooledImage.chunks
+
+    def chunks(self, *args, **kwargs):
+        for chunk in original_chunks(self, *args, **kwargs):
+            read_threads.add(threading.current_thread())
+            yield chunk
+
+    async def source():
+        yield "big.jpg", image
+
+    with patch.object(SpooledImage, 'chunks', chunks):
+        zip_bytes = b"".join([chunk async for chunk in astream_zip(source())])
+
+    assert read_threads and threading.current_thread() not in read_threads
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zip_file:
+        assert zip_file.read("big.jpg") == b"x" * 300000
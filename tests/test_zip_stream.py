@@ -0,0 +1,89 @@
+import io
+import zipfile
+import pytest
+
+from src.zip_stream import ZipStreamWriter, ZIP_STORED, ZIP_DEFLATED, choose_compression
+
+def _build(entries, writer=None):
+    writer = writer or ZipStreamWriter()
+    chunks = []
+    for entry in entries:
+        chunks.extend(writer.add(*entry))
+    chunks.extend(writer.finish())
+    return b''.join(chunks)
+
+def test_zip_stream_writer_creates_readable_archive():
+    """
+    스트리밍으로 만든 ZIP을 표준 zipfile 모듈로 읽을 수 있는지 테스트합니다.
+    """
+    archive = _build([
+        ("image1.jpg", b"\xff\xd8jpegdata" * 100),
+        ("notes.txt", b"hello world " * 100),
+    ])
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.read("image1.jpg") == b"\xff\xd8jpegdata" * 100
+        assert zip_file.read("notes.txt") == b"hello world " * 100
+        assert zip_file.getinfo("image1.jpg").compress_type == zipfile.ZIP_STORED
+        assert zip_file.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+def test_zip_stream_writer_accepts_chunk_iterables():
+    """
+    크기를 모르는 조각 이터러블도 데이터 디스크립터(ZIP64)로 올바르게 기록되는지 테스트합니다.
+    """
+    chunks = [b"a" * 1000, b"", b"b" * 1000]
+    archive = _build([("video.mp4", iter(chunks))])
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+        assert zip_file.read("video.mp4") == b"".join(chunks)
+
+def test_zip_stream_writer_emits_entries_incrementally():
+    """
+    엔트리를 추가하는 즉시 해당 엔트리의 데이터가 출력되는지(아카이브 전체를 모으지 않는지) 테스트합니다.
+    """
+    writer = ZipStreamWriter()
+    first = b''.join(writer.add("image1.jpg", b"x" * 5000))
+    assert b"x" * 5000 in first
+    assert writer.bytes_written == len(first)
+
+def test_zip_stream_writer_uses_zip64_records_when_limits_exceeded(monkeypatch):
+    """
+    크기/오프셋이 한계를 넘으면 ZIP64 레코드를 사용하는지 테스트합니다. (한계를 인위적으로 낮춰 검증)
+    """
+    monkeypatch.setattr(ZipStreamWriter, "ZIP64_LIMIT", 100)
+    monkeypatch.setattr(ZipStreamWriter, "ZIP64_COUNT_LIMIT", 2)
+    archive = _build([
+        ("a.jpg", b"a" * 300),
+        ("b.jpg", b"b" * 300),
+        ("c.jpg", b"c" * 10),
+    ])
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+        assert zip_file.namelist() == ["a.jpg", "b.jpg", "c.jpg"]
+        assert zip_file.read("b.jpg") == b"b" * 300
+        assert zip_file.read("c.jpg") == b"c" * 10
+
+def test_zip_stream_writer_empty_archive():
+    """
+    엔트리가 없어도 유효한 빈 ZIP을 만드는지 테스트합니다.
+    """
+    with zipfile.ZipFile(io.BytesIO(_build([]))) as zip_file:
+        assert zip_file.namelist() == []
+
+def test_zip_stream_writer_rejects_add_after_finish():
+    """
+    finish() 이후에는 엔트리를 추가할 수 없는지 테스트합니다.
+    """
+    writer = ZipStreamWriter()
+    list(writer.finish())
+    with pytest.raises(ValueError):
+        list(writer.add("late.jpg", b"data"))
+
+@pytest.mark.parametrize("filename, expected", [
+    ("photo.JPG", ZIP_STORED),
+    ("photo.webp", ZIP_STORED),
+    ("manifest.json", ZIP_DEFLATED),
+])
+def test_choose_compression(filename, expected):
+    assert choose_compression(filename) == expected